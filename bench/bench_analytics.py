@@ -0,0 +1,91 @@
+"""
+Benchmark the search_listing analytics stage (percentiles, $/sqft, spreads, histograms) on a large result set.
+
+Synthesizes listings with realistic field types (numbers sent as strings, missing values) and times the
+numpy path against the pure-Python fallback, checking that both produce the same numbers.
+
+Usage: python bench/bench_analytics.py [--listings 10000] [--repeat 5]
+"""
+
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tools"))
+
+import repliers_search_tool_v2 as tool  # noqa: E402
+
+
+def _synthesize(count: int, seed: int) -> list:
+    rng = random.Random(seed)
+    listings = []
+    for i in range(count):
+        price = rng.lognormvariate(12.8, 0.5)
+        sqft = rng.uniform(700, 4000)
+        listing = {
+            "mlsNumber": f"MLS{i:06d}",
+            "listPrice": f"{price:.0f}" if i % 3 else round(price),
+            "simpleDaysOnMarket": rng.randint(0, 365),
+            "details": {
+                "sqft": str(int(sqft)) if i % 7 else None,
+                "numBedrooms": rng.randint(1, 6),
+                "numBathrooms": str(rng.choice([1, 1.5, 2, 2.5, 3])),
+            },
+        }
+        if i % 2:
+            listing["estimate"] = {"value": price * rng.uniform(0.85, 1.15)}
+        if i % 5 == 0:
+            listing["soldPrice"] = f"{price * rng.uniform(0.9, 1.05):.0f}"
+        listings.append(listing)
+    return listings
+
+
+def _time(listings: list, repeat: int) -> tuple:
+    best, result = math.inf, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = tool._compute_analytics(listings)
+        best = min(best, time.perf_counter() - started)
+    return best * 1000, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--listings", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    listings = _synthesize(args.listings, args.seed)
+    started = time.perf_counter()
+    tool._analytics_matrix(listings)
+    extract_ms = (time.perf_counter() - started) * 1000
+    print(f"listings={args.listings}  column extraction={extract_ms:.1f} ms (shared by both paths)")
+
+    numpy_module = tool.np
+    timings = {}
+    if numpy_module is not None:
+        timings["numpy"] = _time(listings, args.repeat)
+    tool.np = None
+    try:
+        timings["python"] = _time(listings, args.repeat)
+    finally:
+        tool.np = numpy_module
+
+    for label, (ms, _) in timings.items():
+        print(f"{label:7} total={ms:8.1f} ms  compute (excluding extraction)={max(ms - extract_ms, 0):7.1f} ms")
+    if len(timings) == 2:
+        a, b = timings["numpy"][1], timings["python"][1]
+        assert a["histograms"] == b["histograms"], (a["histograms"], b["histograms"])
+        for name, stats in a["summary"].items():
+            for key, value in stats.items():
+                assert math.isclose(value, b["summary"][name][key], rel_tol=1e-9, abs_tol=1e-9), (name, key)
+        print("numpy and pure-Python results match")
+    print(tool._render_analytics(timings.get("numpy", timings["python"])[1]))
+
+
+if __name__ == "__main__":
+    main()
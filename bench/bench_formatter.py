@@ -0,0 +1,147 @@
+"""
+Benchmark the table-driven listing formatter against the original per-listing f-string formatter.
+
+Usage: python bench/bench_formatter.py [--listings 5000] [--rounds 20]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "tools"))
+
+import repliers_search_tool_v2 as tool  # noqa: E402
+
+
+def _legacy_format_listings(listings: List[Dict[str, Any]]) -> str:
+    """Build a detailed summary of all listings, leaving images as placeholders."""
+    if not listings:
+        return "No listings found."
+
+    def _addr(addr: Dict[str, Any]) -> str:
+        parts = [
+            addr.get("streetNumber"),
+            addr.get("streetName"),
+            addr.get("streetSuffix"),
+            addr.get("unitNumber"),
+        ]
+        line = " ".join(str(p) for p in parts if p).strip()
+        city = addr.get("city")
+        state = addr.get("state") or addr.get("province")
+        postal = addr.get("postalCode") or addr.get("zip")
+        tail = ", ".join(str(p) for p in [city, state, postal] if p)
+        return ", ".join([c for c in [line, tail] if c]) or "Unknown address"
+
+    lines: List[str] = []
+    for idx, listing in enumerate(listings, start=1):
+        address = listing.get("address") or {}
+        details = listing.get("details") or {}
+        condo = listing.get("condominium") or {}
+        lot = listing.get("lot") or {}
+        estimate = listing.get("estimate") or {}
+        nearby = listing.get("nearby") or {}
+        agents = listing.get("agents") or []
+
+        price = listing.get("listPrice") or listing.get("price") or listing.get("list_price")
+        beds = (
+            details.get("numBedrooms")
+            or listing.get("bedrooms")
+            or listing.get("beds")
+            or listing.get("bedroomsTotal")
+        )
+        baths = (
+            details.get("numBathrooms")
+            or listing.get("bathrooms")
+            or listing.get("baths")
+            or listing.get("bathroomsTotal")
+        )
+        sqft = details.get("sqft") or listing.get("sqft")
+        year = details.get("yearBuilt") or listing.get("yearBuilt")
+        status = listing.get("standardStatus") or listing.get("status")
+        class_type = listing.get("class") or listing.get("propertyType")
+        subtype = listing.get("type") or listing.get("style")
+        dom = listing.get("simpleDaysOnMarket") or listing.get("daysOnMarket")
+        hoa = details.get("HOAFee") or condo.get("fees", {}).get("maintenance")
+        pets = condo.get("pets")
+        amenities = nearby.get("amenities") or []
+        lot_desc = lot.get("legalDescription") or lot.get("size")
+        acres = lot.get("acres")
+        coords = listing.get("map") or {}
+        estimate_val = estimate.get("value")
+        estimate_low = estimate.get("low")
+        estimate_high = estimate.get("high")
+        estimate_conf = estimate.get("confidence")
+        brokerage = (listing.get("office") or {}).get("brokerageName")
+        agent_names = ", ".join(a.get("name") for a in agents if a.get("name"))
+
+        price_str = f"${price:,.0f}" if isinstance(price, (int, float)) else str(price or "N/A")
+        sqft_str = f"{sqft}" if sqft is not None else "N/A"
+        hoa_str = f"${hoa:,.0f}" if isinstance(hoa, (int, float)) else (str(hoa) if hoa else "N/A")
+        estimate_str = (
+            f"${estimate_val:,.0f} (range ${estimate_low:,.0f}-${estimate_high:,.0f}, conf {estimate_conf:.2f})"
+            if isinstance(estimate_val, (int, float)) and isinstance(estimate_low, (int, float)) and isinstance(estimate_high, (int, float)) and isinstance(estimate_conf, (int, float))
+            else (f"${estimate_val:,.0f}" if isinstance(estimate_val, (int, float)) else "N/A")
+        )
+
+        lines.append(
+            "\n".join(
+                [
+                    f"{idx}. {listing.get('mlsNumber') or 'MLS N/A'} | status: {status or 'N/A'} | class/type: {class_type or 'N/A'} / {subtype or 'N/A'} | price: {price_str} | listDate: {listing.get('listDate') or 'N/A'} | DOM: {dom or 'N/A'}",
+                    f"   Address: {_addr(address)} | neighborhood: {address.get('neighborhood') or 'N/A'}",
+                    f"   Beds/Baths: {beds or 'N/A'}/{baths or 'N/A'} | sqft: {sqft_str} | year: {year or 'N/A'} | HOA: {hoa_str} | pets: {pets or 'N/A'}",
+                    f"   Lot: {lot_desc or 'N/A'} | acres: {acres if acres is not None else 'N/A'}",
+                    f"   Amenities: {', '.join(amenities) if amenities else 'N/A'}",
+                    f"   Brokerage: {brokerage or 'N/A'} | Agents: {agent_names or 'N/A'}",
+                    f"   Estimate: {estimate_str}",
+                    f"   Map: lat {coords.get('latitude', 'N/A')}, long {coords.get('longitude', 'N/A')}",
+                    f"   Images: [placeholder; photoCount={listing.get('photoCount', 'N/A')}]",
+                ]
+            )
+        )
+
+    return "\n".join(lines)
+
+
+
+def _load_fixture_listings() -> List[Dict[str, Any]]:
+    listings: List[Dict[str, Any]] = []
+    for name in ("repliers-api-json-listing-result-example.json", "repliers-api-json-listing-result-example-2.json"):
+        with open(os.path.join(ROOT, "json", name), encoding="utf-8") as fh:
+            listings.extend(json.load(fh)["listings"])
+    return listings
+
+
+def _rate(fn, listings: List[Dict[str, Any]], rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        fn(listings)
+        best = min(best, time.perf_counter() - started)
+    return len(listings) / best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--listings", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    fixture = _load_fixture_listings()
+    listings = [dict(fixture[i % len(fixture)], mlsNumber=f"MLS{i}") for i in range(args.listings)]
+
+    if _legacy_format_listings(listings) != tool._format_listings(listings):
+        raise SystemExit("formatter output differs from the legacy formatter")
+
+    legacy = _rate(_legacy_format_listings, listings, args.rounds)
+    table = _rate(tool._format_listings, listings, args.rounds)
+    print(f"listings={args.listings}")
+    print(f"legacy f-string formatter  {legacy:12,.0f} listings/sec")
+    print(f"table-driven formatter     {table:12,.0f} listings/sec ({table / legacy:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark the local geo grid index (radius, polygon, k-nearest) against a brute-force scan.
+
+Usage: python bench/bench_geo_index.py [--points 100000] [--queries 200]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tools"))
+
+import repliers_search_tool_v2 as tool  # noqa: E402
+
+
+def _timed(fn, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--points", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    # Roughly the Florida bounding box.
+    points = [(f"MLS{i}", rng.uniform(24.5, 31.0), rng.uniform(-87.6, -80.0)) for i in range(args.points)]
+    centers = [(rng.uniform(26.0, 30.0), rng.uniform(-83.0, -81.0)) for _ in range(args.queries)]
+
+    started = time.perf_counter()
+    index = tool._GeoGridIndex(points)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    lats = [p[1] for p in points]
+    lons = [p[2] for p in points]
+    if tool.np is not None:
+        lats, lons = tool.np.asarray(lats), tool.np.asarray(lons)
+    it = iter(centers * 10)
+
+    def _radius():
+        lat, lon = next(it)
+        index.within_radius(lat, lon, 3.2)
+
+    def _nearest():
+        lat, lon = next(it)
+        index.nearest(lat, lon, 10)
+
+    def _polygon():
+        lat, lon = next(it)
+        box = [(lat - 0.1, lon - 0.1), (lat - 0.1, lon + 0.1), (lat + 0.1, lon + 0.1), (lat + 0.1, lon - 0.1)]
+        index.within_polygon(box)
+
+    def _brute_radius():
+        lat, lon = next(it)
+        dists = tool._haversine_km(lat, lon, lats, lons)
+        [d for d in dists if d <= 3.2]
+
+    print(f"points={args.points} numpy={tool.np is not None} build={build_ms:.1f} ms")
+    print(f"radius 2mi      {_timed(_radius, args.queries):8.3f} ms/query")
+    print(f"nearest k=10    {_timed(_nearest, args.queries):8.3f} ms/query")
+    print(f"polygon 0.2deg  {_timed(_polygon, args.queries):8.3f} ms/query")
+    print(f"brute radius    {_timed(_brute_radius, max(1, args.queries // 20)):8.3f} ms/query")
+
+
+if __name__ == "__main__":
+    main()
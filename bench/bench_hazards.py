@@ -0,0 +1,121 @@
+"""
+Check per-listing hazard enrichment (the `hazard_enrichment_enabled` valve) against local stubs.
+
+The Repliers stub serves listings spread around Pasco County. A second stub stands in for both FEMA NFHL
+(`/fema`, flood zone derived from the queried point) and NWS (`/nws`, one alert). Both answer after a fixed
+latency. Repeated searches show the cold cost (bucket misses filled concurrently), the warm cost (every bucket
+cached), and how many hazard requests the geohash buckets saved compared with one lookup per listing.
+
+Usage: python bench/bench_hazards.py [--listings 100] [--hazard-latency-ms 150] [--searches 3]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "tools"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import repliers_search_tool_v2 as tool  # noqa: E402
+from stub_server import StubConfig, serve_in_process  # noqa: E402
+
+
+def _serve_hazards(latency: float):
+    counts = {"fema": 0, "nws": 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            time.sleep(latency)
+            if url.path == "/fema":
+                lon, lat = (float(v) for v in query["geometry"][0].split(","))
+                zone = "AE" if (lat * 100) % 2 < 1 else "X"
+                attributes = {"FLD_ZONE": zone, "ZONE_SUBTY": None, "SFHA_TF": "T" if zone == "AE" else "F"}
+                body = {"features": [{"attributes": attributes}]}
+            else:
+                body = {"features": [{"id": "a1", "properties": {"event": "Heat Advisory"}}]}
+            with lock:
+                counts[url.path.strip("/")] += 1
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    ThreadingHTTPServer.daemon_threads = True
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, counts
+
+
+async def _drive(args, base_url: str, hazard_url: str, counts) -> None:
+    tools = tool.Tools()
+    valves = tools.valves
+    valves.base_url = base_url
+    valves.rapidapi_key = "bench"
+    valves.enable_debug_output = False
+    valves.metrics_enabled = False
+    valves.cache_enabled = False
+    valves.analytics_enabled = False
+    valves.rate_limit_per_second = 0
+    valves.output_mode = "summary"
+    valves.hazard_enrichment_enabled = True
+    valves.hazard_fema_url = f"{hazard_url}/fema"
+    valves.hazard_nws_url = f"{hazard_url}/nws"
+    valves.hazard_concurrency = args.concurrency
+    valves.hazard_max_lookups = 10_000
+
+    async def _noop(event):
+        pass
+
+    for i in range(args.searches):
+        before = dict(counts)
+        started = time.perf_counter()
+        output = await tools.search_listing(city="Pasco", resultsPerPage=args.listings, __event_emitter__=_noop)
+        elapsed = time.perf_counter() - started
+        lines = [line for line in output.splitlines() if line.startswith("   Hazards:")]
+        fema, nws = counts["fema"] - before["fema"], counts["nws"] - before["nws"]
+        print(
+            f"search {i + 1}: {elapsed * 1000:7.1f} ms  hazard lines={len(lines)}  "
+            f"FEMA requests={fema}  NWS requests={nws}  (per-listing lookups would be {2 * len(lines)})"
+        )
+        if i == 0 and lines:
+            print(f"  e.g. {lines[0].strip()}")
+    await tools._client.aclose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--listings", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=30.0, help="Repliers stub latency.")
+    parser.add_argument("--hazard-latency-ms", type=float, default=150.0)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--searches", type=int, default=3)
+    args = parser.parse_args()
+
+    process, base_url = serve_in_process(StubConfig(listings=args.listings, latency_ms=args.latency_ms))
+    server, counts = _serve_hazards(args.hazard_latency_ms / 1000)
+    try:
+        asyncio.run(_drive(args, base_url, f"http://127.0.0.1:{server.server_address[1]}", counts))
+    finally:
+        process.terminate()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Check the image stage (`image_stage_enabled`, `image_thumbnail_cache_enabled`) against local stubs.
+
+The Repliers stub serves listings with their own image paths. A second stub stands in for the image CDN: a
+variant's size scales with its `?width=` and a request without one returns the full-resolution photo. The run
+reports:
+
+- how much shorter the Photos line is than linking every image;
+- thumbnail downloads and bytes on a cold search, a repeat search, and a fresh tool instance sharing the
+  directory (a restart or another worker);
+- LRU eviction once the directory is capped below the working set;
+- listing_photos resolving a gallery from the remembered image list without another Repliers request.
+
+Usage: python bench/bench_images.py [--listings 40] [--cdn-latency-ms 40]
+"""
+
+import argparse
+import asyncio
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "tools"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import repliers_search_tool_v2 as tool  # noqa: E402
+from stub_server import StubConfig, serve_in_thread  # noqa: E402
+
+FULL_RES_BYTES = 400_000
+
+
+def _serve_cdn(latency: float):
+    counts = {"requests": 0, "bytes": 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            width = int((parse_qs(urlparse(self.path).query).get("width") or ["0"])[0])
+            size = width * 100 if width else FULL_RES_BYTES
+            body = b"\xff\xd8\xff" + bytes(size - 3)
+            time.sleep(latency)
+            with lock:
+                counts["requests"] += 1
+                counts["bytes"] += size
+            self.send_response(200)
+            self.send_header("Content-Type", "image/jpeg")
+            self.send_header("Content-Length", str(size))
+            self.end_headers()
+            self.wfile.write(body)
+
+    ThreadingHTTPServer.daemon_threads = True
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, counts
+
+
+def _make_tools(base_url: str, cdn_url: str, thumb_dir: str, max_bytes: int) -> "tool.Tools":
+    tools = tool.Tools()
+    valves = tools.valves
+    valves.base_url = base_url
+    valves.rapidapi_key = "bench"
+    valves.enable_debug_output = False
+    valves.metrics_enabled = False
+    valves.analytics_enabled = False
+    valves.rate_limit_per_second = 0
+    valves.output_mode = "summary"
+    valves.image_stage_enabled = True
+    valves.image_cdn_url = cdn_url
+    valves.image_thumbnail_cache_enabled = True
+    valves.image_thumbnail_dir = thumb_dir
+    valves.image_thumbnail_base_url = "/cache/bench-thumbs"
+    valves.image_thumbnail_cache_max_bytes = max_bytes
+    return tools
+
+
+async def _noop(event):
+    pass
+
+
+async def _search(tools, counts, label: str, page: int, args) -> str:
+    before = dict(counts)
+    started = time.perf_counter()
+    output = await tools.search_listing(
+        city="Pasco", resultsPerPage=args.listings, pageNum=page, __event_emitter__=_noop
+    )
+    elapsed = time.perf_counter() - started
+    print(
+        f"{label:28} {elapsed * 1000:7.1f} ms  downloads={counts['requests'] - before['requests']:3d}  "
+        f"bytes={counts['bytes'] - before['bytes']:9,d}"
+    )
+    return output
+
+
+async def _drive(args, base_url: str, cdn_url: str, counts) -> bool:
+    ok = True
+    with tempfile.TemporaryDirectory() as thumbs:
+        tools = _make_tools(base_url, cdn_url, thumbs, 0)
+        output = await _search(tools, counts, "cold search", 1, args)
+        photo_lines = [line for line in output.splitlines() if line.startswith("   Photos:")]
+        all_urls = sum(
+            len(", ".join(tool._image_url(cdn_url, p, 0) for p in images))
+            for images in (tools._photo_index.get(f"STUB{i:07d}") or [] for i in range(args.listings))
+        )
+        print(f"  e.g. {photo_lines[0].strip()[:150]}...")
+        print(
+            f"  Photos lines: {sum(map(len, photo_lines)):,d} chars vs {all_urls:,d} chars to link every image; "
+            f"full-resolution heroes would be {args.listings * FULL_RES_BYTES:,d} bytes"
+        )
+        if len(photo_lines) != args.listings or not all("/cache/bench-thumbs/" in line for line in photo_lines):
+            ok = False
+
+        before = counts["requests"]
+        await _search(tools, counts, "repeat search", 1, args)
+        await tools._client.aclose()
+        restarted = _make_tools(base_url, cdn_url, thumbs, 0)
+        await _search(restarted, counts, "fresh instance, same dir", 1, args)
+        ok = ok and counts["requests"] == before
+        await restarted._client.aclose()
+
+        thumb_bytes = args.listings * 30_000 // 2  # about half the working set at the default 300px
+        capped = _make_tools(base_url, cdn_url, thumbs, thumb_bytes)
+        await _search(capped, counts, "capped dir, next page", 2, args)
+        cache = capped._thumbnail_cache
+        on_disk = sum(os.path.getsize(os.path.join(thumbs, name)) for name in os.listdir(thumbs))
+        print(f"  cap={thumb_bytes:,d} bytes: evictions={cache.stats()['evictions']}, on disk={on_disk:,d} bytes")
+        ok = ok and cache.stats()["evictions"] > 0 and on_disk <= thumb_bytes
+
+        fetches = []
+        fetch_listings = capped._fetch_listings
+
+        async def _counting_fetch(*a, **kw):
+            fetches.append(a[1])
+            return await fetch_listings(*a, **kw)
+
+        capped._fetch_listings = _counting_fetch
+        gallery = await capped.listing_photos(mlsNumber=f"STUB{args.listings:07d}", start=4, count=3)
+        print("listing_photos (remembered):\n  " + gallery.replace("\n", "\n  "))
+        ok = ok and not fetches and len(re.findall(r"!\[Photo", gallery)) == 3
+        missing = await capped.listing_photos(mlsNumber="STUB9999999")
+        print(f"listing_photos (unknown MLS, {len(fetches)} Repliers request): {missing}")
+        ok = ok and len(fetches) == 1
+        await capped._client.aclose()
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--listings", type=int, default=40, help="Listings per search page.")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Repliers stub latency.")
+    parser.add_argument("--cdn-latency-ms", type=float, default=40.0)
+    args = parser.parse_args()
+
+    server = serve_in_thread(StubConfig(listings=args.listings * 2, latency_ms=args.latency_ms))
+    cdn, counts = _serve_cdn(args.cdn_latency_ms / 1000)
+    try:
+        ok = asyncio.run(
+            _drive(
+                args,
+                f"http://127.0.0.1:{server.server_address[1]}",
+                f"http://127.0.0.1:{cdn.server_address[1]}",
+                counts,
+            )
+        )
+    finally:
+        server.shutdown()
+        cdn.shutdown()
+    print("OK" if ok else "FAIL")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
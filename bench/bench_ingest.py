@@ -0,0 +1,221 @@
+"""
+End-to-end check of the county ingestion runner (ingest/fl_county_ingest.py) against local stubs.
+
+FEMA, NWS, USGS, Census, ArcGIS and OpenWebUI each get their own stub server on a separate port, so the runner's
+per-host limits apply to each one as they would to the real hosts. Each stub answers after a fixed latency. The
+run sweeps every county in the n8n county list through both pipelines and reports wall time against the
+sequential time the n8n loops would need, along with upload and per-stub request counts.
+
+With --fail-after N the OpenWebUI stub starts returning 500 after N uploads. The first run then stops partway,
+and a second run with the same run id resumes. A refresh sweep then follows, under a new run id, in which NWS
+alerts change for --changed counties; it is run dry first, then for real.
+
+tests/test_ingest.py uses the same stubs to check uploads, resumption and refreshes.
+
+Usage: python bench/bench_ingest.py [--latency-ms 80] [--per-host-limit 4] [--fail-after 50] [--changed 5]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "ingest"))
+
+import fl_county_ingest as ingest  # noqa: E402
+
+
+class _Stub:
+    """A threaded JSON stub: `handler(method, path, query, body) -> (status, payload)`."""
+
+    def __init__(self, handler, latency: float):
+        """`handler` may also return (status, payload, headers) to set extra response headers."""
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _handle(self, method: str) -> None:
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"null") if length else None
+                with lock:
+                    stub.requests += 1
+                    stub.in_flight += 1
+                    stub.peak_in_flight = max(stub.peak_in_flight, stub.in_flight)
+                try:
+                    time.sleep(latency)
+                    url = urlparse(self.path)
+                    status, payload, *headers = handler(method, url.path, parse_qs(url.query), body)
+                finally:
+                    with lock:
+                        stub.in_flight -= 1
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in (headers[0] if headers else {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._handle("GET")
+
+            def do_POST(self):
+                self._handle("POST")
+
+        ThreadingHTTPServer.daemon_threads = True
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.request_queue_size = 256
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+
+def _start_stubs(counties, latency: float, fail_after: int):
+    uploads = []
+    upload_lock = threading.Lock()
+    deletes = []
+    state = {"fail_after": fail_after, "nws_changed": set()}
+    census_table = [["NAME", "B19013_001E", "B25077_001E", "B01003_001E", "state", "county"]] + [
+        [f"{c['name']} County, Florida", str(50000 + i * 100), str(200000 + i * 1000), str(10000 + i), "12",
+         f"{2 * i + 1:03d}"]  # fmt: skip
+        for i, c in enumerate(counties)
+    ]
+
+    def fema(method, path, query, body):
+        lon, lat = query["geometry"][0].split(",")
+        return 200, {"features": [{"attributes": {"FLD_ZONE": "AE", "lat": lat, "lon": lon}}]}
+
+    def nws(method, path, query, body):
+        event = "Hurricane Warning" if query["point"][0] in state["nws_changed"] else "Flood Watch"
+        return 200, {"features": [{"id": "alert-1", "properties": {"event": event}}]}
+
+    def usgs(method, path, query, body):
+        return 200, {"USGS_Elevation_Point_Query_Service": {"Elevation_Query": {"Elevation": 12.5, "Units": "Feet"}}}
+
+    def census(method, path, query, body):
+        return 200, census_table
+
+    def arcgis(method, path, query, body):
+        return 200, {"features": []}
+
+    def openwebui(method, path, query, body):
+        with upload_lock:
+            if path.endswith("/delete"):
+                deletes.append((body["collection_name"], body["file_id"]))
+                return 200, {"status": True}
+            if state["fail_after"] and len(uploads) >= state["fail_after"]:
+                return 500, {"detail": "injected"}
+            uploads.append((body["collection_name"], body["name"]))
+            return 200, {"status": True, "id": f"doc-{len(uploads)}"}
+
+    handlers = {"fema": fema, "nws": nws, "usgs": usgs, "census": census, "arcgis": arcgis}
+    stubs = {name: _Stub(fn, latency) for name, fn in handlers.items()}
+    stubs["openwebui"] = _Stub(openwebui, latency)
+    return stubs, uploads, deletes, state
+
+
+def _uploaded_documents(uploads):
+    """(knowledge base, county name) for each upload, parsed from the document names the runner builds."""
+    return [(kb, name.rsplit(" ", 1)[0].split(" ", 2)[-1]) for kb, name in uploads]
+
+
+async def _sweep(stubs, counties, args, state_path: str, run_id: str, dry_run: bool = False):
+    client = ingest.HostLimitedClient(per_host_limit=args.per_host_limit, max_retries=1)
+    client.backoff_base = 0.01
+    runner = ingest.IngestRunner(
+        client,
+        ingest.IngestState(state_path),
+        stubs["openwebui"].url,
+        "bench",
+        source_urls={name: stubs[name].url + "/query" for name in ingest.DEFAULT_SOURCE_URLS},
+        census_cache_dir=os.path.join(os.path.dirname(state_path), "census"),
+        upload_batch_size=args.upload_batch_size,
+        run_id=run_id,
+        dry_run=dry_run,
+        log=lambda message: None,
+    )
+    try:
+        return await runner.run(list(ingest.PIPELINE_SOURCES), counties, {"hazards": "fl-hazards", "trends": "fl-trends"})
+    finally:
+        client.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--counties", default=os.path.join(ROOT, "n8n", "trends.json"))
+    parser.add_argument("--latency-ms", type=float, default=80.0)
+    parser.add_argument("--per-host-limit", type=int, default=4)
+    parser.add_argument("--upload-batch-size", type=int, default=10)
+    parser.add_argument("--fail-after", type=int, default=0, help="Fail OpenWebUI uploads after this many (0: never).")
+    parser.add_argument("--changed", type=int, default=5, help="Counties whose NWS alerts change before the refresh.")
+    args = parser.parse_args()
+
+    counties = ingest.load_counties(args.counties)
+    stubs, uploads, deletes, state = _start_stubs(counties, args.latency_ms / 1000, args.fail_after)
+    calls_per_county = sum(len(s) for s in ingest.PIPELINE_SOURCES.values()) + len(ingest.PIPELINE_SOURCES)
+    sequential = len(counties) * calls_per_county * args.latency_ms / 1000
+    expected = {(kb, county["name"]) for kb in ("fl-hazards", "fl-trends") for county in counties}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        state_path = os.path.join(tmp, "state.db")
+        runs = 0
+        while True:
+            runs += 1
+            report = asyncio.run(_sweep(stubs, counties, args, state_path, "bench"))
+            for summary in report["pipelines"]:
+                print(
+                    f"run {runs} {summary['pipeline']:7} fetched={summary['fetched']:3d} "
+                    f"reused={summary['reused']:3d} skipped={summary['skipped']:3d} "
+                    f"uploaded={summary['uploaded']:3d} failed={summary['failed']}"
+                )
+            print(f"run {runs} wall={report['elapsed_s']:.2f} s, http requests={report['http']['requests']}")
+            done = all(s["uploaded"] + s["skipped"] == s["counties"] for s in report["pipelines"])
+            if done or runs >= 3:
+                break
+            state["fail_after"] = 0  # let the resumed run through
+
+        print(f"sequential n8n estimate: {sequential:.1f} s ({calls_per_county} calls per county at {args.latency_ms:.0f} ms)")
+        for name, stub in stubs.items():
+            print(f"  {name:9} requests={stub.requests:3d} peak in flight={stub.peak_in_flight}")
+        uploaded = _uploaded_documents(uploads)
+        duplicates = len(uploaded) - len(set(uploaded))
+        missing = len(expected) - len(set(uploaded) & expected)
+        census_calls = stubs["census"].requests
+        print(
+            f"initial sweep: {len(uploads)} uploads for {len(expected)} documents, duplicates={duplicates}, "
+            f"missing={missing}, census requests={census_calls} (expected 1: one statewide table per run)"
+        )
+
+        state["nws_changed"] = {f"{c['lat']},{c['lon']}" for c in counties[: args.changed]}
+        initial_uploads = len(uploads)
+        dry = asyncio.run(_sweep(stubs, counties, args, state_path, "refresh", dry_run=True))
+        would = {s["pipeline"]: (len(s["would_upload"]), len(s["would_delete"])) for s in dry["pipelines"]}
+        print(f"dry run: would upload/delete {would}, uploads made={len(uploads) - initial_uploads}")
+
+        refresh = asyncio.run(_sweep(stubs, counties, args, state_path, "refresh"))
+        for summary in refresh["pipelines"]:
+            changed = {k: v for k, v in summary["changed_sources"].items() if v}
+            print(
+                f"refresh {summary['pipeline']:7} unchanged={summary['unchanged']:3d} uploaded={summary['uploaded']:3d} "
+                f"deleted={summary['deleted']:3d} changed sources={changed}"
+            )
+        print(f"deletes={len(deletes)}, census requests after refresh={stubs['census'].requests}")
+
+
+if __name__ == "__main__":
+    main()
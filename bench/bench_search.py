@@ -0,0 +1,153 @@
+"""
+Replayable end-to-end benchmark: drive Tools.search_listing against the local Repliers stub.
+
+The stub runs in a child process (see bench/stub_server.py) with configurable latency, jitter, listing
+count and injected errors. Searches run at a fixed concurrency on one shared Tools instance, as they do
+inside OpenWebUI. Reports p50/p95/p99 latency, throughput, error count and peak RSS. `--save` writes the
+result as JSON and `--baseline` compares a run against a saved one.
+
+Usage:
+    python bench/bench_search.py --searches 200 --concurrency 16 --save bench/baseline.json
+    python bench/bench_search.py --searches 200 --concurrency 16 --baseline bench/baseline.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "tools"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import repliers_search_tool_v2 as tool  # noqa: E402
+from stub_server import StubConfig, serve_in_process  # noqa: E402
+
+
+def _percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+async def _drive(args, base_url: str) -> dict:
+    tools = tool.Tools()
+    valves = tools.valves
+    valves.base_url = base_url
+    valves.rapidapi_key = "bench"
+    valves.enable_debug_output = False
+    valves.metrics_enabled = False
+    valves.cache_enabled = args.cache
+    valves.rate_limit_per_second = args.rate_limit
+    valves.output_mode = args.output_mode
+    valves.stream_parse = args.stream_parse
+    valves.http_transport = args.transport
+    valves.max_concurrent_requests = args.concurrency
+    valves.http_pool_maxsize = args.concurrency
+    valves.retry_backoff_base = 0.05
+
+    async def _noop(event):
+        pass
+
+    gate = asyncio.Semaphore(args.concurrency)
+    latencies, errors = [], 0
+
+    async def _one(i: int) -> None:
+        nonlocal errors
+        # Distinct params per search so the cache and coalescing only help when --cache repeats them.
+        price = 100000 + (i % args.distinct if args.distinct else i)
+        async with gate:
+            started = time.perf_counter()
+            output = await tools.search_listing(
+                city="Pasco",
+                minPrice=price,
+                resultsPerPage=args.page_size,
+                fetch_all_pages=args.fetch_all_pages or None,
+                __event_emitter__=_noop,
+            )
+            latencies.append(time.perf_counter() - started)
+            if not output.startswith("Listing search complete"):
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(_one(i) for i in range(args.searches)))
+    elapsed = time.perf_counter() - started
+    stats = dict(tools._client.stats)
+    await tools._client.aclose()
+    return {
+        "searches": args.searches,
+        "concurrency": args.concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_per_s": round(args.searches / elapsed, 2),
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(_percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(_percentile(latencies, 99) * 1000, 2),
+        "errors": errors,
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "requests": stats,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--searches", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--listings", type=int, default=200, help="Total listings the stub reports per search.")
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--fetch-all-pages", action="store_true")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--distinct", type=int, default=0, help="Repeat this many distinct searches (0: all unique).")
+    parser.add_argument("--cache", action="store_true", help="Leave the response cache enabled.")
+    parser.add_argument("--rate-limit", type=float, default=0.0)
+    parser.add_argument("--transport", default="auto", choices=["auto", "aiohttp", "requests"])
+    parser.add_argument("--output-mode", default="compact", choices=["summary", "compact", "full"])
+    parser.add_argument("--stream-parse", action="store_true")
+    parser.add_argument("--save", help="Write the result JSON to this path.")
+    parser.add_argument("--baseline", help="Compare against a result JSON saved with --save.")
+    args = parser.parse_args()
+
+    config = StubConfig(args.listings, args.latency_ms, args.jitter_ms, args.error_rate, args.error_status)
+    process, base_url = serve_in_process(config)
+    try:
+        result = asyncio.run(_drive(args, base_url))
+    finally:
+        process.terminate()
+    result["config"] = {k: v for k, v in vars(args).items() if k not in ("save", "baseline")}
+
+    print(
+        f"{result['searches']} searches @ {result['concurrency']} concurrent: "
+        f"{result['throughput_per_s']} searches/s, p50={result['p50_ms']} ms p95={result['p95_ms']} ms "
+        f"p99={result['p99_ms']} ms, errors={result['errors']}, peak RSS={result['peak_rss_mb']} MB"
+    )
+    print(f"requests: {result['requests']}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fh:
+            baseline = json.load(fh)
+        if baseline.get("config") != result["config"]:
+            print("warning: baseline was recorded with a different configuration")
+        for key in ("throughput_per_s", "p50_ms", "p95_ms", "p99_ms", "peak_rss_mb"):
+            old, new = baseline.get(key), result[key]
+            change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+            print(f"  {key:17} {old!s:>10} -> {new!s:>10}  ({change})")
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as fh:
+            json.dump(result, fh, indent=2)
+        print(f"saved {args.save}")
+
+
+if __name__ == "__main__":
+    main()
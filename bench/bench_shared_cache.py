@@ -0,0 +1,103 @@
+"""
+Check the 'sqlite' cache backend across worker processes.
+
+Several processes, each standing in for an OpenWebUI worker with its own Tools instance, run the same set of
+searches against the local stub and share one cache file. The run reports each worker's hit/miss counts,
+the total number of upstream requests, and the per-search latency with and without the shared cache.
+
+Usage: python bench/bench_shared_cache.py [--workers 4] [--searches 20] [--distinct 5] [--latency-ms 80]
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "tools"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import repliers_search_tool_v2 as tool  # noqa: E402
+from stub_server import StubConfig, serve_in_process  # noqa: E402
+
+
+def _worker(
+    base_url: str, backend: str, cache_path: str, searches: int, distinct: int, offset: int, results
+) -> None:
+    tools = tool.Tools()
+    tools.valves.base_url = base_url
+    tools.valves.rapidapi_key = "bench"
+    tools.valves.enable_debug_output = False
+    tools.valves.metrics_enabled = False
+    tools.valves.rate_limit_per_second = 0
+    tools.valves.cache_backend = backend
+    tools.valves.cache_path = cache_path
+
+    async def _noop(event):
+        pass
+
+    async def _run() -> float:
+        started = time.perf_counter()
+        for i in range(searches):
+            price = 100000 + (i + offset) % distinct
+            output = await tools.search_listing(city="Pasco", minPrice=price, __event_emitter__=_noop)
+            assert output.startswith("Listing search complete"), output[:200]
+        elapsed = time.perf_counter() - started
+        await tools._client.aclose()
+        return elapsed
+
+    elapsed = asyncio.run(_run())
+    stats = tools._get_cache().stats()
+    results.put((os.getpid(), stats["hits"], stats["misses"], elapsed / searches))
+
+
+def _run_backend(base_url: str, backend: str, args) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_path = os.path.join(tmp, "cache.db")
+        tool._SQLiteCache(cache_path)  # create the schema before the workers race for it
+        results = multiprocessing.Queue()
+        workers = [
+            multiprocessing.Process(
+                target=_worker,
+                args=(base_url, backend, cache_path, args.searches, args.distinct, offset, results),
+            )
+            for offset in range(args.workers)
+        ]
+        for worker in workers:
+            worker.start()
+        rows = [results.get(timeout=300) for _ in workers]
+        for worker in workers:
+            worker.join()
+        hits = sum(row[1] for row in rows)
+        misses = sum(row[2] for row in rows)
+        mean_ms = sum(row[3] for row in rows) / len(rows) * 1000
+        print(f"{backend:6} upstream requests={misses:3d}  cache hits={hits:3d}  mean search={mean_ms:7.1f} ms")
+        for pid, worker_hits, worker_misses, _ in rows:
+            print(f"         worker {pid}: {worker_hits} hits, {worker_misses} misses")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--searches", type=int, default=20)
+    parser.add_argument("--distinct", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=80.0)
+    args = parser.parse_args()
+
+    process, base_url = serve_in_process(StubConfig(listings=20, latency_ms=args.latency_ms))
+    try:
+        print(
+            f"{args.workers} workers x {args.searches} searches over {args.distinct} distinct queries "
+            "(each worker starts at a different one)"
+        )
+        for backend in ("memory", "sqlite"):
+            _run_backend(base_url, backend, args)
+    finally:
+        process.terminate()
+
+
+if __name__ == "__main__":
+    main()
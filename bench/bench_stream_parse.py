@@ -0,0 +1,105 @@
+"""
+Compare peak Python memory of whole-body JSON parsing vs stream_parse for a large /listings page.
+
+A 500-listing response is synthesized from the json/ fixture (images, imageInsights, rooms and history
+included) and served from a local HTTP stub.
+
+Usage: python bench/bench_stream_parse.py [--listings 500]
+"""
+
+import argparse
+import asyncio
+import copy
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "tools"))
+
+import repliers_search_tool_v2 as tool  # noqa: E402
+
+
+def _synthesize(count: int) -> bytes:
+    with open(os.path.join(ROOT, "json", "repliers-api-json-listing-result-example.json"), encoding="utf-8") as fh:
+        fixture = json.load(fh)
+    template = fixture["listings"][0]
+    listings = []
+    for i in range(count):
+        listing = copy.deepcopy(template)
+        listing["mlsNumber"] = f"MLS{i:06d}"
+        listing["listPrice"] = template["listPrice"] + i * 1000
+        listings.append(listing)
+    body = {**fixture, "numPages": 1, "pageSize": count, "count": count, "listings": listings}
+    return json.dumps(body).encode("utf-8")
+
+
+def _serve(body: bytes) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _run(base_url: str, stream: bool) -> tuple:
+    tools = tool.Tools()
+    tools.valves.base_url = base_url
+    tools.valves.rapidapi_key = "bench"
+    tools.valves.enable_debug_output = False
+    tools.valves.cache_enabled = False
+    tools.valves.lean_fields = False
+    tools.valves.format_offload_threshold = 0
+    tools.valves.stream_parse = stream
+
+    async def _noop(event):
+        pass
+
+    async def _search() -> str:
+        try:
+            return await tools.search_listing(city="Pasco", resultsPerPage=500, __event_emitter__=_noop)
+        finally:
+            await tools._client.aclose()
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    output = asyncio.run(_search())
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak, elapsed, len(output)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--listings", type=int, default=500)
+    args = parser.parse_args()
+
+    body = _synthesize(args.listings)
+    server = _serve(body)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    print(f"listings={args.listings} body={len(body) / 1e6:.1f} MB")
+    for label, stream in (("response.json()", False), ("stream_parse", True)):
+        peak, elapsed, chars = _run(base_url, stream)
+        print(f"{label:16} peak={peak / 1e6:8.1f} MB  time={elapsed * 1000:8.1f} ms  output={chars:,} chars")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
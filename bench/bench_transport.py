@@ -0,0 +1,103 @@
+"""
+Compare the requests (thread pool) and aiohttp (native async) transports under concurrent searches.
+
+A local HTTP stub answers every POST /listings after a fixed delay with the json/ fixture, so the run measures
+how many searches each transport keeps in flight and how much wall time and how many threads they use.
+
+Usage: python bench/bench_transport.py [--searches 200] [--latency-ms 50] [--concurrency 16]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "tools"))
+
+import repliers_search_tool_v2 as tool  # noqa: E402
+
+
+def _serve(body: bytes, latency: float) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    ThreadingHTTPServer.daemon_threads = True
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.request_queue_size = 256
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def _run(base_url: str, transport: str, searches: int, concurrency: int) -> tuple:
+    tools = tool.Tools()
+    tools.valves.base_url = base_url
+    tools.valves.rapidapi_key = "bench"
+    tools.valves.enable_debug_output = False
+    tools.valves.cache_enabled = False
+    tools.valves.rate_limit_per_second = 0
+    tools.valves.http_transport = transport
+    tools.valves.max_concurrent_requests = concurrency
+    tools.valves.http_pool_maxsize = concurrency
+
+    async def _noop(event):
+        pass
+
+    peak_threads = threading.active_count()
+
+    async def _one(i: int) -> float:
+        nonlocal peak_threads
+        started = time.perf_counter()
+        await tools.search_listing(city="Pasco", minPrice=100000 + i, __event_emitter__=_noop)
+        peak_threads = max(peak_threads, threading.active_count())
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    latencies = sorted(await asyncio.gather(*(_one(i) for i in range(searches))))
+    elapsed = time.perf_counter() - started
+    await tools._client.aclose()
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    return elapsed, latencies[len(latencies) // 2], p95, peak_threads
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--searches", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    with open(os.path.join(ROOT, "json", "repliers-api-json-listing-result-example.json"), "rb") as fh:
+        body = fh.read()
+    server = _serve(body, args.latency_ms / 1000)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    print(f"searches={args.searches} latency={args.latency_ms:.0f} ms concurrency={args.concurrency}")
+    transports = ["requests"] + (["aiohttp"] if tool.aiohttp is not None else [])
+    for transport in transports:
+        elapsed, p50, p95, threads = asyncio.run(_run(base_url, transport, args.searches, args.concurrency))
+        print(
+            f"{transport:9} total={elapsed * 1000:8.1f} ms  {args.searches / elapsed:7.1f} searches/s  "
+            f"p50={p50 * 1000:7.1f} ms  p95={p95 * 1000:7.1f} ms  peak_threads={threads}"
+        )
+    if tool.aiohttp is None:
+        print("aiohttp is not installed; only the requests transport was measured")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""
+Local stand-in for the Repliers API used by the benchmarks.
+
+POST /listings serves pages of listings cloned from the json/ fixture (unique mlsNumber and image paths, varied
+price and coordinates), honoring `pageNum` and `resultsPerPage`, the `minPrice`/`maxPrice` filters and the
+dotted `fields` projection. Other filters are ignored. Latency, jitter, total listing count and injected errors
+are configurable. GET /listings/deleted returns an empty list. The server's `request_counts` holds the number
+of GET and POST requests received.
+
+Usage: python bench/stub_server.py [--port 8765] [--listings 200] [--latency-ms 50] [--error-rate 0.05]
+Point the tool's `base_url` valve at http://127.0.0.1:<port>.
+"""
+
+import argparse
+import copy
+import json
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+FIXTURE = os.path.join(ROOT, "json", "repliers-api-json-listing-result-example.json")
+
+
+@dataclass
+class StubConfig:
+    listings: int = 200
+    latency_ms: float = 50.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    error_status: int = 503
+    seed: int = 7
+    retry_after: str = "0"
+
+
+class ListingFactory:
+    """Build and cache encoded /listings pages derived from the fixture."""
+
+    def __init__(self, total: int, seed: int = 7):
+        with open(FIXTURE, encoding="utf-8") as fh:
+            self.fixture = json.load(fh)
+        self.template = self.fixture["listings"][0]
+        self.total = total
+        self.seed = seed
+        self._pages: Dict[Tuple[object, ...], bytes] = {}
+        self._listings: Dict[Tuple[int, Optional[str]], str] = {}
+        self._lock = threading.Lock()
+
+    def _rng_and_price(self, i: int) -> Tuple[random.Random, int]:
+        rng = random.Random(self.seed * 1_000_003 + i)
+        return rng, int(float(self.template.get("listPrice") or 300000) * rng.uniform(0.5, 2.0))
+
+    def listing(self, i: int) -> dict:
+        rng, price = self._rng_and_price(i)
+        listing = copy.deepcopy(self.template)
+        listing["mlsNumber"] = f"STUB{i:07d}"
+        listing["images"] = [f"sample/IMG-STUB{i:07d}_{n}.jpg" for n in range(len(self.template.get("images") or []))]
+        listing["listPrice"] = price
+        lat, lon = round(28.3 + rng.uniform(-0.5, 0.5), 6), round(-82.6 + rng.uniform(-0.5, 0.5), 6)
+        listing["map"] = {"latitude": lat, "longitude": lon, "point": f"POINT ({lon} {lat})"}
+        return listing
+
+    def _matches(self, filters: Dict[str, str]) -> List[int]:
+        """Indexes of the listings within the inclusive price bounds."""
+        if not filters:
+            return list(range(self.total))
+        low, high = float(filters.get("minPrice", "-inf")), float(filters.get("maxPrice", "inf"))
+        return [i for i in range(self.total) if low <= self._rng_and_price(i)[1] <= high]
+
+    @staticmethod
+    def _project(listing: dict, fields: List[str]) -> dict:
+        out: dict = {}
+        for path in fields:
+            keys, value = path.split("."), listing
+            for key in keys:
+                value = value.get(key) if isinstance(value, dict) else None
+            if value is None:
+                continue
+            target = out
+            for key in keys[:-1]:
+                target = target.setdefault(key, {})
+            target[keys[-1]] = value
+        return out
+
+    def _encoded(self, i: int, fields: Optional[str]) -> str:
+        key = (i, fields)
+        with self._lock:
+            text = self._listings.get(key)
+        if text is None:
+            listing = self.listing(i)
+            text = json.dumps(self._project(listing, fields.split(",")) if fields else listing)
+            with self._lock:
+                self._listings[key] = text
+        return text
+
+    def page(
+        self, page_num: int, page_size: int, filters: Optional[Dict[str, str]] = None, fields: Optional[str] = None
+    ) -> bytes:
+        filters = filters or {}
+        key = (page_num, page_size, tuple(sorted(filters.items())), fields)
+        with self._lock:
+            body = self._pages.get(key)
+        if body is None:
+            matches = self._matches(filters)
+            num_pages = max(1, -(-len(matches) // page_size))
+            start = (page_num - 1) * page_size
+            # Every price filter is a new page key, so listings are encoded once each and spliced in.
+            listings = ",".join(self._encoded(i, fields) for i in matches[start : start + page_size])
+            data = {
+                **self.fixture,
+                "page": page_num,
+                "numPages": num_pages,
+                "pageSize": page_size,
+                "count": len(matches),
+                "listings": None,
+            }
+            body = json.dumps(data).replace('"listings": null', f'"listings": [{listings}]', 1).encode("utf-8")
+            with self._lock:
+                self._pages[key] = body
+        return body
+
+
+def make_server(config: StubConfig, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    factory = ListingFactory(config.listings, config.seed)
+    rng = random.Random(config.seed)
+    rng_lock = threading.Lock()
+    request_counts = {"GET": 0, "POST": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status: int, body: bytes, headers: Dict[str, str] = None) -> None:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _delay_and_maybe_fail(self) -> bool:
+            with rng_lock:
+                request_counts[self.command] = request_counts.get(self.command, 0) + 1
+                jitter = rng.uniform(0, config.jitter_ms)
+                fail = rng.random() < config.error_rate
+            time.sleep((config.latency_ms + jitter) / 1000)
+            if fail:
+                self._send(config.error_status, b'{"error":"injected"}', {"Retry-After": config.retry_after})
+            return fail
+
+        def do_GET(self):
+            if self._delay_and_maybe_fail():
+                return
+            self._send(200, b'{"listings":[]}')
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            if self._delay_and_maybe_fail():
+                return
+            query = parse_qs(urlparse(self.path).query)
+            page_num = max(1, int((query.get("pageNum") or ["1"])[0]))
+            page_size = max(1, int((query.get("resultsPerPage") or ["20"])[0]))
+            filters = {name: query[name][0] for name in ("minPrice", "maxPrice") if name in query}
+            fields = (query.get("fields") or [None])[0]
+            self._send(200, factory.page(page_num, page_size, filters, fields))
+
+    ThreadingHTTPServer.daemon_threads = True
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.request_queue_size = 512
+    server.request_counts = request_counts
+    return server
+
+
+def serve_in_thread(config: StubConfig) -> ThreadingHTTPServer:
+    """Start a stub on a free port in a daemon thread; call `shutdown()` when done."""
+    server = make_server(config)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _serve_process(config: StubConfig, port_queue) -> None:
+    server = make_server(config)
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+def serve_in_process(config: StubConfig):
+    """Start a stub in a child process so it does not share the GIL or RSS with the code under test.
+
+    Returns (process, base_url); terminate the process when done.
+    """
+    import multiprocessing
+
+    port_queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_serve_process, args=(config, port_queue), daemon=True)
+    process.start()
+    return process, f"http://127.0.0.1:{port_queue.get(timeout=30)}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--listings", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--retry-after", default="0", help="Retry-After header sent with injected errors.")
+    args = parser.parse_args()
+    config = StubConfig(
+        args.listings, args.latency_ms, args.jitter_ms, args.error_rate, args.error_status, retry_after=args.retry_after
+    )
+    server = make_server(config, port=args.port)
+    print(f"Repliers stub on http://127.0.0.1:{args.port} ({args.listings} listings)")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
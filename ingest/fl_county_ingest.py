@@ -0,0 +1,821 @@
+"""
+title: Florida County Ingestion Runner
+author: beaudamore
+version: 1.0.0
+description: Concurrent replacement for the n8n "Loop Counties" hazards/trends flows. Fetches FEMA NFHL, NWS,
+USGS, Census ACS and ArcGIS data for every county, then pushes one document per county and pipeline to an
+OpenWebUI knowledge base through /api/retrieval/process/text.
+requirements: requests
+
+Per-source fetches fan out concurrently, with a concurrency limit per host so one slow endpoint only queues its
+own requests. The Census ACS table covers the whole state, so it is fetched once per run and joined to the
+county list in memory. It is also cached on disk by ACS vintage. Uploads are delta-aware. A manifest of
+content hashes per (kb_id, county, source) means only counties whose data changed are re-uploaded, and the
+documents they replace are deleted. --dry-run reports what would change. Progress is checkpointed in SQLite,
+so a rerun with the same --run-id resumes. It skips counties already uploaded and reuses documents already
+fetched. Uploads go out in batches, and each batch is checkpointed in one transaction.
+
+Usage:
+    python ingest/fl_county_ingest.py --pipeline all
+    python ingest/fl_county_ingest.py --pipeline hazards --counties n8n/hazards.json --per-host-limit 4
+    python ingest/fl_county_ingest.py --pipeline all --dry-run
+
+Environment (same names as the n8n flows): OPENWEBUI_API_URL, OPENWEBUI_API_TOKEN, OPENWEBUI_KB_HAZARDS_ID,
+OPENWEBUI_KB_TRENDS_ID, CENSUS_API_KEY.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+DEFAULT_SOURCE_URLS: Dict[str, str] = {
+    "fema": "https://hazards.fema.gov/gis/nfhl/rest/services/public/NFHL/MapServer/0/query",
+    "nws": "https://api.weather.gov/alerts/active",
+    "usgs": "https://nationalmap.gov/epqs/pqs.php",
+    "census": "https://api.census.gov/data/2023/acs/acs5",
+    "arcgis": "https://services.arcgisonline.com/arcgis/rest/services/World_Imagery/MapServer/query",
+}
+PIPELINE_SOURCES: Dict[str, Tuple[str, ...]] = {
+    "hazards": ("fema", "nws", "usgs"),
+    "trends": ("census", "arcgis"),
+}
+PIPELINE_KB_ENV: Dict[str, Tuple[str, str]] = {
+    "hazards": ("OPENWEBUI_KB_HAZARDS_ID", "fl-hazards"),
+    "trends": ("OPENWEBUI_KB_TRENDS_ID", "fl-trends"),
+}
+NWS_USER_AGENT = "OpenWebUI-Safety-Integrator/1.0 (contact@example.com)"
+ACS_FIELDS = "NAME,B19013_001E,B25077_001E,B01003_001E"
+FL_STATE_FIPS = "12"
+_RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def load_counties(path: str) -> List[Dict[str, Any]]:
+    """Read the county list (name/lat/lon) from an n8n export or a plain JSON list."""
+    with open(path, encoding="utf-8") as fh:
+        data = json.load(fh)
+    if isinstance(data, dict) and "nodes" in data:
+        for node in data["nodes"]:
+            values = (node.get("parameters") or {}).get("values") or {}
+            payload = values.get("json") if isinstance(values, dict) else None
+            if isinstance(payload, dict) and isinstance(payload.get("counties"), list):
+                data = payload["counties"]
+                break
+            if isinstance(payload, list) and payload and "lat" in payload[0]:
+                data = payload
+                break
+    if isinstance(data, dict):
+        data = data.get("counties") or []
+    counties = [
+        {"name": str(item["name"]), "lat": float(item["lat"]), "lon": float(item["lon"])}
+        for item in data
+        if isinstance(item, dict) and item.get("name") and item.get("lat") is not None and item.get("lon") is not None
+    ]
+    if not counties:
+        raise ValueError(f"No counties with name/lat/lon found in {path}")
+    return counties
+
+
+def county_key(name: str) -> str:
+    """Match county names across sources ("St. Johns", "St Johns County, Florida" -> "stjohns")."""
+    name = re.sub(r"\s+county\b.*$", "", name.strip().lower())
+    return re.sub(r"[^a-z0-9]", "", name)
+
+
+def _retry_after_seconds(response: Optional[requests.Response]) -> Optional[float]:
+    if response is None:
+        return None
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class HostLimitedClient:
+    """Shared HTTP session with a concurrency limit per host and retries for 429/5xx and connection errors.
+
+    Blocking requests calls run in a dedicated thread pool; each host gets its own semaphore, so a slow
+    endpoint only queues its own requests. Backoff without a Retry-After header is capped at `backoff_max`.
+    A Retry-After is waited out in full up to `retry_after_max` seconds (0: any); a longer one fails the
+    request at once, since retrying sooner than the server asked would only use up the retries.
+    """
+
+    def __init__(
+        self,
+        per_host_limit: int = 4,
+        host_limits: Optional[Dict[str, int]] = None,
+        timeout: float = 30.0,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 10.0,
+        retry_after_max: float = 120.0,
+    ):
+        self.per_host_limit = max(1, per_host_limit)
+        self.host_limits = dict(host_limits or {})
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_after_max = retry_after_max
+        pool = max(self.per_host_limit, *self.host_limits.values(), 1) * 8
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=pool)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=pool, thread_name_prefix="ingest-http")
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._lock = threading.Lock()
+        self.stats: Dict[str, Any] = {"requests": 0, "retried": 0, "bytes": 0, "per_host": {}}
+
+    def _semaphore(self, url: str) -> Tuple[str, asyncio.Semaphore]:
+        host = urlparse(url).netloc
+        semaphore = self._semaphores.get(host)
+        if semaphore is None:
+            limit = self.host_limits.get(host) or self.host_limits.get(host.split(":")[0]) or self.per_host_limit
+            semaphore = self._semaphores[host] = asyncio.Semaphore(max(1, int(limit)))
+        return host, semaphore
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        json_body: Any = None,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> requests.Response:
+        """Send one request under its host's limit, retrying with jittered backoff (Retry-After honored)."""
+        host, semaphore = self._semaphore(url)
+        loop = asyncio.get_event_loop()
+        attempt = 0
+        while True:
+            response = None
+            try:
+                async with semaphore:
+                    response = await loop.run_in_executor(
+                        self._executor,
+                        lambda: self.session.request(
+                            method, url, params=params, json=json_body, headers=headers, timeout=self.timeout
+                        ),
+                    )
+                with self._lock:
+                    self.stats["requests"] += 1
+                    self.stats["bytes"] += len(response.content)
+                    self.stats["per_host"][host] = self.stats["per_host"].get(host, 0) + 1
+                if response.status_code not in _RETRY_STATUS_CODES or attempt >= self.max_retries:
+                    response.raise_for_status()
+                    return response
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.max_retries:
+                    raise
+            delay = _retry_after_seconds(response)
+            if delay is None:
+                delay = min(random.uniform(0, self.backoff_base * (2**attempt)), self.backoff_max)
+            elif self.retry_after_max and delay > self.retry_after_max:
+                response.raise_for_status()
+            attempt += 1
+            with self._lock:
+                self.stats["retried"] += 1
+            await asyncio.sleep(delay)
+
+    async def get_json(self, url: str, params: Optional[Dict[str, Any]] = None, headers=None) -> Any:
+        response = await self.request("GET", url, params=params, headers=headers)
+        return response.json()
+
+    def close(self) -> None:
+        self.session.close()
+        self._executor.shutdown(wait=False)
+
+
+# --- sources -------------------------------------------------------------------------------------------------
+
+
+_ACS_VINTAGE_RE = re.compile(r"/data/(\d{4})/")
+
+
+def acs_vintage(url: str) -> str:
+    """ACS vintage (year) from the dataset URL, e.g. .../data/2023/acs/acs5 -> "2023"."""
+    match = _ACS_VINTAGE_RE.search(url)
+    return match.group(1) if match else "latest"
+
+
+class CensusIndex:
+    """Statewide ACS `for=county:*` table indexed by 5-digit county FIPS and by normalized county name."""
+
+    def __init__(self, table: Any, vintage: str = ""):
+        if not isinstance(table, list) or len(table) < 2 or not isinstance(table[0], list):
+            raise ValueError("ACS response is not a header + rows table")
+        self.vintage = vintage
+        self.header = table[0]
+        self.by_fips: Dict[str, Dict[str, Any]] = {}
+        self.by_name: Dict[str, Dict[str, Any]] = {}
+        for row in table[1:]:
+            record = dict(zip(self.header, row))
+            if record.get("state") and record.get("county"):
+                self.by_fips[f"{record['state']}{record['county']}"] = record
+            if record.get("NAME"):
+                self.by_name[county_key(str(record["NAME"]))] = record
+
+    def __len__(self) -> int:
+        return len(self.by_name) or len(self.by_fips)
+
+    def lookup(self, county: Dict[str, Any]) -> Dict[str, Any]:
+        """Row for a county: by its `fips` when the county list carries one, else by name."""
+        fips = str(county.get("fips") or "")
+        record = self.by_fips.get(fips) if fips else None
+        if record is None:
+            record = self.by_name.get(county_key(county["name"]))
+        return dict(record) if record is not None else {"note": f"No ACS row for {county['name']} County"}
+
+
+def _census_cache_path(cache_dir: str, vintage: str) -> str:
+    return os.path.join(cache_dir, f"acs5_{vintage}_state{FL_STATE_FIPS}.json")
+
+
+def load_cached_census(cache_dir: str, vintage: str) -> Optional[Any]:
+    path = _census_cache_path(cache_dir, vintage)
+    try:
+        with open(path, encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def store_cached_census(cache_dir: str, vintage: str, table: Any) -> None:
+    """Write the table atomically so concurrent runs never read a partial file."""
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _census_cache_path(cache_dir, vintage)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        json.dump(table, fh)
+    os.replace(tmp_path, path)
+
+
+def source_request(
+    source: str, county: Dict[str, Any], urls: Dict[str, str], census_key: str = ""
+) -> Tuple[str, Dict[str, Any], Dict[str, str]]:
+    """Build (url, params, headers) for one source and county, mirroring the n8n HTTP Request nodes."""
+    lat, lon = county["lat"], county["lon"]
+    if source in ("fema", "arcgis"):
+        params = {
+            "geometry": f"{lon},{lat}",
+            "geometryType": "esriGeometryPoint",
+            "inSR": "4326",
+            "spatialRel": "esriSpatialRelIntersects",
+            "outFields": "*",
+            "f": "json",
+        }
+        return urls[source], params, {}
+    if source == "nws":
+        return urls["nws"], {"point": f"{lat},{lon}"}, {"User-Agent": NWS_USER_AGENT, "Accept": "application/geo+json"}
+    if source == "usgs":
+        return urls["usgs"], {"x": lon, "y": lat, "units": "Feet", "output": "json"}, {}
+    if source == "census":
+        params = {"get": ACS_FIELDS, "for": "county:*", "in": f"state:{FL_STATE_FIPS}"}
+        if census_key:
+            params["key"] = census_key
+        return urls["census"], params, {}
+    raise ValueError(f"Unknown source: {source}")
+
+
+def _first_feature(raw: Any, note: str) -> Any:
+    if isinstance(raw, dict) and raw.get("features"):
+        feature = raw["features"][0]
+        return feature.get("attributes") or feature if isinstance(feature, dict) else feature
+    return {"note": note}
+
+
+def normalize_source(source: str, raw: Any, county: Dict[str, Any]) -> Any:
+    """Reduce a raw source response to what the n8n normalizers kept."""
+    if source == "fema":
+        return _first_feature(raw, "No NFHL feature")
+    if source == "arcgis":
+        return _first_feature(raw, "No parcel feature; check county service URL")
+    if source == "nws":
+        if isinstance(raw, dict) and isinstance(raw.get("features"), list):
+            return [{"id": f.get("id"), "properties": f.get("properties")} for f in raw["features"]]
+        return {"note": "No active alerts for point"}
+    if source == "usgs":
+        service = raw.get("USGS_Elevation_Point_Query_Service") if isinstance(raw, dict) else None
+        if service:
+            return service.get("Elevation_Query", service)
+        return raw if isinstance(raw, dict) and raw.get("value") is not None else {"note": "No elevation result"}
+    return raw
+
+
+def build_document(pipeline: str, county: Dict[str, Any], results: Dict[str, Any], now: datetime) -> Dict[str, str]:
+    """Render one county's knowledge-base document in the same text layout as the n8n flows."""
+    name, lat, lon = county["name"], county["lat"], county["lon"]
+    dump = lambda value: json.dumps(value, indent=2, default=str)  # noqa: E731
+    if pipeline == "hazards":
+        generated = now.isoformat(timespec="seconds")
+        content = (
+            f"Hazard Report for {name} County, FL\nLocation: {lat}, {lon}\nGenerated: {generated}\n\n"
+            f"FEMA Flood Zone: {dump(results.get('fema'))}\n\n"
+            f"Active Weather Alerts: {dump(results.get('nws'))}\n\n"
+            f"Elevation Data: {dump(results.get('usgs'))}"
+        )
+        return {"name": f"Hazard Report {name} {now.date().isoformat()}", "content": content}
+    content = (
+        f"FL Trends Report for {name} County, FL\nLocation: {lat}, {lon}\nDate: {now.date().isoformat()}\n\n"
+        f"Census Data (ACS):\n{dump(results.get('census'))}\n\n"
+        f"County Parcel/Zoning Info:\n{dump(results.get('arcgis'))}"
+    )
+    return {"name": f"FL Trends {name} {now.date().isoformat()}", "content": content}
+
+
+# --- checkpoint and manifest ---------------------------------------------------------------------------------
+
+
+def source_hashes(results: Dict[str, Any]) -> Dict[str, str]:
+    """Content hash of each source's normalized result (canonical JSON), independent of the report date."""
+    return {
+        source: hashlib.sha256(
+            json.dumps(value, sort_keys=True, separators=(",", ":"), default=str).encode("utf-8")
+        ).hexdigest()
+        for source, value in results.items()
+    }
+
+
+class IngestState:
+    """SQLite checkpoint and knowledge-base manifest.
+
+    `progress` tracks each (run, pipeline, county): 'fetched' documents waiting for upload, then 'uploaded',
+    'unchanged' or 'failed'. The manifest is kept across runs. `manifest_sources` holds the content hash last
+    uploaded per (kb_id, county, source), and `manifest_docs` holds the document currently in the knowledge
+    base. `superseded` queues replaced documents until they are deleted.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS progress ("
+                "run_id TEXT NOT NULL, pipeline TEXT NOT NULL, county TEXT NOT NULL, status TEXT NOT NULL, "
+                "doc_name TEXT, content TEXT, error TEXT, updated_at REAL NOT NULL, hashes TEXT, "
+                "PRIMARY KEY (run_id, pipeline, county))"
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(progress)")}
+            if "hashes" not in columns:  # checkpoints written before the manifest existed
+                conn.execute("ALTER TABLE progress ADD COLUMN hashes TEXT")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS manifest_sources ("
+                "kb_id TEXT NOT NULL, county TEXT NOT NULL, source TEXT NOT NULL, hash TEXT NOT NULL, "
+                "updated_at REAL NOT NULL, PRIMARY KEY (kb_id, county, source))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS manifest_docs ("
+                "kb_id TEXT NOT NULL, county TEXT NOT NULL, doc_name TEXT NOT NULL, doc_id TEXT, "
+                "updated_at REAL NOT NULL, PRIMARY KEY (kb_id, county))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS superseded ("
+                "kb_id TEXT NOT NULL, county TEXT NOT NULL, doc_name TEXT NOT NULL, doc_id TEXT, "
+                "created_at REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def load(self, run_id: str, pipeline: str) -> Dict[str, Tuple[str, Optional[Dict[str, str]], Dict[str, str]]]:
+        """Return {county: (status, document or None, source hashes)} recorded for a run and pipeline."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT county, status, doc_name, content, hashes FROM progress WHERE run_id = ? AND pipeline = ?",
+                (run_id, pipeline),
+            ).fetchall()
+        return {
+            county: (
+                status,
+                {"name": name, "content": content} if content is not None else None,
+                json.loads(hashes) if hashes else {},
+            )
+            for county, status, name, content, hashes in rows
+        }
+
+    def save_fetched(
+        self, run_id: str, pipeline: str, county: str, document: Dict[str, str], hashes: Dict[str, str]
+    ) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO progress (run_id, pipeline, county, status, doc_name, content, error, "
+                "updated_at, hashes) VALUES (?, ?, ?, 'fetched', ?, ?, NULL, ?, ?)",
+                (run_id, pipeline, county, document["name"], document["content"], time.time(), json.dumps(hashes)),
+            )
+
+    def save_status(self, run_id: str, pipeline: str, county: str, status: str, error: Optional[str] = None) -> None:
+        """Record a county that needs no upload: 'unchanged', or 'failed' (retried on the next run)."""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO progress (run_id, pipeline, county, status, doc_name, content, error, "
+                "updated_at, hashes) VALUES (?, ?, ?, ?, NULL, NULL, ?, ?, NULL)",
+                (run_id, pipeline, county, status, error, time.time()),
+            )
+
+    def load_manifest(self, kb_id: str) -> Dict[str, Dict[str, Any]]:
+        """Return {county: {"doc_name", "doc_id", "hashes": {source: hash}}} for a knowledge base."""
+        manifest: Dict[str, Dict[str, Any]] = {}
+        with self._connect() as conn:
+            for county, name, doc_id in conn.execute(
+                "SELECT county, doc_name, doc_id FROM manifest_docs WHERE kb_id = ?", (kb_id,)
+            ):
+                manifest[county] = {"doc_name": name, "doc_id": doc_id, "hashes": {}}
+            for county, source, digest in conn.execute(
+                "SELECT county, source, hash FROM manifest_sources WHERE kb_id = ?", (kb_id,)
+            ):
+                manifest.setdefault(county, {"doc_name": None, "doc_id": None, "hashes": {}})["hashes"][source] = digest
+        return manifest
+
+    def commit_uploads(
+        self, run_id: str, pipeline: str, kb_id: str, uploads: List[Tuple[str, str, Optional[str], Dict[str, str]]]
+    ) -> None:
+        """Record a batch of (county, doc_name, doc_id, hashes) uploads in one transaction.
+
+        Marks them uploaded, replaces their manifest entries and queues each replaced document for deletion.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            for county, name, doc_id, hashes in uploads:
+                previous = conn.execute(
+                    "SELECT doc_name, doc_id FROM manifest_docs WHERE kb_id = ? AND county = ?", (kb_id, county)
+                ).fetchone()
+                # Without ids, a same-named re-upload cannot be told apart from the old document; keep both.
+                if previous is not None and (previous[1] != doc_id if previous[1] else previous[0] != name):
+                    conn.execute(
+                        "INSERT INTO superseded (kb_id, county, doc_name, doc_id, created_at) VALUES (?, ?, ?, ?, ?)",
+                        (kb_id, county, previous[0], previous[1], now),
+                    )
+                conn.execute(
+                    "INSERT OR REPLACE INTO manifest_docs (kb_id, county, doc_name, doc_id, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (kb_id, county, name, doc_id, now),
+                )
+                conn.executemany(
+                    "INSERT OR REPLACE INTO manifest_sources (kb_id, county, source, hash, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [(kb_id, county, source, digest, now) for source, digest in hashes.items()],
+                )
+                conn.execute(
+                    "UPDATE progress SET status = 'uploaded', updated_at = ? WHERE run_id = ? AND pipeline = ? "
+                    "AND county = ?",
+                    (now, run_id, pipeline, county),
+                )
+
+    def load_superseded(self, kb_id: str) -> List[Tuple[int, str, str, Optional[str]]]:
+        """Return queued (rowid, county, doc_name, doc_id) deletions for a knowledge base."""
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT rowid, county, doc_name, doc_id FROM superseded WHERE kb_id = ? ORDER BY rowid", (kb_id,)
+            ).fetchall()
+
+    def clear_superseded(self, rowids: List[int]) -> None:
+        with self._connect() as conn:
+            conn.executemany("DELETE FROM superseded WHERE rowid = ?", [(rowid,) for rowid in rowids])
+
+
+# --- runner --------------------------------------------------------------------------------------------------
+
+
+def _document_id(response: requests.Response) -> Optional[str]:
+    """Best-effort id of the stored document from an OpenWebUI upload response."""
+    try:
+        data = response.json()
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    for candidate in (data.get("id"), data.get("file_id"), (data.get("file") or {}).get("id")):
+        if candidate:
+            return str(candidate)
+    return None
+
+
+class IngestRunner:
+    """Fetch every county's sources concurrently and push changed documents to OpenWebUI in batches.
+
+    A county is uploaded only when the content hash of one of its sources differs from the manifest. The
+    document it replaces is deleted afterwards. With `dry_run`, nothing is uploaded, deleted or written to
+    the state file, and the summary lists what would change.
+    """
+
+    def __init__(
+        self,
+        client: HostLimitedClient,
+        state: IngestState,
+        openwebui_url: str,
+        openwebui_token: str,
+        source_urls: Optional[Dict[str, str]] = None,
+        census_key: str = "",
+        census_cache_dir: Optional[str] = None,
+        census_refresh: bool = False,
+        upload_batch_size: int = 10,
+        run_id: Optional[str] = None,
+        dry_run: bool = False,
+        delete_superseded: bool = True,
+        upload_path: str = "/api/retrieval/process/text",
+        delete_path: str = "/api/v1/retrieval/delete",
+        log=print,
+    ):
+        self.client = client
+        self.state = state
+        self.openwebui_url = openwebui_url.rstrip("/")
+        self.openwebui_token = openwebui_token
+        self.source_urls = {**DEFAULT_SOURCE_URLS, **(source_urls or {})}
+        self.census_key = census_key
+        self.census_cache_dir = census_cache_dir
+        self.census_refresh = census_refresh
+        self._census_task: Optional[asyncio.Future] = None
+        self.upload_batch_size = max(1, upload_batch_size)
+        self.now = datetime.now(timezone.utc)
+        self.run_id = run_id or self.now.date().isoformat()
+        self.dry_run = dry_run
+        self.delete_superseded = delete_superseded
+        self.upload_path = upload_path
+        self.delete_path = delete_path
+        self.log = log
+
+    async def _load_census(self) -> CensusIndex:
+        url = self.source_urls["census"]
+        vintage = acs_vintage(url)
+        loop = asyncio.get_event_loop()
+        table = None
+        if self.census_cache_dir and not self.census_refresh:
+            table = await loop.run_in_executor(None, load_cached_census, self.census_cache_dir, vintage)
+        if table is not None:
+            return CensusIndex(table, vintage)
+        _, params, _ = source_request("census", {"lat": 0, "lon": 0}, self.source_urls, self.census_key)
+        table = await self.client.get_json(url, params=params)
+        index = CensusIndex(table, vintage)  # validate before caching
+        if self.census_cache_dir:
+            await loop.run_in_executor(None, store_cached_census, self.census_cache_dir, vintage, table)
+        return index
+
+    def census_index(self) -> "asyncio.Future[CensusIndex]":
+        """Statewide ACS table, fetched (or read from disk) once per run and shared by every county."""
+        if self._census_task is None:
+            self._census_task = asyncio.ensure_future(self._load_census())
+        return self._census_task
+
+    async def fetch_source(self, source: str, county: Dict[str, Any]) -> Any:
+        if source == "census":
+            index = await asyncio.shield(self.census_index())
+            return index.lookup(county)
+        url, params, headers = source_request(source, county, self.source_urls, self.census_key)
+        raw = await self.client.get_json(url, params=params, headers=headers or None)
+        return normalize_source(source, raw, county)
+
+    async def fetch_county(self, pipeline: str, county: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Fetch all of a pipeline's sources for one county at once; failed sources become {"error": ...}."""
+        sources = PIPELINE_SOURCES[pipeline]
+        outcomes = await asyncio.gather(*(self.fetch_source(s, county) for s in sources), return_exceptions=True)
+        results, errors = {}, {}
+        for source, outcome in zip(sources, outcomes):
+            if isinstance(outcome, Exception):
+                errors[source] = f"{type(outcome).__name__}: {outcome}"
+                results[source] = {"error": errors[source]}
+            else:
+                results[source] = outcome
+        return results, errors
+
+    def _headers(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.openwebui_token}", "Content-Type": "application/json"}
+
+    async def upload_batch(
+        self, pipeline: str, kb_id: str, batch: List[Tuple[str, Dict[str, str], Dict[str, str]]]
+    ) -> int:
+        """POST a batch of documents concurrently; record the ones that succeeded in one transaction."""
+        url = f"{self.openwebui_url}{self.upload_path}"
+
+        async def _one(document: Dict[str, str]) -> Optional[str]:
+            body = {"name": document["name"], "content": document["content"], "collection_name": kb_id}
+            response = await self.client.request("POST", url, json_body=body, headers=self._headers())
+            return _document_id(response)
+
+        outcomes = await asyncio.gather(*(_one(doc) for _, doc, _ in batch), return_exceptions=True)
+        done = []
+        for (county, document, hashes), outcome in zip(batch, outcomes):
+            if isinstance(outcome, Exception):
+                self.log(f"[{pipeline}] upload failed for {county}: {outcome}")
+            else:
+                done.append((county, document["name"], outcome, hashes))
+        if done:
+            await asyncio.get_event_loop().run_in_executor(
+                None, self.state.commit_uploads, self.run_id, pipeline, kb_id, done
+            )
+        return len(done)
+
+    async def delete_superseded_docs(self, pipeline: str, kb_id: str) -> int:
+        """Delete every queued superseded document of a knowledge base; failures stay queued for the next run."""
+        loop = asyncio.get_event_loop()
+        pending = await loop.run_in_executor(None, self.state.load_superseded, kb_id)
+        if not pending:
+            return 0
+        url = f"{self.openwebui_url}{self.delete_path}"
+
+        async def _one(row: Tuple[int, str, str, Optional[str]]) -> None:
+            _, _, name, doc_id = row
+            body = {"collection_name": kb_id, "file_id": doc_id or name, "name": name}
+            await self.client.request("POST", url, json_body=body, headers=self._headers())
+
+        outcomes = await asyncio.gather(*(_one(row) for row in pending), return_exceptions=True)
+        deleted = [row[0] for row, outcome in zip(pending, outcomes) if not isinstance(outcome, Exception)]
+        for row, outcome in zip(pending, outcomes):
+            if isinstance(outcome, Exception):
+                self.log(f"[{pipeline}] delete of superseded '{row[2]}' failed: {outcome}")
+        if deleted:
+            await loop.run_in_executor(None, self.state.clear_superseded, deleted)
+        return len(deleted)
+
+    async def run_pipeline(self, pipeline: str, counties: List[Dict[str, Any]], kb_id: str) -> Dict[str, Any]:
+        loop = asyncio.get_event_loop()
+        sources = PIPELINE_SOURCES[pipeline]
+        manifest = await loop.run_in_executor(None, self.state.load_manifest, kb_id)
+        progress = {} if self.dry_run else await loop.run_in_executor(None, self.state.load, self.run_id, pipeline)
+        summary: Dict[str, Any] = {"pipeline": pipeline, "kb_id": kb_id, "counties": len(counties), "skipped": 0,
+                                   "fetched": 0, "reused": 0, "unchanged": 0, "failed": 0, "uploaded": 0,
+                                   "deleted": 0, "source_errors": 0, "changed_sources": {s: 0 for s in sources}}  # fmt: skip
+        if self.dry_run:
+            pending = await loop.run_in_executor(None, self.state.load_superseded, kb_id)
+            summary.update({"dry_run": True, "would_upload": [], "would_delete": [row[2] for row in pending]})
+
+        batch: List[Tuple[str, Dict[str, str], Dict[str, str]]] = []
+        to_fetch = []
+        for county in counties:
+            status, document, hashes = progress.get(county["name"], (None, None, {}))
+            if status in ("uploaded", "unchanged"):
+                summary["skipped"] += 1
+            elif status == "fetched" and document is not None:
+                summary["reused"] += 1
+                batch.append((county["name"], document, hashes))
+            else:
+                to_fetch.append(county)
+
+        async def _fetch(county: Dict[str, Any]):
+            results, errors = await self.fetch_county(pipeline, county)
+            return county, results, errors
+
+        async def _flush(force: bool = False) -> None:
+            nonlocal batch
+            while batch and (force or len(batch) >= self.upload_batch_size):
+                chunk, batch = batch[: self.upload_batch_size], batch[self.upload_batch_size :]
+                summary["uploaded"] += await self.upload_batch(pipeline, kb_id, chunk)
+
+        if not self.dry_run:
+            await _flush()
+        for future in asyncio.as_completed([_fetch(c) for c in to_fetch]):
+            county, results, errors = await future
+            name = county["name"]
+            previous = manifest.get(name)
+            summary["source_errors"] += len(errors)
+            if len(errors) == len(sources) or (errors and previous):
+                # Keep the document already in the knowledge base rather than replacing it with error entries.
+                summary["failed"] += 1
+                if not self.dry_run:
+                    await loop.run_in_executor(
+                        None, self.state.save_status, self.run_id, pipeline, name, "failed", json.dumps(errors)
+                    )
+                self.log(f"[{pipeline}] {name}: {', '.join(errors)} failed; will retry on the next run")
+                continue
+            hashes = source_hashes(results)
+            changed = [s for s in sources if previous is None or previous["hashes"].get(s) != hashes.get(s)]
+            if not changed:
+                summary["unchanged"] += 1
+                if not self.dry_run:
+                    await loop.run_in_executor(None, self.state.save_status, self.run_id, pipeline, name, "unchanged")
+                continue
+            for source in changed:
+                summary["changed_sources"][source] += 1
+            document = build_document(pipeline, county, results, self.now)
+            summary["fetched"] += 1
+            if self.dry_run:
+                summary["would_upload"].append(name)
+                if previous is not None and previous.get("doc_name"):
+                    summary["would_delete"].append(previous["doc_name"])
+                continue
+            await loop.run_in_executor(None, self.state.save_fetched, self.run_id, pipeline, name, document, hashes)
+            batch.append((name, document, hashes))
+            await _flush()
+        if not self.dry_run:
+            await _flush(force=True)
+            if self.delete_superseded:
+                summary["deleted"] = await self.delete_superseded_docs(pipeline, kb_id)
+        return summary
+
+    async def run(self, pipelines: List[str], counties: List[Dict[str, Any]], kb_ids: Dict[str, str]) -> Dict[str, Any]:
+        started = time.perf_counter()
+        summaries = await asyncio.gather(*(self.run_pipeline(p, counties, kb_ids[p]) for p in pipelines))
+        return {
+            "run_id": self.run_id,
+            "elapsed_s": round(time.perf_counter() - started, 2),
+            "pipelines": list(summaries),
+            "http": self.client.stats,
+        }
+
+
+def _parse_pairs(values: List[str], cast=str) -> Dict[str, Any]:
+    pairs = {}
+    for item in values or []:
+        key, sep, value = item.partition("=")
+        if not sep:
+            raise argparse.ArgumentTypeError(f"Expected KEY=VALUE, got {item!r}")
+        pairs[key.strip()] = cast(value.strip())
+    return pairs
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pipeline", choices=["hazards", "trends", "all"], default="all")
+    parser.add_argument("--counties", default=os.path.join(ROOT, "n8n", "trends.json"),
+                        help="n8n export or JSON list with name/lat/lon per county.")  # fmt: skip
+    parser.add_argument("--openwebui-url", default=os.environ.get("OPENWEBUI_API_URL", "https://openwebui.local"))
+    parser.add_argument("--openwebui-token", default=os.environ.get("OPENWEBUI_API_TOKEN", ""))
+    parser.add_argument("--kb-id", action="append", default=[], metavar="PIPELINE=KB_ID",
+                        help="Override a pipeline's knowledge base id (defaults come from the environment).")  # fmt: skip
+    parser.add_argument("--source-url", action="append", default=[], metavar="SOURCE=URL",
+                        help=f"Override a source endpoint ({', '.join(DEFAULT_SOURCE_URLS)}).")  # fmt: skip
+    parser.add_argument("--per-host-limit", type=int, default=4, help="Concurrent requests per host.")
+    parser.add_argument("--host-limit", action="append", default=[], metavar="HOST=N",
+                        help="Per-host override, e.g. api.weather.gov=2.")  # fmt: skip
+    parser.add_argument("--upload-batch-size", type=int, default=10)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--max-retries", type=int, default=3)
+    parser.add_argument("--retry-after-max", type=float, default=120.0,
+                        help="Longest Retry-After to wait out; a longer one fails the request (0: no limit).")  # fmt: skip
+    parser.add_argument("--state", default=os.path.join(ROOT, "data", "ingest_state.db"))
+    parser.add_argument("--census-cache-dir", default=os.path.join(ROOT, "data", "census"),
+                        help="Directory for the statewide ACS table, cached by vintage ('' disables).")  # fmt: skip
+    parser.add_argument("--census-refresh", action="store_true", help="Refetch the ACS table even if cached.")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Fetch and compare against the manifest, report what would be uploaded or deleted, "
+                        "and change nothing.")  # fmt: skip
+    parser.add_argument("--no-delete", action="store_true", help="Keep superseded documents in the knowledge base.")
+    parser.add_argument("--delete-path", default="/api/v1/retrieval/delete",
+                        help="OpenWebUI endpoint that removes a document from a collection.")  # fmt: skip
+    parser.add_argument("--run-id", help="Checkpoint id; reruns with the same id resume (default: today's date).")
+    args = parser.parse_args(argv)
+
+    counties = load_counties(args.counties)
+    pipelines = list(PIPELINE_SOURCES) if args.pipeline == "all" else [args.pipeline]
+    kb_ids = {p: os.environ.get(env, default) for p, (env, default) in PIPELINE_KB_ENV.items()}
+    kb_ids.update(_parse_pairs(args.kb_id))
+
+    client = HostLimitedClient(
+        per_host_limit=args.per_host_limit,
+        host_limits=_parse_pairs(args.host_limit, int),
+        timeout=args.timeout,
+        max_retries=args.max_retries,
+        retry_after_max=args.retry_after_max,
+    )
+    runner = IngestRunner(
+        client,
+        IngestState(args.state),
+        args.openwebui_url,
+        args.openwebui_token,
+        source_urls=_parse_pairs(args.source_url),
+        census_key=os.environ.get("CENSUS_API_KEY", ""),
+        census_cache_dir=args.census_cache_dir or None,
+        census_refresh=args.census_refresh,
+        upload_batch_size=args.upload_batch_size,
+        run_id=args.run_id,
+        dry_run=args.dry_run,
+        delete_superseded=not args.no_delete,
+        delete_path=args.delete_path,
+    )
+    try:
+        report = asyncio.run(runner.run(pipelines, counties, kb_ids))
+    finally:
+        client.close()
+    print(json.dumps(report, indent=2))
+    if args.dry_run:
+        return 0
+    incomplete = any(s["failed"] or s["uploaded"] < s["fetched"] + s["reused"] for s in report["pipelines"])
+    return 1 if incomplete else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
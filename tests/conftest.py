@@ -0,0 +1,43 @@
+import asyncio
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "tools"))
+sys.path.insert(0, os.path.join(ROOT, "bench"))
+
+import pytest  # noqa: E402
+
+import repliers_search_tool_v2 as tool  # noqa: E402
+from stub_server import StubConfig, serve_in_thread  # noqa: E402
+
+
+@pytest.fixture
+def stub():
+    """A Repliers stub on a free port; yields (server, base_url)."""
+    server = serve_in_thread(StubConfig(listings=40, latency_ms=200))
+    yield server, f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+@pytest.fixture
+def make_tools():
+    """Build Tools instances pointed at a base URL with background features off; closes them afterwards."""
+    created = []
+
+    def _make(base_url: str, **valves) -> "tool.Tools":
+        tools = tool.Tools()
+        tools.valves.base_url = base_url
+        tools.valves.rapidapi_key = "test"
+        tools.valves.enable_debug_output = False
+        tools.valves.metrics_enabled = False
+        tools.valves.analytics_enabled = False
+        tools.valves.rate_limit_per_second = 0
+        for name, value in valves.items():
+            setattr(tools.valves, name, value)
+        created.append(tools)
+        return tools
+
+    yield _make
+    for tools in created:
+        asyncio.run(tools._client.aclose())
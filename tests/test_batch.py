@@ -0,0 +1,27 @@
+import asyncio
+
+
+def test_batch_rejects_unknown_query_keys(stub, make_tools):
+    _, base_url = stub
+    tools = make_tools(base_url)
+    sent = []
+    run_search = tools._run_search
+
+    async def _recording_run_search(params, eventer, **kwargs):
+        sent.append(params)
+        return await run_search(params, eventer, **kwargs)
+
+    tools._run_search = _recording_run_search
+    output = asyncio.run(
+        tools.search_listings_batch(
+            [
+                {"label": "ok", "city": "Tampa", "class_": "condo", "maxPrice": "400k", "max_results": 5},
+                {"label": "typo", "city": "Tampa", "maxPirce": 400000, "colour": "blue"},
+                {"label": "incremental", "city": "Tampa", "incremental": True},
+            ]
+        )
+    )
+    assert "(1 succeeded, 2 failed)" in output
+    assert "Unsupported search parameters: colour, maxPirce" in output
+    assert "Unsupported search parameters: incremental" in output
+    assert len(sent) == 1 and sent[0]["class"] == "condo"
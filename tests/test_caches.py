@@ -0,0 +1,88 @@
+import asyncio
+import multiprocessing
+import sqlite3
+import time
+from contextlib import closing
+
+import repliers_search_tool_v2 as tool
+
+
+def test_stats_cache_uses_its_own_sqlite_file(make_tools, tmp_path):
+    tools = make_tools(
+        "http://repliers.invalid",
+        cache_backend="sqlite",
+        cache_path=str(tmp_path / "responses.db"),
+        market_stats_cache_path=str(tmp_path / "stats.db"),
+    )
+    responses, stats = tools._get_cache(), tools._get_stats_cache()
+    assert responses.path != stats.path
+    stats.set("k", ({"count": 1}, 10))
+    assert responses.get("k") is None
+    assert stats.get("k") == [{"count": 1}, 10]
+
+
+def _search_in_process(base_url, cache_path, prices):
+    tools = tool.Tools()
+    tools.valves.base_url = base_url
+    tools.valves.rapidapi_key = "test"
+    tools.valves.enable_debug_output = False
+    tools.valves.metrics_enabled = False
+    tools.valves.analytics_enabled = False
+    tools.valves.rate_limit_per_second = 0
+    tools.valves.cache_backend = "sqlite"
+    tools.valves.cache_path = cache_path
+
+    async def _run():
+        for price in prices:
+            output = await tools.search_listing(city="Tampa", minPrice=price, resultsPerPage=5)
+            assert output.startswith("Listing search complete"), output[:200]
+        await tools._client.aclose()
+
+    asyncio.run(_run())
+
+
+def test_sqlite_cache_is_shared_across_processes(stub, tmp_path):
+    server, base_url = stub
+    cache_path = str(tmp_path / "cache.db")
+    prices = [100000, 200000, 300000]
+    context = multiprocessing.get_context("fork")
+
+    def _start(count):
+        args = (base_url, cache_path, prices)
+        workers = [context.Process(target=_search_in_process, args=args) for _ in range(count)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(timeout=60)
+            assert worker.exitcode == 0
+
+    _start(1)
+    assert server.request_counts["POST"] == len(prices)
+    _start(4)
+    assert server.request_counts["POST"] == len(prices)
+
+
+def test_sqlite_cache_returns_any_json_value(tmp_path):
+    cache = tool._SQLiteCache(str(tmp_path / "cache.db"))
+    cache.set("flood/dhvnp", {"zone": "AE", "sfha": True})
+    cache.set("pair", ({"count": 1}, 10))
+    assert cache.get("flood/dhvnp") == {"zone": "AE", "sfha": True}
+    assert cache.get("pair") == [{"count": 1}, 10]
+
+
+def _accessed_at(cache, key):
+    with closing(sqlite3.connect(cache.path)) as conn:
+        return conn.execute("SELECT accessed_at FROM cache WHERE key = ?", (cache._hash(key),)).fetchone()[0]
+
+
+def test_sqlite_cache_hits_only_touch_stale_read_times(tmp_path):
+    cache = tool._SQLiteCache(str(tmp_path / "cache.db"))
+    cache.set("k", [1])
+    stored = _accessed_at(cache, "k")
+    assert cache.get("k") == [1]
+    assert _accessed_at(cache, "k") == stored
+
+    cache.touch_seconds = 0
+    time.sleep(0.01)
+    assert cache.get("k") == [1]
+    assert _accessed_at(cache, "k") > stored
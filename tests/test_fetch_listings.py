@@ -0,0 +1,55 @@
+import asyncio
+
+
+def test_follower_survives_cancelled_leader(stub, make_tools):
+    _, base_url = stub
+    tools = make_tools(base_url, cache_enabled=False)
+    url = f"{base_url}/listings"
+    params = {"city": "Tampa", "resultsPerPage": 5}
+
+    async def _run():
+        leader = asyncio.ensure_future(tools._fetch_listings(url, params, {}))
+        await asyncio.sleep(0.05)  # leader is waiting on the stub
+        follower = asyncio.ensure_future(tools._fetch_listings(url, params, {}))
+        await asyncio.sleep(0.05)
+        leader.cancel()
+        data, meta = await follower
+        assert leader.cancelled()
+        return data
+
+    data = asyncio.run(_run())
+    assert len(data["listings"]) == 5
+
+
+def test_cancelled_follower_still_raises(stub, make_tools):
+    _, base_url = stub
+    tools = make_tools(base_url, cache_enabled=False)
+    url = f"{base_url}/listings"
+    params = {"city": "Tampa", "resultsPerPage": 5}
+
+    async def _run():
+        leader = asyncio.ensure_future(tools._fetch_listings(url, params, {}))
+        await asyncio.sleep(0.05)
+        follower = asyncio.ensure_future(tools._fetch_listings(url, params, {}))
+        await asyncio.sleep(0.05)
+        follower.cancel()
+        data, _ = await leader
+        assert follower.cancelled()
+        return data
+
+    assert len(asyncio.run(_run())["listings"]) == 5
+
+
+async def _noop(event):
+    pass
+
+
+def test_capped_search_reports_its_fetched_prefix(stub, make_tools):
+    _, base_url = stub
+    tools = make_tools(base_url, cache_enabled=False, max_pages_cap=3)
+
+    result = asyncio.run(
+        tools._run_search({"city": "Tampa", "resultsPerPage": 5}, _noop, fetch_all_pages=True, stream_pages=False)
+    )
+    assert not result["complete"]
+    assert len(result["listings"]) == result["prefix_listings"] == 15
@@ -0,0 +1,52 @@
+import copy
+import glob
+import json
+import os
+
+import pytest
+
+import repliers_search_tool_v2 as tool
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def _fixture_listings():
+    listings = []
+    for path in sorted(glob.glob(os.path.join(ROOT, "json", "*.json"))):
+        with open(path, encoding="utf-8") as fh:
+            listings.extend(tool._extract_listings(json.load(fh)))
+    return listings
+
+
+def _fallback_variants(listing):
+    """Copies of a listing with each spec's first path removed, so the formatter reads its fallbacks."""
+    variants = []
+    for spec in tool._LISTING_FIELD_SPECS:
+        keys = spec[1][0].split(".")
+        variant = copy.deepcopy(listing)
+        owner = variant
+        for key in keys[:-1]:
+            owner = owner.get(key) if isinstance(owner, dict) else None
+        if isinstance(owner, dict) and keys[-1] in owner:
+            value = owner.pop(keys[-1])
+            if len(spec[1]) > 1 and "." not in spec[1][1]:
+                variant[spec[1][1]] = value
+            variants.append(variant)
+    return variants
+
+
+LISTINGS = _fixture_listings()
+
+
+def test_fixtures_are_present():
+    assert LISTINGS
+
+
+@pytest.mark.parametrize("listing", LISTINGS + [v for item in LISTINGS for v in _fallback_variants(item)])
+def test_projection_to_formatter_fields_formats_the_same(listing):
+    projected = tool._project(listing, list(tool._FORMATTER_FIELDS))
+    assert tool._format_listings([projected]) == tool._format_listings([listing])
+
+
+def test_lean_fields_cover_the_formatter_manifest():
+    assert set(tool._lean_fields().split(",")) >= set(tool._FORMATTER_FIELDS)
@@ -0,0 +1,130 @@
+import asyncio
+import os
+import re
+
+import pytest
+
+import bench_images
+import repliers_search_tool_v2 as tool
+
+
+@pytest.fixture
+def cdn():
+    """An image CDN stub whose variants scale with `?width=`; yields (base_url, counts)."""
+    server, counts = bench_images._serve_cdn(0)
+    yield f"http://127.0.0.1:{server.server_address[1]}", counts
+    server.shutdown()
+
+
+@pytest.fixture
+def image_tools(stub, cdn, make_tools, tmp_path):
+    """Build tools with the image stage on against the stub and CDN, thumbnails in tmp_path/thumbs."""
+    _, base_url = stub
+    cdn_url, _ = cdn
+
+    def _make(**valves):
+        options = {
+            "image_stage_enabled": True,
+            "image_cdn_url": cdn_url,
+            "image_thumbnail_dir": str(tmp_path / "thumbs"),
+            "image_thumbnail_base_url": "/cache/test-thumbs",
+            "output_mode": "summary",
+        }
+        return make_tools(base_url, **{**options, **valves})
+
+    return _make
+
+
+def _photo_lines(output):
+    return [line for line in output.splitlines() if line.startswith("   Photos:")]
+
+
+def test_photos_line_links_hero_and_gallery_variants(image_tools, cdn):
+    cdn_url, _ = cdn
+    tools = image_tools(image_gallery_links=2)
+    lines = _photo_lines(asyncio.run(tools.search_listing(resultsPerPage=3)))
+    assert len(lines) == 3
+    images = tools._photo_index.get("STUB0000000")
+    assert lines[0] == tool._photo_line(
+        tool._image_url(cdn_url, images[0], 600),
+        [tool._image_url(cdn_url, path, 300) for path in images[1:3]],
+        len(images) - 1,
+        "STUB0000000",
+    )
+    assert f"+{len(images) - 3} more via listing_photos(mlsNumber=\"STUB0000000\")" in lines[0]
+
+
+def test_thumbnails_are_reused_by_a_fresh_instance(image_tools, cdn):
+    _, counts = cdn
+    first = image_tools(image_thumbnail_cache_enabled=True)
+    lines = _photo_lines(asyncio.run(first.search_listing(resultsPerPage=5)))
+    assert counts["requests"] == 5
+    assert all(" hero /cache/test-thumbs/" in line for line in lines)
+
+    second = image_tools(image_thumbnail_cache_enabled=True)
+    assert _photo_lines(asyncio.run(second.search_listing(resultsPerPage=5))) == lines
+    assert counts["requests"] == 5
+    assert second._get_thumbnail_cache().stats()["hits"] == 5
+
+
+def test_thumbnail_directory_is_capped(image_tools, tmp_path):
+    cap = 5 * 30_000  # five 300px variants from the CDN stub
+    tools = image_tools(image_thumbnail_cache_enabled=True, image_thumbnail_cache_max_bytes=cap)
+    asyncio.run(tools.search_listing(resultsPerPage=10))
+    directory = tmp_path / "thumbs"
+    on_disk = sum(os.path.getsize(directory / name) for name in os.listdir(directory))
+    stats = tools._get_thumbnail_cache().stats()
+    assert stats["evictions"] == 5
+    assert on_disk == stats["bytes"] <= cap
+
+
+def test_thumbnail_cache_evicts_least_recently_used(tmp_path):
+    cache = tool._ThumbnailCache(str(tmp_path), max_bytes=250)
+    for age, name in enumerate(["b.jpg", "a.jpg"]):
+        cache.store(name, bytes(100))
+        os.utime(tmp_path / name, (1000 + age, 1000 + age))
+    assert cache.lookup(["b.jpg"]) == {"b.jpg"}  # now newer than a.jpg
+    cache.store("c.jpg", bytes(100))
+    assert sorted(os.listdir(tmp_path)) == ["b.jpg", "c.jpg"]
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] == 200
+
+
+def test_thumbnail_overwrite_is_counted_once(tmp_path):
+    cache = tool._ThumbnailCache(str(tmp_path), max_bytes=250)
+    cache.store("a.jpg", bytes(100))
+    cache.store("a.jpg", bytes(120))
+    cache.store("a.jpg", bytes(120))
+    assert cache.stats()["bytes"] == 120
+    assert cache.stats()["evictions"] == 0
+
+
+def test_listing_photos_pages_remembered_images(stub, image_tools, cdn):
+    server, _ = stub
+    cdn_url, _ = cdn
+    tools = image_tools()
+    asyncio.run(tools.search_listing(resultsPerPage=1))
+    images = tools._photo_index.get("STUB0000000")
+    posts = server.request_counts["POST"]
+
+    page = asyncio.run(tools.listing_photos(mlsNumber="STUB0000000", start=3, count=2))
+    assert page.splitlines() == [
+        f"Photos for STUB0000000 ({len(images)} total, showing 3-4):",
+        f"3. ![Photo 3]({tool._image_url(cdn_url, images[2], 300)})",
+        f"4. ![Photo 4]({tool._image_url(cdn_url, images[3], 300)})",
+        'More: listing_photos(mlsNumber="STUB0000000", start=5)',
+    ]
+    last = asyncio.run(tools.listing_photos(mlsNumber="STUB0000000", start=len(images), count=5))
+    assert len(re.findall(r"!\[Photo", last)) == 1 and "More:" not in last
+    past = asyncio.run(tools.listing_photos(mlsNumber="STUB0000000", start=len(images) + 1))
+    assert "past the end" in past
+    assert server.request_counts["POST"] == posts
+
+
+def test_listing_photos_fetches_unknown_listings_once(stub, image_tools):
+    server, _ = stub
+    tools = image_tools()
+    posts = server.request_counts["POST"]
+    output = asyncio.run(tools.listing_photos(mlsNumber="STUB9999999"))
+    assert output == "No photos found for listing STUB9999999."
+    assert server.request_counts["POST"] == posts + 1
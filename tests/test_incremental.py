@@ -0,0 +1,138 @@
+import asyncio
+import json
+
+
+class _Response:
+    def __init__(self, data):
+        self._data = data
+        self.content = json.dumps(data).encode("utf-8")
+
+    def json(self):
+        return self._data
+
+
+def _listing(mls, updated_on):
+    return {"mlsNumber": mls, "timestamps": {"repliersUpdatedOn": updated_on}}
+
+
+def _tools(make_tools, tmp_path, changes, deleted_pages, failing_pages=()):
+    """Fake the changes fetch with (listings, complete[, prefix_listings]) per run and serve deleted_pages."""
+    tools = make_tools("http://repliers.invalid", incremental_store_path=str(tmp_path / "inc.db"), max_pages_cap=5)
+    deleted_requests = []
+    tools.search_params = []
+
+    async def _run_search(params, eventer, **kwargs):
+        listings, complete, *prefix = changes.pop(0)
+        tools.search_params.append(params)
+        return {"url": "", "data": {}, "listings": listings, "meta": {}, "response_bytes": 0,
+                "page_errors": [] if complete else ["page 2: boom"], "complete": complete,
+                "prefix_listings": prefix[0] if prefix else len(listings)}  # fmt: skip
+
+    async def _request(method, url, params, payload=None, stream=False):
+        page = params.get("pageNum", 1)
+        deleted_requests.append(params)
+        if page in failing_pages:
+            raise RuntimeError("boom")
+        return _Response({"page": page, "numPages": len(deleted_pages), "listings": deleted_pages[page - 1]})
+
+    tools._run_search = _run_search
+    tools._client.request = _request
+    return tools, deleted_requests
+
+
+async def _noop(event):
+    pass
+
+
+def test_watermark_advances_over_the_fetched_prefix(make_tools, tmp_path):
+    changes = [
+        ([_listing("A", "2024-01-01T00:00:00Z")], True),
+        ([_listing("B", "2024-02-01T00:00:00Z"), _listing("C", "2024-03-01T00:00:00Z")], False, 1),
+        ([_listing("C", "2024-03-01T00:00:00Z")], True),
+    ]
+    tools, _ = _tools(make_tools, tmp_path, changes, [[]])
+
+    async def _run():
+        first = await tools._run_incremental({"city": "Tampa"}, _noop)
+        second = await tools._run_incremental({"city": "Tampa"}, _noop)
+        third = await tools._run_incremental({"city": "Tampa"}, _noop)
+        return first, second, third
+
+    first, second, third = asyncio.run(_run())
+    assert first["incremental"]["watermark"] == "2024-01-01T00:00:00Z"
+    assert not second["incremental"]["complete"]
+    assert second["incremental"]["watermark"] == "2024-02-01T00:00:00Z"
+    assert third["incremental"]["previous_watermark"] == "2024-02-01T00:00:00Z"
+    assert third["incremental"]["watermark"] == "2024-03-01T00:00:00Z"
+    assert {item["mlsNumber"] for item in third["listings"]} == {"A", "B", "C"}
+
+
+def test_changes_are_fetched_oldest_first(make_tools, tmp_path):
+    changes = [([_listing("A", "2024-01-01T00:00:00Z")], True), ([], True)]
+    tools, _ = _tools(make_tools, tmp_path, changes, [[]])
+
+    async def _run():
+        await tools._run_incremental({"city": "Tampa", "sortBy": "listPriceDesc"}, _noop)
+        await tools._run_incremental({"city": "Tampa", "sortBy": "listPriceDesc"}, _noop)
+
+    asyncio.run(_run())
+    assert [params["sortBy"] for params in tools.search_params] == ["updatedOnAsc", "updatedOnAsc"]
+    assert tools.search_params[1]["minRepliersUpdatedOn"] == "2024-01-01T00:00:00Z"
+
+
+def test_first_run_past_page_cap_stores_a_watermark(make_tools, tmp_path):
+    oldest = [_listing(f"M{i:02d}", f"2024-01-{i + 1:02d}T00:00:00Z") for i in range(20)]
+    changes = [(oldest, False)]  # pages past max_pages_cap were not fetched
+    tools, _ = _tools(make_tools, tmp_path, changes, [[]])
+
+    result = asyncio.run(tools._run_incremental({"city": "Tampa"}, _noop))
+    assert not result["incremental"]["complete"]
+    assert result["incremental"]["watermark"] == "2024-01-20T00:00:00Z"
+
+
+def test_deletions_are_read_from_every_page(make_tools, tmp_path):
+    stored = [_listing(m, "2024-01-01T00:00:00Z") for m in "ABCD"]
+    changes = [(stored, True), ([], True)]
+    deleted_pages = [[{"mlsNumber": "A"}], [{"mlsNumber": "B"}], ["C"]]
+    tools, requests = _tools(make_tools, tmp_path, changes, deleted_pages)
+
+    async def _run():
+        await tools._run_incremental({"city": "Tampa"}, _noop)
+        return await tools._run_incremental({"city": "Tampa"}, _noop)
+
+    result = asyncio.run(_run())
+    assert [item["mlsNumber"] for item in result["listings"]] == ["D"]
+    assert result["incremental"]["deleted"] == 3
+    assert {r.get("pageNum", 1) for r in requests} == {1, 2, 3}
+    assert all(r["minUpdatedOn"] == "2024-01-01" for r in requests)
+
+
+def test_failed_deletion_page_keeps_watermark(make_tools, tmp_path):
+    changes = [
+        ([_listing("A", "2024-01-01T00:00:00Z")], True),
+        ([_listing("B", "2024-03-01T00:00:00Z")], True),
+    ]
+    tools, _ = _tools(make_tools, tmp_path, changes, [[], []], failing_pages=(2,))
+
+    async def _run():
+        await tools._run_incremental({"city": "Tampa"}, _noop)
+        return await tools._run_incremental({"city": "Tampa"}, _noop)
+
+    result = asyncio.run(_run())
+    assert result["incremental"]["watermark"] == "2024-01-01T00:00:00Z"
+    assert {item["mlsNumber"] for item in result["listings"]} == {"A", "B"}
+
+
+def test_deletions_are_paged_past_the_page_cap(make_tools, tmp_path):
+    changes = [([_listing("A", "2024-01-01T00:00:00Z")], True), ([], True)]
+    deleted_pages = [[f"D{page}"] for page in range(8)]  # max_pages_cap is 5
+    tools, requests = _tools(make_tools, tmp_path, changes, deleted_pages)
+
+    async def _run():
+        await tools._run_incremental({"city": "Tampa"}, _noop)
+        return await tools._run_incremental({"city": "Tampa"}, _noop)
+
+    result = asyncio.run(_run())
+    assert {r.get("pageNum", 1) for r in requests} == set(range(1, 9))
+    assert result["incremental"]["deleted"] == 8
+    assert result["incremental"]["complete"]
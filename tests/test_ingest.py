@@ -0,0 +1,112 @@
+import asyncio
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+import pytest
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ingest"))
+
+import bench_ingest  # noqa: E402
+import fl_county_ingest as ingest  # noqa: E402
+
+ARGS = SimpleNamespace(per_host_limit=4, upload_batch_size=4)
+COUNTY_FILE = os.path.join(bench_ingest.ROOT, "n8n", "trends.json")
+
+
+@pytest.fixture
+def ingest_stubs():
+    """Stubs for every ingest source and OpenWebUI over a few counties; yields (stubs, uploads, deletes, state)."""
+    counties = ingest.load_counties(COUNTY_FILE)[:6]
+    stubs, uploads, deletes, state = bench_ingest._start_stubs(counties, 0.005, 0)
+    state["counties"] = counties
+    yield stubs, uploads, deletes, state
+    for stub in stubs.values():
+        stub.server.shutdown()
+
+
+def _expected(counties):
+    return {(kb, county["name"]) for kb in ("fl-hazards", "fl-trends") for county in counties}
+
+
+def test_sweep_uploads_each_document_once(ingest_stubs, tmp_path):
+    stubs, uploads, _, state = ingest_stubs
+    counties = state["counties"]
+
+    report = asyncio.run(bench_ingest._sweep(stubs, counties, ARGS, str(tmp_path / "state.db"), "run"))
+    assert all(s["uploaded"] == s["counties"] for s in report["pipelines"])
+    assert sorted(bench_ingest._uploaded_documents(uploads)) == sorted(_expected(counties))
+    assert stubs["census"].requests == 1  # one statewide table per run
+
+
+def test_failed_run_resumes_with_only_the_rest(ingest_stubs, tmp_path):
+    stubs, uploads, _, state = ingest_stubs
+    counties = state["counties"]
+    state_path = str(tmp_path / "state.db")
+    state["fail_after"] = 5
+
+    first = asyncio.run(bench_ingest._sweep(stubs, counties, ARGS, state_path, "run"))
+    assert sum(s["uploaded"] for s in first["pipelines"]) == 5
+    state["fail_after"] = 0
+    second = asyncio.run(bench_ingest._sweep(stubs, counties, ARGS, state_path, "run"))
+    assert sum(s["skipped"] for s in second["pipelines"]) == 5
+    assert sorted(bench_ingest._uploaded_documents(uploads)) == sorted(_expected(counties))
+
+
+def test_refresh_touches_only_changed_counties(ingest_stubs, tmp_path):
+    stubs, uploads, deletes, state = ingest_stubs
+    counties = state["counties"]
+    state_path = str(tmp_path / "state.db")
+    asyncio.run(bench_ingest._sweep(stubs, counties, ARGS, state_path, "run"))
+    initial_uploads = len(uploads)
+
+    state["nws_changed"] = {f"{c['lat']},{c['lon']}" for c in counties[:2]}
+    dry = asyncio.run(bench_ingest._sweep(stubs, counties, ARGS, state_path, "refresh", dry_run=True))
+    would = {s["pipeline"]: (len(s["would_upload"]), len(s["would_delete"])) for s in dry["pipelines"]}
+    assert would == {"hazards": (2, 2), "trends": (0, 0)}
+    assert len(uploads) == initial_uploads
+
+    refresh = asyncio.run(bench_ingest._sweep(stubs, counties, ARGS, state_path, "refresh"))
+    assert {s["pipeline"]: (s["uploaded"], s["deleted"]) for s in refresh["pipelines"]} == {
+        "hazards": (2, 2),
+        "trends": (0, 0),
+    }
+    assert len(deletes) == 2
+    assert stubs["census"].requests == 1  # the refresh read the table from the disk cache
+
+
+def _throttling_stub(retry_after):
+    calls = []
+
+    def handler(method, path, query, body):
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            return 429, {"detail": "slow down"}, {"Retry-After": retry_after}
+        return 200, {"ok": True}
+
+    return bench_ingest._Stub(handler, 0), calls
+
+
+def test_retry_after_is_waited_out_in_full():
+    stub, calls = _throttling_stub("1")
+    client = ingest.HostLimitedClient(backoff_max=0.01)
+    try:
+        assert asyncio.run(client.get_json(stub.url + "/query")) == {"ok": True}
+    finally:
+        client.close()
+        stub.server.shutdown()
+    assert calls[1] - calls[0] >= 0.95
+
+
+def test_retry_after_past_the_limit_fails_at_once():
+    stub, calls = _throttling_stub("600")
+    client = ingest.HostLimitedClient(retry_after_max=120)
+    try:
+        with pytest.raises(requests.HTTPError):
+            asyncio.run(client.get_json(stub.url + "/query"))
+    finally:
+        client.close()
+        stub.server.shutdown()
+    assert len(calls) == 1
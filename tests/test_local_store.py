@@ -0,0 +1,125 @@
+import asyncio
+import copy
+import json
+import os
+import re
+import sqlite3
+from contextlib import closing
+
+import pytest
+
+import repliers_search_tool_v2 as tool
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+FIXTURE = os.path.join(ROOT, "json", "repliers-api-json-listing-result-example.json")
+
+
+def _fixture_listings():
+    with open(FIXTURE, encoding="utf-8") as fh:
+        base = json.load(fh)["listings"][0]  # MFRW7871972: $145,000 3-bed condo, New Port Richey, FL
+    pricier = copy.deepcopy(base)
+    pricier.update(mlsNumber="T0000002", listPrice=650000, **{"class": "ResidentialProperty"})
+    pricier["address"] = {**base["address"], "city": "DeLand"}
+    pricier["details"] = {**base["details"], "numBedrooms": 4}
+    return [base, pricier]
+
+
+@pytest.fixture
+def local_tools(make_tools, tmp_path):
+    tools = make_tools("http://repliers.invalid", local_store_path=str(tmp_path / "local.db"), default_status="")
+    tools._get_local_store().upsert(_fixture_listings())
+    return tools
+
+
+def _mls(output):
+    return sorted(set(m for m in ("MFRW7871972", "T0000002") if m in output))
+
+
+@pytest.mark.parametrize(
+    "filters, expected",
+    [
+        ({}, ["MFRW7871972", "T0000002"]),
+        ({"minPrice": 500000}, ["T0000002"]),
+        ({"minPrice": "500k"}, ["T0000002"]),
+        ({"maxPrice": "$150,000"}, ["MFRW7871972"]),
+        ({"minPrice": "1.2M"}, []),
+        ({"state": "Florida"}, ["MFRW7871972", "T0000002"]),
+        ({"city": "new port richey, florida"}, ["MFRW7871972"]),
+        ({"city": "DELAND"}, ["T0000002"]),
+        ({"class_": "condo"}, ["MFRW7871972"]),
+        ({"status": ["a", "U"], "minBedrooms": "4"}, ["T0000002"]),
+        ({"mlsNumber": "mfrw7871972"}, ["MFRW7871972"]),
+    ],
+)
+def test_search_local_filters(local_tools, filters, expected):
+    output = asyncio.run(local_tools.search_local(**filters))
+    assert _mls(output) == expected
+
+
+def test_search_local_rejects_unparseable_bounds(local_tools):
+    output = asyncio.run(local_tools.search_local(minPrice="cheap", maxSqft="big"))
+    assert output.startswith("Invalid local search filter")
+    assert "minPrice='cheap'" in output and "maxSqft='big'" in output
+
+
+def test_sync_writes_each_listing_once(stub, make_tools, tmp_path, monkeypatch):
+    _, base_url = stub
+    tools = make_tools(base_url, local_store_path=str(tmp_path / "sync.db"), local_store_enabled=True, max_pages_cap=2)
+    written = []
+    upsert = tool._LocalListingStore.upsert
+
+    def _counting_upsert(store, listings):
+        written.extend(item["mlsNumber"] for item in listings)
+        return upsert(store, listings)
+
+    monkeypatch.setattr(tool._LocalListingStore, "upsert", _counting_upsert)
+    output = asyncio.run(tools.sync_local_listings({"city": "Pasco", "resultsPerPage": 10}))
+    assert output.startswith("Local sync complete: stored 20")
+    assert len(written) == len(set(written)) == 20
+
+
+def test_store_row_reads_only_its_source_fields():
+    for listing in _fixture_listings():
+        projected = tool._project(listing, list(tool._LocalListingStore._SOURCE_FIELDS))
+        assert tool._LocalListingStore._row(projected)[:-1] == tool._LocalListingStore._row(listing)[:-1]
+
+
+@pytest.mark.parametrize("stream_parse", [False, True])
+def test_lean_search_stores_every_column(stub, make_tools, tmp_path, stream_parse):
+    _, base_url = stub
+    path = str(tmp_path / "local.db")
+    tools = make_tools(base_url, local_store_enabled=True, local_store_path=path, stream_parse=stream_parse)
+    assert tools.valves.lean_fields
+    asyncio.run(tools.search_listing(resultsPerPage=10))
+    with closing(sqlite3.connect(path)) as conn:
+        rows = conn.execute("SELECT updated_on, year_built, list_price, lat FROM local_listings").fetchall()
+    assert len(rows) == 10
+    assert all(None not in row for row in rows)
+
+
+def _stub_mls(output):
+    return set(re.findall(r"STUB\d{7}", output))
+
+
+@pytest.mark.parametrize(
+    "filters",
+    [{"minPrice": 150000}, {"maxPrice": "200k"}, {"minPrice": "120,000", "maxPrice": 250000}, {"minPrice": "10M"}],
+)
+def test_search_local_matches_search_listing(stub, make_tools, tmp_path, filters):
+    _, base_url = stub
+    tools = make_tools(
+        base_url,
+        local_store_enabled=True,
+        local_store_path=str(tmp_path / "local.db"),
+        default_status="",
+        cache_enabled=False,
+    )
+
+    async def _run():
+        await tools.search_listing(resultsPerPage=40)  # the stub holds 40 listings; store them all
+        remote = await tools.search_listing(resultsPerPage=40, **filters)
+        local = await tools.search_local(resultsPerPage=40, **filters)
+        return remote, local
+
+    remote, local = asyncio.run(_run())
+    assert _stub_mls(local) == _stub_mls(remote)
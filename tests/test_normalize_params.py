@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+from hypothesis import given, settings
+from hypothesis import strategies as st
+
+import repliers_search_tool_v2 as tool
+
+POLYGON = [[-82.1, 28.1], [-82.0, 28.4], [-82.6, 28.3], [-82.1, 28.1]]
+
+_WORDS = st.text(alphabet="abcABC xyzXYZ,.-'$0123456789kKmM", max_size=12)
+_SCALARS = st.one_of(
+    _WORDS,
+    st.sampled_from(["tampa, florida", "DeLand", "SAINT PETERSBURG", "sld", "SLD", "Sus", "500k", "$1.2M", "yes", "0"]),
+    st.integers(-10, 10**7),
+    st.floats(allow_nan=False, allow_infinity=False, width=32),
+    st.booleans(),
+    st.none(),
+)
+_KEYS = st.sampled_from(
+    [
+        "city", "cityOrDistrict", "areaOrCity", "state", "status", "lastStatus", "boardId", "zip", "mlsNumber",
+        "class", "type", "hasImages", "waterfront", "lat", "long", "radius", "pageNum", "resultsPerPage",
+        "minPrice", "maxPrice", "minBedrooms", "minListDate", "fields", "searchFields", "propertyType",
+    ]
+)  # fmt: skip
+_POLYGONS = st.lists(
+    st.lists(st.floats(-90, 90, allow_nan=False), min_size=2, max_size=2), min_size=3, max_size=5
+)
+_PARAMS = st.builds(
+    lambda flat, polygon: {**flat, **({"map": polygon} if polygon else {})},
+    st.dictionaries(_KEYS, st.one_of(_SCALARS, st.lists(_SCALARS, max_size=4)), max_size=8),
+    st.one_of(st.none(), _POLYGONS),
+)
+
+
+def _reordered(params):
+    """Same search with keys and flat list values in reverse order; `map` vertices keep their order."""
+    return {
+        key: list(reversed(value)) if isinstance(value, list) and key != "map" else value
+        for key, value in reversed(list(params.items()))
+    }
+
+
+@settings(max_examples=300, deadline=None)
+@given(_PARAMS)
+def test_normalize_params_is_idempotent(params):
+    once = tool._normalize_params(params)
+    assert tool._normalize_params(once) == once
+
+
+@settings(max_examples=300, deadline=None)
+@given(_PARAMS)
+def test_normalize_params_ignores_order(params):
+    assert tool._normalize_params(_reordered(params)) == tool._normalize_params(params)
+
+
+@pytest.mark.parametrize("raw", ["sld", "SLD", "Sld", " sLd "])
+def test_last_status_keeps_documented_spelling(raw):
+    assert tool._normalize_params({"lastStatus": raw})["lastStatus"] == "Sld"
+    assert tool._normalize_params({"lastStatus": [raw, "TER"]})["lastStatus"] == ["Sld", "Ter"]
+
+
+@pytest.mark.parametrize(
+    "raw, city, state",
+    [
+        ("DeLand, florida", "DeLand", "FL"),
+        ("LaBelle", "LaBelle", None),
+        ("tampa", "Tampa", None),
+        ("NEW PORT RICHEY, fl", "New Port Richey", "FL"),
+        ("st. pete-beach", "St. Pete-Beach", None),
+    ],
+)
+def test_city_keeps_mixed_case_spelling(raw, city, state):
+    params = tool._normalize_params({"city": raw})
+    assert params["city"] == city
+    assert params.get("state") == state
+
+
+def test_map_polygon_is_left_in_order():
+    params = tool._normalize_params({"map": POLYGON, "status": ["U", "A"]})
+    assert params["map"] == POLYGON
+    assert params["status"] == ["A", "U"]
+
+
+def test_search_listing_reports_bad_params_instead_of_raising(monkeypatch):
+    tools = tool.Tools()
+    tools.valves.rapidapi_key = "test"
+
+    def _boom(params):
+        raise ValueError("bad params")
+
+    monkeypatch.setattr(tools, "_prepare_params", _boom)
+    output = asyncio.run(tools.search_listing(map=POLYGON))
+    assert "bad params" in output
@@ -0,0 +1,84 @@
+import asyncio
+import time
+
+import pytest
+import requests
+
+from stub_server import StubConfig, serve_in_thread
+
+
+@pytest.fixture
+def rate_limited():
+    """A stub that answers every request with 429; yields a factory taking the Retry-After value."""
+    servers = []
+
+    def _serve(retry_after: str, status: int = 429) -> str:
+        config = StubConfig(listings=5, latency_ms=1, error_rate=1.0, error_status=status, retry_after=retry_after)
+        server = serve_in_thread(config)
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}"
+
+    yield _serve
+    for server in servers:
+        server.shutdown()
+
+
+@pytest.mark.parametrize("transport", ["requests", "aiohttp"])
+def test_retry_after_is_waited_out_beyond_backoff_max(rate_limited, make_tools, transport):
+    tools = make_tools(
+        rate_limited("1"), http_transport=transport, max_retries=1, retry_backoff_max=0.05, cache_enabled=False
+    )
+    started = time.perf_counter()
+    output = asyncio.run(tools.search_listing(city="Tampa"))
+    assert time.perf_counter() - started >= 1.0
+    assert output.startswith("HTTP error 429")
+    assert tools._client.stats["retried"] == 1
+
+
+def test_retry_after_past_the_cap_fails_without_retrying(rate_limited, make_tools):
+    tools = make_tools(rate_limited("30"), max_retries=3, retry_after_max=5, cache_enabled=False)
+    started = time.perf_counter()
+    output = asyncio.run(tools.search_listing(city="Tampa"))
+    assert time.perf_counter() - started < 5
+    assert output.startswith("HTTP error 429")
+    assert tools._client.stats["retried"] == 0
+
+
+def test_retryable_streamed_response_is_closed_before_retrying(rate_limited, make_tools, monkeypatch):
+    closed = []
+    close = requests.Response.close
+
+    def _recording_close(response):
+        closed.append(response.status_code)
+        close(response)
+
+    monkeypatch.setattr(requests.Response, "close", _recording_close)
+    tools = make_tools(
+        rate_limited("0", status=503), http_transport="requests", stream_parse=True, max_retries=2, cache_enabled=False
+    )
+    output = asyncio.run(tools.search_listing(city="Tampa"))
+    assert output.startswith("HTTP error 503")
+    assert closed.count(503) == 3  # both retried attempts and the final one
+
+
+@pytest.mark.parametrize("status, retry_after", [(400, "0"), (429, "30")])
+def test_streamed_error_response_is_closed_before_raising(rate_limited, make_tools, monkeypatch, status, retry_after):
+    closed = []
+    close = requests.Response.close
+
+    def _recording_close(response):
+        closed.append(response.status_code)
+        close(response)
+
+    monkeypatch.setattr(requests.Response, "close", _recording_close)
+    tools = make_tools(
+        rate_limited(retry_after, status=status),
+        http_transport="requests",
+        stream_parse=True,
+        max_retries=3,
+        retry_after_max=5,
+        cache_enabled=False,
+    )
+    output = asyncio.run(tools.search_listing(city="Tampa"))
+    assert output == f'HTTP error {status}: {{"error":"injected"}}'
+    assert closed == [status]
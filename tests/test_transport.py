@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+
+
+def _count_connections(server):
+    """Count TCP connections the stub accepts (one handler thread per connection)."""
+    counts = {"connections": 0}
+    process_request = server.process_request
+
+    def _counting(request, client_address):
+        counts["connections"] += 1
+        return process_request(request, client_address)
+
+    server.process_request = _counting
+    return counts
+
+
+@pytest.mark.parametrize("transport", ["requests", "aiohttp"])
+@pytest.mark.parametrize("keep_alive, expected", [(True, 1), (False, 5)])
+def test_sequential_searches_reuse_one_connection(stub, make_tools, transport, keep_alive, expected):
+    server, base_url = stub
+    counts = _count_connections(server)
+    tools = make_tools(base_url, http_transport=transport, http_keep_alive=keep_alive, cache_enabled=False)
+
+    async def _run():
+        for page in range(1, 6):
+            output = await tools.search_listing(city="Tampa", resultsPerPage=5, pageNum=page)
+            assert output.startswith("Listing search complete")
+
+    asyncio.run(_run())
+    assert counts["connections"] == expected
+
+
+@pytest.mark.parametrize("transport", ["requests", "aiohttp"])
+def test_valve_change_does_not_break_calls_in_flight(stub, make_tools, transport):
+    _, base_url = stub
+    tools = make_tools(base_url, http_transport=transport, cache_enabled=False, max_retries=0)
+
+    async def _run():
+        first = asyncio.ensure_future(tools.search_listing(city="Tampa", resultsPerPage=5))
+        await asyncio.sleep(0.05)  # first request is waiting on the stub
+        tools.valves.http_pool_maxsize += 1  # forces a new session
+        second = await tools.search_listing(city="Clearwater", resultsPerPage=5)
+        return await first, second
+
+    first, second = asyncio.run(_run())
+    assert first.startswith("Listing search complete")
+    assert second.startswith("Listing search complete")
+
+
+def test_transport_helpers_are_not_tool_methods(make_tools):
+    tools = make_tools("http://127.0.0.1:9")
+    exposed = {name for name in dir(tools) if not name.startswith("__") and callable(getattr(tools, name))}
+    for name in ("aclose", "_request_with_retry", "_get_session", "_get_executor", "_throttle"):
+        assert name not in exposed
+
+
+def test_client_refuses_urls_outside_base_url(make_tools):
+    tools = make_tools("http://127.0.0.1:9")
+    with pytest.raises(ValueError):
+        asyncio.run(tools._client.request("GET", "https://example.com/collect", {}))
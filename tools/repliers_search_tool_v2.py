@@ -7,12 +7,42 @@ requirements: requests, pydantic
 """
 
 import asyncio
+import bisect
+import codecs
+import contextvars
+import hashlib
+import inspect
 import json
-from typing import Any, Dict, List, Optional
+import linecache
+import math
+import os
+import random
+import sqlite3
+import statistics as stats_lib
+import string
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing, contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import requests
+from requests.adapters import HTTPAdapter
 from pydantic import BaseModel, Field
 
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; vectorized paths fall back to pure Python
+    np = None
+
+try:
+    import aiohttp
+except ImportError:  # aiohttp is optional; the requests transport is used without it
+    aiohttp = None
+
 
 def _clean_params(params: Dict[str, Any]) -> Dict[str, Any]:
     """Return a copy of params without None or empty string values."""
@@ -36,96 +66,2101 @@ def _split_city_state(city_or_district: Any, state: Any) -> (Any, Any):
     return city_or_district, state
 
 
+_STATE_CODES: Dict[str, str] = {
+    "alabama": "AL", "alaska": "AK", "arizona": "AZ", "arkansas": "AR", "california": "CA", "colorado": "CO",
+    "connecticut": "CT", "delaware": "DE", "district of columbia": "DC", "florida": "FL", "georgia": "GA",
+    "hawaii": "HI", "idaho": "ID", "illinois": "IL", "indiana": "IN", "iowa": "IA", "kansas": "KS",
+    "kentucky": "KY", "louisiana": "LA", "maine": "ME", "maryland": "MD", "massachusetts": "MA",
+    "michigan": "MI", "minnesota": "MN", "mississippi": "MS", "missouri": "MO", "montana": "MT",
+    "nebraska": "NE", "nevada": "NV", "new hampshire": "NH", "new jersey": "NJ", "new mexico": "NM",
+    "new york": "NY", "north carolina": "NC", "north dakota": "ND", "ohio": "OH", "oklahoma": "OK",
+    "oregon": "OR", "pennsylvania": "PA", "puerto rico": "PR", "rhode island": "RI", "south carolina": "SC",
+    "south dakota": "SD", "tennessee": "TN", "texas": "TX", "utah": "UT", "vermont": "VT", "virginia": "VA",
+    "washington": "WA", "west virginia": "WV", "wisconsin": "WI", "wyoming": "WY",
+    "alberta": "AB", "british columbia": "BC", "manitoba": "MB", "new brunswick": "NB",
+    "newfoundland and labrador": "NL", "nova scotia": "NS", "ontario": "ON", "prince edward island": "PE",
+    "quebec": "QC", "saskatchewan": "SK",
+}
+
+_TITLE_CASE_PARAMS = ("city", "cityOrDistrict", "areaOrCity")
+# lastStatus codes as Repliers spells them; matching is case-sensitive upstream, so "SLD" finds nothing.
+_LAST_STATUS_CODES: Dict[str, str] = {
+    code.lower(): code
+    for code in ("Sus", "Exp", "Sld", "Ter", "Dft", "Lsd", "Sc", "Sce", "Lc", "Pc", "Ext", "New")
+}
+_UPPER_CASE_PARAMS = ("status", "boardId", "zip", "mlsNumber")
+_LOWER_CASE_PARAMS = ("class", "type")
+_TRUE_FALSE_PARAMS = ("hasAgents", "hasImages")
+_YES_NO_PARAMS = ("den", "waterfront", "displayPublic", "displayAddressOnInternet", "displayInternetEntireListing")
+_FLOAT_PARAMS = ("lat", "long", "radius")
+_INT_PARAMS = ("pageNum", "resultsPerPage")
+_SORTED_FIELD_PARAMS = ("fields", "searchFields")
+_ORDERED_PARAMS = ("map",)  # polygon vertices: order matters and items are nested lists
+_TRUTHY = {"true", "t", "yes", "y", "1", "on"}
+_FALSY = {"false", "f", "no", "n", "0", "off"}
+_NUMBER_SUFFIXES = {"k": 1_000, "m": 1_000_000, "mm": 1_000_000, "b": 1_000_000_000}
+
+
+def _parse_number(value: Any) -> Any:
+    """Parse "500k", "1.2M", "$450,000" or "3" into an int (or float when fractional); else return value."""
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        return value
+    number = value
+    if isinstance(value, str):
+        text = value.strip().lower().replace(",", "").replace("$", "").replace("_", "")
+        multiplier = 1
+        for suffix in ("mm", "k", "m", "b"):
+            if text.endswith(suffix):
+                text, multiplier = text[: -len(suffix)].strip(), _NUMBER_SUFFIXES[suffix]
+                break
+        try:
+            number = float(text) * multiplier
+        except ValueError:
+            return value
+    if isinstance(number, float) and not math.isfinite(number):
+        return value
+    return int(number) if float(number).is_integer() else number
+
+
+def _is_numeric_range_param(key: str) -> bool:
+    """min*/max* params are numeric except the date ones (minListDate, maxUpdatedOn, ...)."""
+    return key[:3] in ("min", "max") and "Date" not in key and "UpdatedOn" not in key
+
+
+def _title_case(text: str) -> str:
+    """Capitalize each word of all-lower or all-upper text ("st. pete-beach" -> "St. Pete-Beach").
+
+    Mixed-case input is taken as the caller's spelling and only has its whitespace collapsed, so names like
+    "DeLand" or "LaBelle" reach Repliers unchanged.
+    """
+    text = " ".join(text.split())
+    if text != text.lower() and text != text.upper():
+        return text
+    out, capitalize = [], True
+    for ch in text.lower():
+        out.append(ch.upper() if capitalize else ch)
+        capitalize = ch in " -'/("
+    return "".join(out)
+
+
+def _normalize_value(key: str, value: Any) -> Any:
+    """Canonicalize one scalar param value according to its key."""
+    if isinstance(value, str):
+        value = value.strip()
+    if key in _TITLE_CASE_PARAMS and isinstance(value, str):
+        return _title_case(value)
+    if key == "state" and isinstance(value, str):
+        return _STATE_CODES.get(" ".join(value.lower().split()), value.upper())
+    if key == "lastStatus" and isinstance(value, str):
+        return _LAST_STATUS_CODES.get(value.lower(), value)
+    if key in _UPPER_CASE_PARAMS and isinstance(value, str):
+        return value.upper()
+    if key in _LOWER_CASE_PARAMS and isinstance(value, str):
+        return value.lower()
+    if key in _TRUE_FALSE_PARAMS or key in _YES_NO_PARAMS:
+        flag = str(value).strip().lower()
+        if flag in _TRUTHY or flag in _FALSY:
+            truthy = flag in _TRUTHY
+            if key in _YES_NO_PARAMS:
+                return "Y" if truthy else "N"
+            return "true" if truthy else "false"
+        return value
+    if key in _FLOAT_PARAMS:
+        number = _parse_number(value)
+        return float(number) if isinstance(number, (int, float)) else value
+    if key in _INT_PARAMS or _is_numeric_range_param(key):
+        return _parse_number(value)
+    return value
+
+
+def _normalize_params(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Canonicalize search params so equivalent searches share one cache key and in-flight request.
+
+    Splits "City, ST", maps state names to codes, fixes casing, expands numeric shorthand ("500k"), spells
+    booleans one way, and sorts/dedupes flat lists of scalars (single-item lists collapse to the scalar). `map`
+    and any other nested value are passed through untouched, since their order is meaningful. Idempotent:
+    normalizing an already normalized dict returns an equal dict.
+    """
+    params = _clean_params(params)
+    normalized: Dict[str, Any] = {}
+    for key, value in params.items():
+        if key in _SORTED_FIELD_PARAMS:
+            items = value if isinstance(value, (list, tuple)) else [value]
+            value = ",".join(sorted({f.strip() for v in items for f in str(v).split(",") if f.strip()}))
+        elif isinstance(value, (list, tuple, set)):
+            if key not in _ORDERED_PARAMS and not any(isinstance(v, (list, tuple, set, dict)) for v in value):
+                # Dedupe on type and repr: 0, 0.0 and False are equal, so a plain set would keep whichever came first.
+                items = {
+                    (str(type(v)), str(v), repr(v)): v
+                    for v in (_normalize_value(key, v) for v in value)
+                    if v is not None and v != ""
+                }
+                value = [items[item_key] for item_key in sorted(items)]
+                if len(value) == 1:
+                    value = value[0]
+        elif not isinstance(value, dict):
+            value = _normalize_value(key, value)
+        normalized[key] = value
+    # Split "City, ST" last, so a single-item list that collapsed to a string above is split on this pass too.
+    for key in _TITLE_CASE_PARAMS:
+        if isinstance(normalized.get(key), str) and "," in normalized[key]:
+            city, state = _split_city_state(normalized[key], normalized.get("state"))
+            normalized[key] = _normalize_value(key, city)
+            normalized["state"] = _normalize_value("state", state) if isinstance(state, str) else state
+    return _clean_params(normalized)
+
+
+def _cache_key(url: str, params: Dict[str, Any]) -> str:
+    """Build a canonical cache key from the request URL and the cleaned params dict."""
+    return json.dumps({"url": url, "params": params}, sort_keys=True, default=str)
+
+
+def _project(data: Any, paths: List[str]) -> Dict[str, Any]:
+    """Copy only the dotted paths (e.g. "details.numBedrooms") from data into a nested dict."""
+    out: Dict[str, Any] = {}
+    if not isinstance(data, dict):
+        return out
+    for path in paths:
+        keys = [k for k in path.split(".") if k]
+        if not keys:
+            continue
+        value: Any = data
+        for key in keys:
+            if not isinstance(value, dict) or key not in value:
+                break
+            value = value[key]
+        else:
+            target = out
+            for key in keys[:-1]:
+                target = target.setdefault(key, {})
+                if not isinstance(target, dict):
+                    break
+            else:
+                target[keys[-1]] = value
+    return out
+
+
+class _TTLCache:
+    """Thread-safe in-process LRU cache whose entries expire after a TTL.
+
+    This is the default response cache backend. Backends expose `get(key)`, `set(key, value)`, `stats()`
+    and the `max_entries`/`ttl_seconds` limits; `blocking` tells callers whether to move calls off the loop.
+    """
+
+    blocking = False
+
+    def __init__(self, max_entries: int = 128, ttl_seconds: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        """Return the cached value or None, refreshing its LRU position on a hit."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: Any) -> None:
+        """Store a value, evicting the least recently used entries beyond max_entries."""
+        if self.max_entries <= 0 or self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._data),
+            }
+
+
+class _SQLiteCache:
+    """Response cache backend in a SQLite file, shared by every worker process on the host.
+
+    Entries carry an absolute expiry, so all processes agree on the TTL. Values are any JSON-serializable
+    value, zlib-compressed when `compress_level` is above zero; `get` returns them as decoded JSON (tuples
+    come back as lists), and callers unpack their own shapes. Past `max_entries` or `max_bytes` of stored
+    values, the least recently read entries are evicted. A hit records its read time only when the stored one
+    is more than `touch_seconds` old, so hot keys do not cost a write per read and eviction order is exact to
+    that granularity. WAL mode lets readers proceed while another process writes, and reads are served
+    through a memory map.
+    """
+
+    blocking = True
+
+    def __init__(self, path: str, max_entries: int = 128, ttl_seconds: float = 300.0):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = 256 * 1024 * 1024
+        self.compress_level = 1
+        self.touch_seconds = 10.0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, expires_at REAL NOT NULL, accessed_at REAL NOT NULL, "
+                "size INTEGER NOT NULL, compressed INTEGER NOT NULL, value BLOB NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA mmap_size=268435456")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @staticmethod
+    def _hash(key: str) -> str:
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Any:
+        """Return the decoded cached value or None, marking the entry as recently read on a hit."""
+        now = time.time()
+        digest = self._hash(key)
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute(
+                "SELECT expires_at, accessed_at, compressed, value FROM cache WHERE key = ?", (digest,)
+            ).fetchone()
+            if row is not None and row[0] > now:
+                if now - row[1] > self.touch_seconds:
+                    conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, digest))
+            elif row is not None:
+                conn.execute("DELETE FROM cache WHERE key = ?", (digest,))
+                row = None
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(zlib.decompress(row[3]) if row[2] else row[3])
+
+    def set(self, key: str, value: Any) -> None:
+        """Store a value, then drop expired entries and evict by recency beyond the entry and byte limits."""
+        if self.max_entries <= 0 or self.ttl_seconds <= 0:
+            return
+        raw = json.dumps(value, separators=(",", ":"), default=str).encode("utf-8")
+        level = max(0, min(9, int(self.compress_level or 0)))
+        blob = zlib.compress(raw, level) if level else raw
+        if self.max_bytes and len(blob) > self.max_bytes:
+            return
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, expires_at, accessed_at, size, compressed, value) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (self._hash(key), now + self.ttl_seconds, now, len(blob), 1 if level else 0, blob),
+            )
+            conn.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+            count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+            evicted = 0
+            if count > self.max_entries or (self.max_bytes and total > self.max_bytes):
+                rows = conn.execute("SELECT key, size FROM cache ORDER BY accessed_at").fetchall()
+                doomed = []
+                for digest, size in rows:
+                    if count <= self.max_entries and (not self.max_bytes or total <= self.max_bytes):
+                        break
+                    doomed.append((digest,))
+                    count, total = count - 1, total - size
+                conn.executemany("DELETE FROM cache WHERE key = ?", doomed)
+                evicted = len(doomed)
+        if evicted:
+            with self._lock:
+                self.evictions += evicted
+
+    def stats(self) -> Dict[str, int]:
+        with closing(self._connect()) as conn, conn:
+            size, stored = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": size,
+                "stored_bytes": stored,
+            }
+
+
+class _TokenBucket:
+    """Thread-safe token bucket; callers reserve a token and wait out any deficit instead of being dropped."""
+
+    def __init__(self, rate: float = 5.0, burst: int = 10):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take one token and return how many seconds the caller must wait before using it."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(float(self.burst), self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1.0
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+
+_METRIC_PHASES: Tuple[str, ...] = (
+    "params", "queue", "connect", "ttfb", "download", "backoff", "parse", "format", "analytics", "hazards", "images",
+    "emit",
+)
+
+
+class _CallMetrics:
+    """Phase timings and payload counters for one tool call.
+
+    Phases are summed across every request the call makes (pages, retries), so with concurrent pages or
+    streamed parsing they can add up to more than the wall time.
+    """
+
+    def __init__(self, tool: str):
+        self.tool = tool
+        self.started = time.time()
+        self._t0 = time.perf_counter()
+        self.phases: Dict[str, float] = {phase: 0.0 for phase in _METRIC_PHASES}
+        self.counters: Dict[str, int] = {"requests": 0, "response_bytes": 0, "listings": 0, "output_chars": 0}
+        self.labels: Dict[str, Any] = {}
+
+    def add(self, phase: str, seconds: float) -> None:
+        self.phases[phase] = self.phases.get(phase, 0.0) + max(0.0, seconds)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "tool": self.tool,
+            "timestamp": self.started,
+            "total_ms": round((time.perf_counter() - self._t0) * 1000, 3),
+            "phases_ms": {phase: round(sec * 1000, 3) for phase, sec in self.phases.items()},
+            **self.counters,
+            **self.labels,
+        }
+
+
+_CURRENT_METRICS: "contextvars.ContextVar[Optional[_CallMetrics]]" = contextvars.ContextVar(
+    "repliers_call_metrics", default=None
+)
+
+
+def _record_phase(phase: str, seconds: float) -> None:
+    """Add time to a phase of the current call's metrics (no-op outside an instrumented call)."""
+    metrics = _CURRENT_METRICS.get()
+    if metrics is not None:
+        metrics.add(phase, seconds)
 
-def _format_listings(listings: List[Dict[str, Any]]) -> str:
-    """Build a detailed summary of all listings, leaving images as placeholders."""
-    if not listings:
-        return "No listings found."
 
-    def _addr(addr: Dict[str, Any]) -> str:
-        parts = [
-            addr.get("streetNumber"),
-            addr.get("streetName"),
-            addr.get("streetSuffix"),
-            addr.get("unitNumber"),
+def _count(counter: str, amount: int = 1) -> None:
+    """Bump a counter on the current call's metrics (no-op outside an instrumented call)."""
+    metrics = _CURRENT_METRICS.get()
+    if metrics is not None:
+        metrics.counters[counter] = metrics.counters.get(counter, 0) + amount
+
+
+@contextmanager
+def _timed(phase: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record_phase(phase, time.perf_counter() - started)
+
+
+class _MetricsSink:
+    """Write call metrics to a JSONL file (one line per call) or a Prometheus text exposition file.
+
+    The Prometheus file holds cumulative totals since the tool loaded and is replaced atomically, so a
+    node_exporter textfile collector can scrape it.
+    """
+
+    def __init__(self, path: str, fmt: str):
+        self.path = path
+        self.fmt = fmt
+        self._lock = threading.Lock()
+        self._calls: Dict[str, int] = {}
+        self._phase_sums: Dict[Tuple[str, str], float] = {}
+        self._counter_sums: Dict[Tuple[str, str], int] = {}
+
+    def write(self, record: Dict[str, Any]) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            if self.fmt == "prometheus":
+                self._write_prometheus(record)
+            else:
+                with open(self.path, "a", encoding="utf-8") as fh:
+                    fh.write(json.dumps(record, separators=(",", ":"), default=str) + "\n")
+
+    def _write_prometheus(self, record: Dict[str, Any]) -> None:
+        tool = record["tool"]
+        self._calls[tool] = self._calls.get(tool, 0) + 1
+        for phase, ms in record["phases_ms"].items():
+            self._phase_sums[(tool, phase)] = self._phase_sums.get((tool, phase), 0.0) + ms / 1000
+        for counter in ("requests", "response_bytes", "listings", "output_chars"):
+            self._counter_sums[(tool, counter)] = self._counter_sums.get((tool, counter), 0) + int(record[counter])
+
+        lines = [
+            "# HELP repliers_tool_calls_total Tool calls recorded.",
+            "# TYPE repliers_tool_calls_total counter",
+        ]
+        lines += [f'repliers_tool_calls_total{{tool="{t}"}} {n}' for t, n in sorted(self._calls.items())]
+        lines += [
+            "# HELP repliers_tool_phase_seconds_total Time spent per phase, summed over calls.",
+            "# TYPE repliers_tool_phase_seconds_total counter",
+        ]
+        lines += [
+            f'repliers_tool_phase_seconds_total{{tool="{t}",phase="{p}"}} {v:.6f}'
+            for (t, p), v in sorted(self._phase_sums.items())
+        ]
+        for counter in ("requests", "response_bytes", "listings", "output_chars"):
+            name = f"repliers_tool_{counter}_total"
+            lines += [f"# TYPE {name} counter"]
+            lines += [f'{name}{{tool="{t}"}} {v}' for (t, c), v in sorted(self._counter_sums.items()) if c == counter]
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            fh.write("\n".join(lines) + "\n")
+        os.replace(tmp, self.path)
+
+
+_RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def _retry_after_seconds(response: Optional[requests.Response]) -> Optional[float]:
+    """Parse a Retry-After header (delta seconds or HTTP date) into seconds, if present."""
+    if response is None:
+        return None
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _raise_for_status_closed(response: Any) -> None:
+    """Raise for an error response after handing its connection back to the pool.
+
+    The body is read first (error bodies are small), so the HTTPError can still quote it once closed.
+    """
+    if not isinstance(response, _AiohttpResponse):
+        response.content  # noqa: B018 - loads a streamed body before the close
+    response.close()
+    response.raise_for_status()
+
+
+def _query_items(params: Dict[str, Any]) -> List[Tuple[str, str]]:
+    """Encode params the way requests does (lists repeat the key, scalars are str()-ed) for aiohttp."""
+    items: List[Tuple[str, str]] = []
+    for key, value in params.items():
+        for item in value if isinstance(value, (list, tuple)) else [value]:
+            if item is not None:
+                items.append((key, item if isinstance(item, str) else str(item)))
+    return items
+
+
+class _AiohttpResponse:
+    """requests-like view of an aiohttp response, so the retry, cache and parse code serve both transports.
+
+    Non-streamed responses (and any error response) are read fully before this is built; streamed ones keep
+    the aiohttp response open until `iter_chunks` is exhausted or `close` is called.
+    """
+
+    def __init__(self, response: Any, content: Optional[bytes] = None):
+        self._response = response
+        self.status_code = response.status
+        self.headers = response.headers
+        self.url = str(response.url)
+        self.encoding = response.charset
+        self.reason = response.reason
+        self.content = content
+
+    @property
+    def text(self) -> str:
+        return (self.content or b"").decode(self.encoding or "utf-8", errors="replace")
+
+    def json(self) -> Any:
+        return json.loads(self.content or b"")
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            kind = "Client" if self.status_code < 500 else "Server"
+            raise requests.HTTPError(
+                f"{self.status_code} {kind} Error: {self.reason} for url: {self.url}", response=self
+            )
+
+    async def iter_chunks(self, chunk_size: int = 65536):
+        try:
+            async for chunk in self._response.content.iter_chunked(chunk_size):
+                yield chunk
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        self._response.release()
+
+
+async def _trace_connect_start(session: Any, ctx: Any, params: Any) -> None:
+    ctx.connect_started = time.perf_counter()
+
+
+async def _trace_connect_end(session: Any, ctx: Any, params: Any) -> None:
+    elapsed = time.perf_counter() - ctx.connect_started
+    _record_phase("connect", elapsed)
+    if isinstance(ctx.trace_request_ctx, dict):
+        ctx.trace_request_ctx["connect"] = ctx.trace_request_ctx.get("connect", 0.0) + elapsed
+
+
+class _IncrementalStore:
+    """SQLite store of materialized search results and their repliersUpdatedOn watermarks.
+
+    Each saved search (keyed on its normalized params) keeps the listings seen so far and the newest
+    `timestamps.repliersUpdatedOn` value, so later runs only need to ask Repliers for changes.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS watermarks ("
+                "search_key TEXT PRIMARY KEY, watermark TEXT NOT NULL, refreshed_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS listings ("
+                "search_key TEXT NOT NULL, mls_number TEXT NOT NULL, updated_on TEXT, body TEXT NOT NULL, "
+                "PRIMARY KEY (search_key, mls_number))"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get_watermark(self, search_key: str) -> Optional[str]:
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute("SELECT watermark FROM watermarks WHERE search_key = ?", (search_key,)).fetchone()
+        return row[0] if row else None
+
+    def apply(
+        self, search_key: str, changed: List[Dict[str, Any]], deleted: List[str], watermark: Optional[str]
+    ) -> None:
+        """Upsert changed listings, drop deleted MLS numbers and advance the watermark in one transaction."""
+        rows = [
+            (search_key, str(item["mlsNumber"]), _listing_updated_on(item), json.dumps(item, separators=(",", ":")))
+            for item in changed
+            if item.get("mlsNumber")
         ]
-        line = " ".join(str(p) for p in parts if p).strip()
-        city = addr.get("city")
-        state = addr.get("state") or addr.get("province")
-        postal = addr.get("postalCode") or addr.get("zip")
-        tail = ", ".join(str(p) for p in [city, state, postal] if p)
-        return ", ".join([c for c in [line, tail] if c]) or "Unknown address"
-
-    lines: List[str] = []
-    for idx, listing in enumerate(listings, start=1):
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO listings (search_key, mls_number, updated_on, body) VALUES (?, ?, ?, ?)", rows
+            )
+            conn.executemany(
+                "DELETE FROM listings WHERE search_key = ? AND mls_number = ?",
+                [(search_key, str(mls)) for mls in deleted],
+            )
+            if watermark:
+                conn.execute(
+                    "INSERT INTO watermarks (search_key, watermark, refreshed_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(search_key) DO UPDATE SET watermark = MAX(watermark, excluded.watermark), "
+                    "refreshed_at = excluded.refreshed_at",
+                    (search_key, watermark, time.time()),
+                )
+
+    def load(self, search_key: str) -> List[Dict[str, Any]]:
+        """Return the materialized listings for a search, newest updates first."""
+        with closing(self._connect()) as conn, conn:
+            rows = conn.execute(
+                "SELECT body FROM listings WHERE search_key = ? ORDER BY updated_on DESC, mls_number",
+                (search_key,),
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+
+def _listing_updated_on(listing: Dict[str, Any]) -> Optional[str]:
+    """Return the listing's repliersUpdatedOn timestamp (ISO string), if present."""
+    return (listing.get("timestamps") or {}).get("repliersUpdatedOn") or listing.get("updatedOn")
+
+
+def _deleted_mls_numbers(data: Any) -> List[str]:
+    """Extract MLS numbers from a /listings/deleted response, accepting objects or bare strings."""
+    items = data if isinstance(data, list) else _extract_listings(data) if isinstance(data, dict) else []
+    numbers = []
+    for item in items:
+        if isinstance(item, dict) and item.get("mlsNumber"):
+            numbers.append(str(item["mlsNumber"]))
+        elif isinstance(item, str):
+            numbers.append(item)
+    return numbers
+
+
+def _class_key(value: Any) -> Optional[str]:
+    """Map Repliers class values ("CondoProperty") and filters ("condo") to one comparable key."""
+    if not value:
+        return None
+    key = str(value).strip().lower()
+    return key[: -len("property")] if key.endswith("property") else key
+
+
+def _as_list(value: Any) -> List[Any]:
+    """Accept a scalar, list or comma-separated string filter value and return a list."""
+    if value is None or value == "":
+        return []
+    if isinstance(value, (list, tuple)):
+        return [v for v in value if v is not None and v != ""]
+    if isinstance(value, str) and "," in value:
+        return [v.strip() for v in value.split(",") if v.strip()]
+    return [value]
+
+
+# search_local range filters: param name -> (column, SQL operator), mirroring the /listings semantics.
+_LOCAL_RANGE_FILTERS: Dict[str, Tuple[str, str]] = {
+    "minPrice": ("list_price", ">="),
+    "maxPrice": ("list_price", "<="),
+    "minBedrooms": ("beds", ">="),
+    "maxBedrooms": ("beds", "<="),
+    "minBaths": ("baths", ">="),
+    "maxBaths": ("baths", "<="),
+    "minSqft": ("sqft", ">="),
+    "maxSqft": ("sqft", "<="),
+    "minYearBuilt": ("year_built", ">="),
+    "maxYearBuilt": ("year_built", "<="),
+    "minListDate": ("list_date", ">="),
+    "maxListDate": ("list_date", "<="),
+}
+
+# search_local equality filters: param name -> column. Values are compared case-insensitively.
+_LOCAL_MATCH_FILTERS: Dict[str, str] = {
+    "city": "city",
+    "state": "state",
+    "zip": "zip",
+    "area": "area",
+    "neighborhood": "neighborhood",
+    "status": "status",
+    "standardStatus": "standard_status",
+    "class": "class_key",
+    "type": "type",
+    "mlsNumber": "mls_number",
+}
+
+_LOCAL_SORTS: Dict[str, str] = {
+    "listPriceAsc": "list_price ASC",
+    "listPriceDesc": "list_price DESC",
+    "sqftAsc": "sqft ASC",
+    "sqftDesc": "sqft DESC",
+    "createdOnAsc": "list_date ASC",
+    "createdOnDesc": "list_date DESC",
+    "updatedOnAsc": "updated_on ASC",
+    "updatedOnDesc": "updated_on DESC",
+}
+
+
+class _LocalListingStore:
+    """SQLite listing table with indexed filter columns for offline searches over downloaded listings."""
+
+    _COLUMNS = (
+        "mls_number",
+        "list_price",
+        "beds",
+        "baths",
+        "sqft",
+        "year_built",
+        "city",
+        "state",
+        "zip",
+        "area",
+        "neighborhood",
+        "status",
+        "standard_status",
+        "class_key",
+        "type",
+        "lat",
+        "long",
+        "list_date",
+        "updated_on",
+        "body",
+    )
+    # Listing paths `_row` reads. Lean `fields` requests include them when the store is on, so stored
+    # listings are not missing the columns search_local filters and sorts on.
+    _SOURCE_FIELDS = (
+        "mlsNumber",
+        "listPrice",
+        "details.numBedrooms",
+        "details.numBathrooms",
+        "details.sqft",
+        "details.yearBuilt",
+        "address.city",
+        "address.state",
+        "address.zip",
+        "address.postalCode",
+        "address.area",
+        "address.neighborhood",
+        "status",
+        "standardStatus",
+        "class",
+        "type",
+        "map.latitude",
+        "map.longitude",
+        "listDate",
+        "timestamps.repliersUpdatedOn",
+        "updatedOn",
+    )
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS local_listings ("
+                "mls_number TEXT PRIMARY KEY, list_price REAL, beds REAL, baths REAL, sqft REAL, year_built REAL, "
+                "city TEXT, state TEXT, zip TEXT, area TEXT, neighborhood TEXT, status TEXT, standard_status TEXT, "
+                "class_key TEXT, type TEXT, lat REAL, long REAL, list_date TEXT, updated_on TEXT, body TEXT NOT NULL)"
+            )
+            for columns in ("list_price", "beds", "baths", "sqft", "city, state", "zip", "status", "lat, long"):
+                name = "idx_local_listings_" + columns.replace(", ", "_")
+                conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON local_listings ({columns})")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    @staticmethod
+    def _row(listing: Dict[str, Any]) -> Tuple[Any, ...]:
         address = listing.get("address") or {}
         details = listing.get("details") or {}
-        condo = listing.get("condominium") or {}
-        lot = listing.get("lot") or {}
-        estimate = listing.get("estimate") or {}
-        nearby = listing.get("nearby") or {}
-        agents = listing.get("agents") or []
-
-        price = listing.get("listPrice") or listing.get("price") or listing.get("list_price")
-        beds = (
-            details.get("numBedrooms")
-            or listing.get("bedrooms")
-            or listing.get("beds")
-            or listing.get("bedroomsTotal")
-        )
-        baths = (
-            details.get("numBathrooms")
-            or listing.get("bathrooms")
-            or listing.get("baths")
-            or listing.get("bathroomsTotal")
-        )
-        sqft = details.get("sqft") or listing.get("sqft")
-        year = details.get("yearBuilt") or listing.get("yearBuilt")
-        status = listing.get("standardStatus") or listing.get("status")
-        class_type = listing.get("class") or listing.get("propertyType")
-        subtype = listing.get("type") or listing.get("style")
-        dom = listing.get("simpleDaysOnMarket") or listing.get("daysOnMarket")
-        hoa = details.get("HOAFee") or condo.get("fees", {}).get("maintenance")
-        pets = condo.get("pets")
-        amenities = nearby.get("amenities") or []
-        lot_desc = lot.get("legalDescription") or lot.get("size")
-        acres = lot.get("acres")
         coords = listing.get("map") or {}
-        estimate_val = estimate.get("value")
-        estimate_low = estimate.get("low")
-        estimate_high = estimate.get("high")
-        estimate_conf = estimate.get("confidence")
-        brokerage = (listing.get("office") or {}).get("brokerageName")
-        agent_names = ", ".join(a.get("name") for a in agents if a.get("name"))
-
-        price_str = f"${price:,.0f}" if isinstance(price, (int, float)) else str(price or "N/A")
-        sqft_str = f"{sqft}" if sqft is not None else "N/A"
-        hoa_str = f"${hoa:,.0f}" if isinstance(hoa, (int, float)) else (str(hoa) if hoa else "N/A")
-        estimate_str = (
-            f"${estimate_val:,.0f} (range ${estimate_low:,.0f}-${estimate_high:,.0f}, conf {estimate_conf:.2f})"
-            if isinstance(estimate_val, (int, float)) and isinstance(estimate_low, (int, float)) and isinstance(estimate_high, (int, float)) and isinstance(estimate_conf, (int, float))
-            else (f"${estimate_val:,.0f}" if isinstance(estimate_val, (int, float)) else "N/A")
-        )
-
-        lines.append(
-            "\n".join(
+
+        def _lower(value: Any) -> Optional[str]:
+            return str(value).strip().lower() if value not in (None, "") else None
+
+        return (
+            str(listing["mlsNumber"]),
+            _to_float(listing.get("listPrice")),
+            _to_float(details.get("numBedrooms")),
+            _to_float(details.get("numBathrooms")),
+            _to_float(details.get("sqft")),
+            _to_float(details.get("yearBuilt")),
+            _lower(address.get("city")),
+            _lower(address.get("state")),
+            _lower(address.get("zip") or address.get("postalCode")),
+            _lower(address.get("area")),
+            _lower(address.get("neighborhood")),
+            _lower(listing.get("status")),
+            _lower(listing.get("standardStatus")),
+            _class_key(listing.get("class")),
+            _lower(listing.get("type")),
+            _to_float(coords.get("latitude")),
+            _to_float(coords.get("longitude")),
+            listing.get("listDate"),
+            _listing_updated_on(listing),
+            json.dumps(listing, separators=(",", ":")),
+        )
+
+    def upsert(self, listings: List[Dict[str, Any]]) -> int:
+        rows = [self._row(item) for item in listings if isinstance(item, dict) and item.get("mlsNumber")]
+        placeholders = ", ".join("?" for _ in self._COLUMNS)
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO local_listings ({', '.join(self._COLUMNS)}) VALUES ({placeholders})", rows
+            )
+        return len(rows)
+
+    def query(
+        self, filters: Dict[str, Any], sort_by: Optional[str] = None, limit: int = 20, offset: int = 0
+    ) -> Tuple[int, List[Dict[str, Any]]]:
+        """Return (total matches, page of listings) for /listings-style filter params.
+
+        Raises ValueError naming any numeric range filter whose value is not a number, rather than dropping it.
+        """
+        clauses: List[str] = []
+        args: List[Any] = []
+        invalid: List[str] = []
+        for name, (column, op) in _LOCAL_RANGE_FILTERS.items():
+            value = filters.get(name)
+            if value in (None, ""):
+                continue
+            if column != "list_date":
+                number = _to_float(value)
+                if number is None:
+                    invalid.append(f"{name}={value!r}")
+                    continue
+                value = number
+            clauses.append(f"{column} {op} ?")
+            args.append(value)
+        if invalid:
+            raise ValueError(f"Filters must be numbers: {', '.join(invalid)}")
+        for name, column in _LOCAL_MATCH_FILTERS.items():
+            values = _as_list(filters.get(name))
+            if column == "class_key":
+                values = [_class_key(v) for v in values]
+            values = [str(v).strip().lower() for v in values if v is not None]
+            if values:
+                # mls_number keeps Repliers' casing (it is the primary key); the other columns are stored lowered.
+                target = "LOWER(mls_number)" if column == "mls_number" else column
+                clauses.append(f"{target} IN ({', '.join('?' for _ in values)})")
+                args.extend(values)
+
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        order = _LOCAL_SORTS.get(str(sort_by or ""), "updated_on DESC")
+        with closing(self._connect()) as conn, conn:
+            total = conn.execute(f"SELECT COUNT(*) FROM local_listings{where}", args).fetchone()[0]
+            rows = conn.execute(
+                f"SELECT body FROM local_listings{where} ORDER BY {order}, mls_number LIMIT ? OFFSET ?",
+                args + [int(limit), int(offset)],
+            ).fetchall()
+        return total, [json.loads(row[0]) for row in rows]
+
+    def signature(self) -> Tuple[int, int]:
+        """Cheap change marker (row count, max rowid) used to know when derived indexes are stale."""
+        with closing(self._connect()) as conn, conn:
+            count, max_rowid = conn.execute("SELECT COUNT(*), COALESCE(MAX(rowid), 0) FROM local_listings").fetchone()
+        return int(count), int(max_rowid)
+
+    def points(self) -> List[Tuple[str, float, float]]:
+        """Return (mlsNumber, lat, long) for every stored listing with coordinates."""
+        with closing(self._connect()) as conn, conn:
+            return conn.execute(
+                "SELECT mls_number, lat, long FROM local_listings WHERE lat IS NOT NULL AND long IS NOT NULL"
+            ).fetchall()
+
+    def get_many(self, mls_numbers: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Return stored listings by MLS number."""
+        found: Dict[str, Dict[str, Any]] = {}
+        with closing(self._connect()) as conn, conn:
+            for start in range(0, len(mls_numbers), 500):
+                chunk = mls_numbers[start : start + 500]
+                rows = conn.execute(
+                    f"SELECT mls_number, body FROM local_listings WHERE mls_number IN ({', '.join('?' for _ in chunk)})",
+                    chunk,
+                ).fetchall()
+                found.update({row[0]: json.loads(row[1]) for row in rows})
+        return found
+
+
+_EARTH_RADIUS_KM = 6371.0088
+
+
+def _haversine_km(lat: float, lon: float, lats: Any, lons: Any) -> Any:
+    """Great-circle distances from one point to many; vectorized with numpy when available."""
+    if np is not None:
+        lat1, lon1 = np.radians(lat), np.radians(lon)
+        lat2, lon2 = np.radians(lats), np.radians(lons)
+        a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+        return 2 * _EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+    lat1, lon1 = math.radians(lat), math.radians(lon)
+    out = []
+    for la, lo in zip(lats, lons):
+        lat2, lon2 = math.radians(la), math.radians(lo)
+        a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+        out.append(2 * _EARTH_RADIUS_KM * math.asin(math.sqrt(min(a, 1.0))))
+    return out
+
+
+def _points_in_polygon(lats: Any, lons: Any, polygon: List[Tuple[float, float]]) -> List[bool]:
+    """Ray-casting point-in-polygon test for many points; polygon is a list of (lat, long) vertices."""
+    n = len(polygon)
+    if np is not None:
+        lats, lons = np.asarray(lats, dtype=float), np.asarray(lons, dtype=float)
+        inside = np.zeros(lats.shape, dtype=bool)
+        for i in range(n):
+            (lat1, lon1), (lat2, lon2) = polygon[i], polygon[(i + 1) % n]
+            crosses = (lat1 > lats) != (lat2 > lats)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                edge_lon = (lon2 - lon1) * (lats - lat1) / (lat2 - lat1) + lon1
+            inside ^= crosses & (lons < edge_lon)
+        return inside.tolist()
+    result = []
+    for la, lo in zip(lats, lons):
+        inside = False
+        for i in range(n):
+            (lat1, lon1), (lat2, lon2) = polygon[i], polygon[(i + 1) % n]
+            if (lat1 > la) != (lat2 > la) and lo < (lon2 - lon1) * (la - lat1) / (lat2 - lat1) + lon1:
+                inside = not inside
+        result.append(inside)
+    return result
+
+
+class _GeoGridIndex:
+    """Fixed-size lat/long grid over listing coordinates for radius, polygon and k-nearest queries.
+
+    Cells narrow each query to nearby candidates; exact distances are then computed over the candidates in one
+    vectorized pass.
+    """
+
+    def __init__(self, points: List[Tuple[str, float, float]], cell_deg: float = 0.05):
+        self.cell_deg = cell_deg
+        self.ids = [p[0] for p in points]
+        lats = [float(p[1]) for p in points]
+        lons = [float(p[2]) for p in points]
+        self.lats = np.asarray(lats) if np is not None else lats
+        self.lons = np.asarray(lons) if np is not None else lons
+        self.cells: Dict[Tuple[int, int], List[int]] = {}
+        for idx, (lat, lon) in enumerate(zip(lats, lons)):
+            self.cells.setdefault(self._cell(lat, lon), []).append(idx)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return int(math.floor(lat / self.cell_deg)), int(math.floor(lon / self.cell_deg))
+
+    def _candidates(self, min_lat: float, max_lat: float, min_lon: float, max_lon: float) -> List[int]:
+        lat0, lon0 = self._cell(min_lat, min_lon)
+        lat1, lon1 = self._cell(max_lat, max_lon)
+        if (lat1 - lat0 + 1) * (lon1 - lon0 + 1) > len(self.cells):
+            return [i for cell in self.cells.values() for i in cell]
+        out: List[int] = []
+        for la in range(lat0, lat1 + 1):
+            for lo in range(lon0, lon1 + 1):
+                out.extend(self.cells.get((la, lo), ()))
+        return out
+
+    def _take(self, values: Any, idxs: List[int]) -> Any:
+        return values[idxs] if np is not None else [values[i] for i in idxs]
+
+    def within_radius(self, lat: float, lon: float, radius_km: float) -> List[Tuple[str, float]]:
+        """Return (id, distance_km) for points within radius_km, nearest first."""
+        dlat = math.degrees(radius_km / _EARTH_RADIUS_KM)
+        cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+        dlon = min(180.0, dlat / cos_lat)
+        idxs = self._candidates(lat - dlat, lat + dlat, lon - dlon, lon + dlon)
+        if not idxs:
+            return []
+        dists = _haversine_km(lat, lon, self._take(self.lats, idxs), self._take(self.lons, idxs))
+        hits = [(self.ids[i], float(d)) for i, d in zip(idxs, dists) if d <= radius_km]
+        return sorted(hits, key=lambda hit: hit[1])
+
+    def within_polygon(self, polygon: List[Tuple[float, float]]) -> List[str]:
+        """Return ids of points inside the polygon given as (lat, long) vertices."""
+        if len(polygon) < 3:
+            return []
+        poly_lats = [p[0] for p in polygon]
+        poly_lons = [p[1] for p in polygon]
+        idxs = self._candidates(min(poly_lats), max(poly_lats), min(poly_lons), max(poly_lons))
+        if not idxs:
+            return []
+        inside = _points_in_polygon(self._take(self.lats, idxs), self._take(self.lons, idxs), polygon)
+        return [self.ids[i] for i, flag in zip(idxs, inside) if flag]
+
+    def nearest(self, lat: float, lon: float, k: int) -> List[Tuple[str, float]]:
+        """Return the k nearest (id, distance_km), growing the search radius until enough points are found."""
+        if not self.ids or k <= 0:
+            return []
+        radius = self.cell_deg * 111.0
+        while True:
+            hits = self.within_radius(lat, lon, radius)
+            if len(hits) >= k or radius >= math.pi * _EARTH_RADIUS_KM:
+                return hits[:k]
+            radius *= 2
+
+
+def _parse_polygon(value: Any) -> List[Tuple[float, float]]:
+    """Parse a Repliers-style `map` polygon ([[long, lat], ...], optionally wrapped or JSON) into (lat, long)."""
+    if isinstance(value, str):
+        value = json.loads(value)
+    while isinstance(value, list) and value and isinstance(value[0], list) and value[0] and isinstance(value[0][0], list):
+        value = value[0]
+    return [(float(pt[1]), float(pt[0])) for pt in value or []]
+
+
+_EMPTY: Dict[str, Any] = {}
+
+
+def _fmt_optional(v: Any) -> Any:
+    return v if v is not None else "N/A"
+
+
+def _fmt_money(v: Any) -> str:
+    return f"${v:,.0f}" if isinstance(v, (int, float)) else str(v or "N/A")
+
+
+def _fmt_fee(v: Any) -> str:
+    return f"${v:,.0f}" if isinstance(v, (int, float)) else (str(v) if v else "N/A")
+
+
+def _fmt_list(v: Any) -> str:
+    return ", ".join(v) if v else "N/A"
+
+
+def _fmt_agents(agents: Any) -> str:
+    return ", ".join([a["name"] for a in agents or () if a.get("name")]) or "N/A"
+
+
+def _fmt_address(addr: Any) -> str:
+    get = (addr or _EMPTY).get
+    line = " ".join(
+        [str(p) for p in (get("streetNumber"), get("streetName"), get("streetSuffix"), get("unitNumber")) if p]
+    ).strip()
+    tail = ", ".join(
+        [str(p) for p in (get("city"), get("state") or get("province"), get("postalCode") or get("zip")) if p]
+    )
+    if line and tail:
+        return f"{line}, {tail}"
+    return line or tail or "Unknown address"
+
+
+_NUMBER = (int, float)
+
+
+def _fmt_estimate(estimate: Any) -> str:
+    get = (estimate or _EMPTY).get
+    value = get("value")
+    if not isinstance(value, _NUMBER):
+        return "N/A"
+    low, high, conf = get("low"), get("high"), get("confidence")
+    if isinstance(low, _NUMBER) and isinstance(high, _NUMBER) and isinstance(conf, _NUMBER):
+        return f"${value:,.0f} (range ${low:,.0f}-${high:,.0f}, conf {conf:.2f})"
+    return f"${value:,.0f}"
+
+
+# Declarative spec for _format_listings: (template name, fallback paths tried in order with `or` semantics,
+# formatter, optional listing fields requested in lean mode when they differ from the paths). A string formatter
+# is the default shown for falsy values; a callable receives the raw value.
+_LISTING_FIELD_SPECS: Tuple[Tuple[Any, ...], ...] = (
+    ("mls", ("mlsNumber",), "MLS N/A"),
+    ("status", ("standardStatus", "status"), "N/A"),
+    ("class_type", ("class", "propertyType"), "N/A"),
+    ("subtype", ("type", "style"), "N/A"),
+    ("price", ("listPrice", "price", "list_price"), _fmt_money),
+    ("list_date", ("listDate",), "N/A"),
+    ("dom", ("simpleDaysOnMarket", "daysOnMarket"), "N/A"),
+    ("address", ("address",), _fmt_address),
+    ("neighborhood", ("address.neighborhood",), "N/A", ("address",)),
+    ("beds", ("details.numBedrooms", "bedrooms", "beds", "bedroomsTotal"), "N/A"),
+    ("baths", ("details.numBathrooms", "bathrooms", "baths", "bathroomsTotal"), "N/A"),
+    ("sqft", ("details.sqft", "sqft"), _fmt_optional),
+    ("year", ("details.yearBuilt", "yearBuilt"), "N/A"),
+    ("hoa", ("details.HOAFee", "condominium.fees.maintenance"), _fmt_fee, ("details.HOAFee", "condominium.fees")),
+    ("pets", ("condominium.pets",), "N/A"),
+    ("lot", ("lot.legalDescription", "lot.size"), "N/A"),
+    ("acres", ("lot.acres",), _fmt_optional),
+    ("amenities", ("nearby.amenities",), _fmt_list),
+    ("brokerage", ("office.brokerageName",), "N/A"),
+    ("agents", ("agents",), _fmt_agents),
+    (
+        "estimate",
+        ("estimate",),
+        _fmt_estimate,
+        ("estimate.value", "estimate.low", "estimate.high", "estimate.confidence"),
+    ),
+    ("lat", ("map.latitude",), _fmt_optional, ("map",)),
+    ("long", ("map.longitude",), _fmt_optional, ("map",)),
+    ("photo_count", ("photoCount",), _fmt_optional),
+)
+
+_LISTING_TEMPLATE = "\n".join(
+    [
+        "{idx}. {mls} | status: {status} | class/type: {class_type} / {subtype} | price: {price} | "
+        "listDate: {list_date} | DOM: {dom}",
+        "   Address: {address} | neighborhood: {neighborhood}",
+        "   Beds/Baths: {beds}/{baths} | sqft: {sqft} | year: {year} | HOA: {hoa} | pets: {pets}",
+        "   Lot: {lot} | acres: {acres}",
+        "   Amenities: {amenities}",
+        "   Brokerage: {brokerage} | Agents: {agents}",
+        "   Estimate: {estimate}",
+        "   Map: lat {lat}, long {long}",
+        "   Images: [placeholder; photoCount={photo_count}]",
+    ]
+)
+
+
+def _compile_listing_formatter(specs: Tuple[Tuple[Any, ...], ...], template: str):
+    """Compile the field spec table into one `(listing, idx) -> str` function.
+
+    Generating the function source once lets every nested lookup, fallback chain and formatter call run as
+    straight-line code per listing instead of walking the spec table each time.
+    """
+    namespace: Dict[str, Any] = {"_EMPTY": _EMPTY}
+    parents: Dict[str, str] = {}
+    body: List[str] = []
+
+    def _parent(prefix: Tuple[str, ...]) -> str:
+        key = ".".join(prefix)
+        if key not in parents:
+            owner = _parent(prefix[:-1]) if len(prefix) > 1 else "listing"
+            parents[key] = f"_p{len(parents)}"
+            body.append(f"    {parents[key]} = {owner}.get({prefix[-1]!r}) or _EMPTY")
+        return parents[key]
+
+    exprs: Dict[str, str] = {"idx": "idx"}
+    for idx, spec in enumerate(specs):
+        name, paths, formatter = spec[0], spec[1], spec[2]
+        lookups = []
+        for path in paths:
+            keys = tuple(path.split("."))
+            owner = _parent(keys[:-1]) if len(keys) > 1 else "listing"
+            lookups.append(f"{owner}.get({keys[-1]!r})")
+        expr = " or ".join(lookups)
+        if isinstance(formatter, str):
+            expr = f"({expr}) or {formatter!r}"
+        else:
+            namespace[f"_fmt{idx}"] = formatter
+            expr = f"_fmt{idx}({expr})"
+        body.append(f"    {name} = {expr}")
+
+    parts = []
+    for literal, field, _spec, _conv in string.Formatter().parse(template):
+        literal = literal.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(literal.replace("{", "{{").replace("}", "}}"))
+        if field is not None:
+            parts.append("{" + field + "}")
+    source = "\n".join(["def _format_listing(listing, idx):"] + body + ['    return f"' + "".join(parts) + '"'])
+    filename = "<listing-formatter>"
+    # Register the source so tracebacks and pdb show the generated lines; it is also kept on the function.
+    linecache.cache[filename] = (len(source), None, source.splitlines(True), filename)
+    exec(compile(source, filename, "exec"), namespace)  # noqa: S102 - source built from the spec table
+    formatter = namespace["_format_listing"]
+    formatter.source = source
+    return formatter
+
+
+_format_listing = _compile_listing_formatter(_LISTING_FIELD_SPECS, _LISTING_TEMPLATE)
+
+
+# Fields kept by stream_parse projections beyond the formatter manifest and compact fields, for features that
+# read listings after the fetch (incremental watermarks, the local store).
+_STREAM_EXTRA_FIELDS: Tuple[str, ...] = ("timestamps.repliersUpdatedOn", "updatedOn", "details.propertyType")
+
+# Listing fields read by _format_listings, derived from the spec table. Used to build the Repliers `fields`
+# param in lean mode, so it cannot drift from what the formatter reads.
+_FORMATTER_FIELDS: Tuple[str, ...] = tuple(
+    dict.fromkeys(field for spec in _LISTING_FIELD_SPECS for field in (spec[3] if len(spec) > 3 else spec[1]))
+)
+
+
+def _lean_fields(extra: Optional[List[str]] = None) -> str:
+    """Return the comma-separated `fields` value covering the formatter manifest plus any extra paths."""
+    merged = list(dict.fromkeys(list(_FORMATTER_FIELDS) + list(extra or [])))
+    return ",".join(merged)
+
+
+def _extract_listings(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Return the listings array from a Repliers response, tolerating alternate key names."""
+    listings = data.get("listings") or data.get("results") or data.get("items") or []
+    return listings if isinstance(listings, list) else []
+
+
+def _format_listings(
+    listings: List[Dict[str, Any]], start: int = 1, extras: Optional[List[str]] = None
+) -> str:
+    """Build a detailed summary of all listings, leaving images as placeholders.
+
+    `extras`, when given, holds one block of extra lines per listing (photos, hazards; see `_merge_extras`),
+    appended after it.
+    """
+    if not listings:
+        return "No listings found."
+    if extras:
+        return "\n".join(
+            [
+                f"{_format_listing(listing, idx)}\n{block}"
+                for idx, (listing, block) in enumerate(zip(listings, extras), start=start)
+            ]
+        )
+    return "\n".join([_format_listing(listing, idx) for idx, listing in enumerate(listings, start=start)])
+
+
+class _ListingStreamParser:
+    """Incremental parser for a /listings response body that yields listings one at a time.
+
+    Top-level fields other than the listings array are small and decoded whole; each element of the array is
+    decoded as soon as it is complete, so only one full listing is held in memory at a time.
+    """
+
+    _ARRAY_KEYS = ("listings", "results", "items")
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._buf = ""
+        self._pos = 0
+        self._state = "start"
+        self._key: Optional[str] = None
+
+    def _skip_ws(self) -> int:
+        buf, pos = self._buf, self._pos
+        while pos < len(buf) and buf[pos] in " \t\r\n":
+            pos += 1
+        self._pos = pos
+        return pos
+
+    def _decode(self, final: bool) -> Optional[Tuple[Any, int]]:
+        """Decode one JSON value at the cursor, or return None when more input is needed."""
+        try:
+            value, end = self._decoder.raw_decode(self._buf, self._pos)
+        except json.JSONDecodeError:
+            if final:
+                raise
+            return None
+        if end >= len(self._buf) and not final:
+            return None  # a number at the end of the buffer may still be incomplete
+        return value, end
+
+    def feed(self, text: str, final: bool = False) -> List[Tuple[str, Any, Any]]:
+        """Consume more text and return ("field", key, value) and ("listing", None, listing) events."""
+        self._buf = self._buf[self._pos :] + text
+        self._pos = 0
+        events: List[Tuple[str, Any, Any]] = []
+        while True:
+            pos = self._skip_ws()
+            if pos >= len(self._buf) or self._state == "end":
+                break
+            ch = self._buf[pos]
+            if self._state == "start":
+                if ch != "{":
+                    raise ValueError("Expected a JSON object response")
+                self._pos, self._state = pos + 1, "key"
+            elif self._state in ("key", "items") and ch == ",":
+                self._pos = pos + 1
+            elif self._state == "key" and ch == "}":
+                self._pos, self._state = pos + 1, "end"
+            elif self._state == "items" and ch == "]":
+                self._pos, self._state = pos + 1, "key"
+            elif self._state == "colon":
+                if ch != ":":
+                    raise ValueError("Malformed JSON object")
+                self._pos, self._state = pos + 1, "value"
+            elif self._state == "value" and self._key in self._ARRAY_KEYS and ch == "[":
+                self._pos, self._state = pos + 1, "items"
+            else:
+                decoded = self._decode(final)
+                if decoded is None:
+                    break
+                value, self._pos = decoded
+                if self._state == "key":
+                    self._key, self._state = value, "colon"
+                elif self._state == "value":
+                    events.append(("field", self._key, value))
+                    self._state = "key"
+                else:
+                    events.append(("listing", None, value))
+        if final and self._state != "end":
+            raise ValueError("Incomplete JSON response")
+        return events
+
+
+def _merge_extras(*blocks: Optional[List[str]]) -> Optional[List[str]]:
+    """Combine per-listing extra lines from several stages into one block per listing (None if all are off)."""
+    present = [block for block in blocks if block]
+    if not present:
+        return None
+    return ["\n".join(parts) for parts in zip(*present)]
+
+
+def _render_output(
+    data: Dict[str, Any],
+    listings: List[Dict[str, Any]],
+    mode: str,
+    compact_fields: List[str],
+    page_errors: Optional[List[str]] = None,
+    extras: Optional[List[str]] = None,
+) -> str:
+    """Render formatted listings plus the JSON section selected by the output mode."""
+    output = _format_listings(listings, extras=extras)
+    if page_errors:
+        output += "\n\nSome pages failed:\n" + "\n".join(page_errors)
+
+    if mode == "full":
+        full_json = json.dumps({**data, "listings": listings}, indent=2)
+        output += f"\n\nFull response JSON:\n{full_json}"
+    elif mode == "compact":
+        compact = {k: data[k] for k in ("page", "numPages", "pageSize", "count", "statistics") if k in data}
+        compact["listings"] = [_project(item, compact_fields) for item in listings]
+        compact["returned"] = len(listings)
+        compact_json = json.dumps(compact, separators=(",", ":"), default=str)
+        output += f"\n\nCompact response JSON:\n{compact_json}"
+    return output
+
+
+def _error_message(exc: Exception) -> str:
+    """Turn a request/parse exception into the user-facing error string."""
+    if isinstance(exc, requests.HTTPError) and exc.response is not None:
+        return f"HTTP error {exc.response.status_code}: {exc.response.text}"
+    if isinstance(exc, requests.RequestException):
+        return f"Request failed: {exc}"
+    if isinstance(exc, ValueError):
+        return f"Failed to parse response JSON: {exc}"
+    return f"Unexpected error: {exc}"
+
+
+def _to_float(value: Any) -> Optional[float]:
+    """Parse numbers that Repliers sometimes sends as strings (e.g. sqft "1239")."""
+    if isinstance(value, bool) or value is None:
+        return None
+    try:
+        return float(str(value).replace(",", "").replace("$", "").strip())
+    except ValueError:
+        return None
+
+
+_MARKET_STATISTICS = "avg-listPrice,med-listPrice,min-listPrice,max-listPrice,avg-daysOnMarket,med-daysOnMarket"
+_MARKET_MONEY_HINTS = ("price", "tax", "fee", "maintenance", "estimate")
+
+
+def _market_value(metric: str, column: str, value: Any) -> str:
+    """Format one statistic, as money for price-like metrics (counts stay plain numbers)."""
+    number = _to_float(value)
+    if number is None:
+        return "N/A" if value is None else str(value)
+    if column not in ("cnt", "count") and any(hint in metric.lower() for hint in _MARKET_MONEY_HINTS):
+        return f"${number:,.0f}"
+    return f"{number:,.0f}" if number.is_integer() or abs(number) >= 100 else f"{number:,.1f}"
+
+
+def _market_table(header: List[str], rows: List[List[str]]) -> str:
+    lines = ["| " + " | ".join(header) + " |", "|" + "---|" * len(header)]
+    lines += ["| " + " | ".join(row) + " |" for row in rows]
+    return "\n".join(lines)
+
+
+def _flatten_counts(node: Any, prefix: str = "") -> List[Tuple[str, Dict[str, Any]]]:
+    """Find the {value: count} leaves of a Repliers aggregates block, keyed by dotted field path."""
+    if not isinstance(node, dict) or not node:
+        return []
+    if all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in node.values()):
+        return [(prefix, node)]
+    found: List[Tuple[str, Dict[str, Any]]] = []
+    for key, child in node.items():
+        found.extend(_flatten_counts(child, f"{prefix}.{key}" if prefix else str(key)))
+    return found
+
+
+def _render_market_stats(data: Dict[str, Any], top: int = 10) -> str:
+    """Render the statistics and aggregates blocks of a listings response as compact markdown tables."""
+    sections = [f"Matching listings: {int(_to_float(data.get('count')) or 0):,}"]
+    statistics = data.get("statistics") or {}
+
+    summary_rows, columns = [], []
+    grouped: List[str] = []
+    for metric, values in statistics.items():
+        if not isinstance(values, dict):
+            summary_rows.append((metric, {"value": values}))
+            continue
+        scalars = {k: v for k, v in values.items() if not isinstance(v, dict)}
+        if scalars:
+            summary_rows.append((metric, scalars))
+        for group, periods in values.items():
+            if not isinstance(periods, dict):
+                continue
+            period_columns = sorted({k for v in periods.values() if isinstance(v, dict) for k in v})
+            rows = [
+                [str(period)] + [_market_value(metric, col, stats.get(col)) for col in period_columns]
+                for period, stats in sorted(periods.items())
+                if isinstance(stats, dict)
+            ]
+            if rows:
+                grouped.append(f"{metric} by {group}:\n" + _market_table(["Period"] + period_columns, rows))
+    for _, scalars in summary_rows:
+        columns += [k for k in scalars if k not in columns]
+    if summary_rows:
+        rows = [
+            [metric] + [_market_value(metric, col, scalars.get(col)) for col in columns]
+            for metric, scalars in summary_rows
+        ]
+        sections.append(_market_table(["Metric"] + columns, rows))
+    sections.extend(grouped)
+
+    for path, counts in _flatten_counts(data.get("aggregates") or {}):
+        ranked = sorted(counts.items(), key=lambda kv: (-kv[1], str(kv[0])))
+        shown = ", ".join(f"{value} ({count:,})" for value, count in ranked[:top])
+        more = f", +{len(ranked) - top} more" if len(ranked) > top else ""
+        sections.append(f"{path}: {shown}{more}")
+
+    if len(sections) == 1:
+        sections.append("No statistics were returned; pass `statistics` (e.g. 'avg-listPrice,med-soldPrice').")
+    return "\n\n".join(sections)
+
+
+def _stats_row(label: str, data: Dict[str, Any], listings: List[Dict[str, Any]]) -> List[str]:
+    """Compute one row of the batch comparison table from a query's listings."""
+    prices, sqfts, ppsf, doms = [], [], [], []
+    for listing in listings:
+        details = listing.get("details") or {}
+        price = _to_float(listing.get("listPrice"))
+        sqft = _to_float(details.get("sqft"))
+        dom = _to_float(listing.get("simpleDaysOnMarket") or listing.get("daysOnMarket"))
+        if price:
+            prices.append(price)
+        if sqft:
+            sqfts.append(sqft)
+        if price and sqft:
+            ppsf.append(price / sqft)
+        if dom is not None:
+            doms.append(dom)
+
+    def _money(values: List[float], fn) -> str:
+        return f"${fn(values):,.0f}" if values else "N/A"
+
+    def _num(values: List[float]) -> str:
+        return f"{stats_lib.median(values):,.0f}" if values else "N/A"
+
+    return [
+        label,
+        str(data.get("count", len(listings))),
+        str(len(listings)),
+        _money(prices, min),
+        _money(prices, stats_lib.median),
+        _money(prices, max),
+        _num(sqfts),
+        _money(ppsf, stats_lib.median),
+        _num(doms),
+    ]
+
+
+# (column, listing paths tried in order) for the analytics stage.
+_ANALYTICS_COLUMNS: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+    ("listPrice", ("listPrice",)),
+    ("sqft", ("details.sqft",)),
+    ("daysOnMarket", ("simpleDaysOnMarket", "daysOnMarket")),
+    ("beds", ("details.numBedrooms",)),
+    ("baths", ("details.numBathrooms",)),
+    ("estimate", ("estimate.value",)),
+    ("soldPrice", ("soldPrice",)),
+)
+_ANALYTICS_FIELDS: Tuple[str, ...] = tuple(path for _, paths in _ANALYTICS_COLUMNS for path in paths)
+_ANALYTICS_PERCENTILES = (10, 25, 50, 75, 90)
+_PRICE_BANDS = (0, 200_000, 300_000, 400_000, 500_000, 750_000, 1_000_000, 2_000_000, math.inf)
+_DOM_BANDS = (0, 7, 30, 60, 90, 180, math.inf)
+
+
+def _analytics_matrix(listings: List[Dict[str, Any]]) -> List[List[float]]:
+    """Pull the analytics columns out of listings as rows of floats (NaN where missing or unparseable)."""
+    nan = math.nan
+    getters = [[tuple(path.split(".")) for path in paths] for _, paths in _ANALYTICS_COLUMNS]
+    rows = []
+    for listing in listings:
+        row = []
+        for paths in getters:
+            number = nan
+            for parts in paths:
+                value: Any = listing
+                for part in parts:
+                    value = value.get(part) if isinstance(value, dict) else None
+                if value is None or value == "":
+                    continue
+                if type(value) is int or type(value) is float:
+                    number = float(value)
+                    break
+                parsed = _to_float(value)
+                if parsed is not None:
+                    number = parsed
+                    break
+            row.append(number)
+        rows.append(row)
+    return rows
+
+
+def _percentiles(values: List[float], points: Tuple[int, ...]) -> List[float]:
+    """Linear-interpolated percentiles of sorted values (numpy's default method), for the no-numpy path."""
+    if not values:
+        return [math.nan] * len(points)
+    out = []
+    for point in points:
+        rank = (len(values) - 1) * point / 100
+        low = int(rank)
+        high = min(low + 1, len(values) - 1)
+        out.append(values[low] + (values[high] - values[low]) * (rank - low))
+    return out
+
+
+def _band_counts(values: List[float], bands: Tuple[float, ...]) -> List[int]:
+    counts = [0] * (len(bands) - 1)
+    for value in values:
+        index = bisect.bisect_right(bands, value) - 1
+        if 0 <= index < len(counts):
+            counts[index] += 1
+    return counts
+
+
+def _compute_analytics(listings: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Summarize a listing set: per-column and derived percentiles/means plus price and DOM histograms.
+
+    With numpy the columns become one float matrix and every statistic is a single vectorized call over
+    it; without numpy the same numbers come from sorted lists.
+    """
+    names = [name for name, _ in _ANALYTICS_COLUMNS] + ["pricePerSqft", "listVsEstimatePct", "soldVsListPct"]
+    rows = _analytics_matrix(listings)
+    summary: Dict[str, Dict[str, float]] = {}
+
+    if np is not None and rows:
+        matrix = np.asarray(rows, dtype=float)
+        price, sqft, estimate, sold = matrix[:, 0], matrix[:, 1], matrix[:, 5], matrix[:, 6]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            derived = np.column_stack(
                 [
-                    f"{idx}. {listing.get('mlsNumber') or 'MLS N/A'} | status: {status or 'N/A'} | class/type: {class_type or 'N/A'} / {subtype or 'N/A'} | price: {price_str} | listDate: {listing.get('listDate') or 'N/A'} | DOM: {dom or 'N/A'}",
-                    f"   Address: {_addr(address)} | neighborhood: {address.get('neighborhood') or 'N/A'}",
-                    f"   Beds/Baths: {beds or 'N/A'}/{baths or 'N/A'} | sqft: {sqft_str} | year: {year or 'N/A'} | HOA: {hoa_str} | pets: {pets or 'N/A'}",
-                    f"   Lot: {lot_desc or 'N/A'} | acres: {acres if acres is not None else 'N/A'}",
-                    f"   Amenities: {', '.join(amenities) if amenities else 'N/A'}",
-                    f"   Brokerage: {brokerage or 'N/A'} | Agents: {agent_names or 'N/A'}",
-                    f"   Estimate: {estimate_str}",
-                    f"   Map: lat {coords.get('latitude', 'N/A')}, long {coords.get('longitude', 'N/A')}",
-                    f"   Images: [placeholder; photoCount={listing.get('photoCount', 'N/A')}]",
+                    np.where(sqft > 0, price / sqft, np.nan),
+                    np.where(estimate > 0, (price / estimate - 1) * 100, np.nan),
+                    np.where(price > 0, (sold / price - 1) * 100, np.nan),
                 ]
             )
-        )
+        full = np.hstack([matrix, derived])
+        full[~np.isfinite(full)] = np.nan
+        counts = np.sum(~np.isnan(full), axis=0)
+        # Sorting pushes NaNs to the end of each column, so column c's valid values are ordered[:counts[c], c]
+        # and every percentile of every column is one fancy-indexed interpolation.
+        ordered = np.sort(full, axis=0)
+        cols = np.arange(full.shape[1])
+        ranks = np.maximum(counts - 1, 0)[None, :] * (np.asarray(_ANALYTICS_PERCENTILES, dtype=float)[:, None] / 100)
+        low = np.floor(ranks).astype(int)
+        high = np.minimum(low + 1, np.maximum(counts - 1, 0)[None, :])
+        pct = ordered[low, cols] + (ordered[high, cols] - ordered[low, cols]) * (ranks - low)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            means = np.nansum(full, axis=0) / counts
+        for col, name in enumerate(names):
+            if counts[col]:
+                summary[name] = {"n": int(counts[col]), "mean": float(means[col])}
+                summary[name].update({f"p{p}": float(pct[i, col]) for i, p in enumerate(_ANALYTICS_PERCENTILES)})
+        prices, doms = price[~np.isnan(price)], matrix[:, 2][~np.isnan(matrix[:, 2])]
+        price_hist = np.histogram(prices, bins=np.array(_PRICE_BANDS[:-1] + (np.inf,)))[0].tolist()
+        dom_hist = np.histogram(doms, bins=np.array(_DOM_BANDS[:-1] + (np.inf,)))[0].tolist()
+    else:
+        columns: List[List[float]] = [[] for _ in names]
+        for row in rows:
+            price, sqft, estimate, sold = row[0], row[1], row[5], row[6]
+            extra = [
+                price / sqft if sqft > 0 else math.nan,
+                (price / estimate - 1) * 100 if estimate > 0 else math.nan,
+                (sold / price - 1) * 100 if price > 0 else math.nan,
+            ]
+            for col, value in enumerate(row + extra):
+                if math.isfinite(value):
+                    columns[col].append(value)
+        for col, name in enumerate(names):
+            values = sorted(columns[col])
+            if values:
+                summary[name] = {"n": len(values), "mean": math.fsum(values) / len(values)}
+                points = _percentiles(values, _ANALYTICS_PERCENTILES)
+                summary[name].update({f"p{p}": value for p, value in zip(_ANALYTICS_PERCENTILES, points)})
+        price_hist = _band_counts(columns[0], _PRICE_BANDS)
+        dom_hist = _band_counts(columns[2], _DOM_BANDS)
+
+    return {
+        "listings": len(listings),
+        "summary": summary,
+        "histograms": {"listPrice": [int(c) for c in price_hist], "daysOnMarket": [int(c) for c in dom_hist]},
+    }
+
 
+def _band_label(low: float, high: float, money: bool) -> str:
+    def _fmt(value: float) -> str:
+        if not money or not value:
+            return f"${value:,.0f}" if money else f"{value:,.0f}"
+        return f"${value / 1_000_000:g}M" if value >= 1_000_000 else f"${value / 1000:g}k"
+
+    return f"{_fmt(low)}+" if math.isinf(high) else f"{_fmt(low)}-{_fmt(high)}"
+
+
+def _render_analytics(result: Dict[str, Any]) -> str:
+    """Render `_compute_analytics` output as a compact markdown table plus histogram lines."""
+    rows = []
+    for name, stats in result["summary"].items():
+        money = name in ("listPrice", "estimate", "soldPrice", "pricePerSqft")
+        suffix = "%" if name.endswith("Pct") else ""
+
+        def _fmt(value: float) -> str:
+            if money:
+                return f"${value:,.0f}"
+            return f"{value:,.1f}{suffix}" if suffix or abs(value) < 100 else f"{value:,.0f}"
+
+        rows.append(
+            [name, str(stats["n"])]
+            + [_fmt(stats[f"p{p}"]) for p in _ANALYTICS_PERCENTILES]
+            + [_fmt(stats["mean"])]
+        )
+    if not rows:
+        return "No numeric listing fields to analyze."
+    header = ["Metric", "n"] + [("median" if p == 50 else f"p{p}") for p in _ANALYTICS_PERCENTILES] + ["mean"]
+    lines = [_market_table(header, rows)]
+    for name, bands, money in (("listPrice", _PRICE_BANDS, True), ("daysOnMarket", _DOM_BANDS, False)):
+        counts = result["histograms"][name]
+        if any(counts):
+            parts = [
+                f"{_band_label(bands[i], bands[i + 1], money)}: {count}" for i, count in enumerate(counts) if count
+            ]
+            lines.append(f"{name} bands: " + ", ".join(parts))
     return "\n".join(lines)
 
 
+_GEOHASH_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_HAZARD_KINDS = ("flood", "alerts")
+
+
+def _geohash_cell(lat: float, lon: float, precision: int) -> Tuple[str, float, float]:
+    """Return the geohash of a point at `precision` characters plus the center of that cell."""
+    lat_lo, lat_hi, lon_lo, lon_hi = -90.0, 90.0, -180.0, 180.0
+    chars: List[str] = []
+    bits = code = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if lon >= mid:
+                code, lon_lo = code * 2 + 1, mid
+            else:
+                code, lon_hi = code * 2, mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                code, lat_lo = code * 2 + 1, mid
+            else:
+                code, lat_hi = code * 2, mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_GEOHASH_BASE32[code])
+            bits = code = 0
+    return "".join(chars), (lat_lo + lat_hi) / 2, (lon_lo + lon_hi) / 2
+
+
+def _parse_flood_zone(data: Any) -> Optional[Dict[str, Any]]:
+    """Reduce an NFHL flood hazard layer query to {zone, subtype, sfha}; None for an ArcGIS error body."""
+    if not isinstance(data, dict) or "error" in data:
+        return None
+    features = data.get("features") or []
+    attributes = (features[0].get("attributes") or {}) if features else {}
+    return {
+        "zone": attributes.get("FLD_ZONE"),
+        "subtype": attributes.get("ZONE_SUBTY"),
+        "sfha": attributes.get("SFHA_TF") == "T",
+    }
+
+
+def _parse_alerts(data: Any) -> Optional[Dict[str, Any]]:
+    """Reduce an NWS active-alerts response to its distinct event names."""
+    if not isinstance(data, dict) or not isinstance(data.get("features"), list):
+        return None
+    events = {((f.get("properties") or {}).get("event") or "").strip() for f in data["features"]}
+    return {"events": sorted(e for e in events if e)}
+
+
+def _hazard_line(flood: Optional[Dict[str, Any]], alerts: Optional[Dict[str, Any]]) -> str:
+    if flood is None:
+        flood_text = "flood zone n/a"
+    elif not flood.get("zone"):
+        flood_text = "flood zone unmapped"
+    else:
+        flood_text = f"flood zone {flood['zone']}" + (" (SFHA)" if flood.get("sfha") else "")
+    if alerts is None:
+        alerts_text = "alerts n/a"
+    elif not alerts.get("events"):
+        alerts_text = "no active alerts"
+    else:
+        alerts_text = "alerts: " + ", ".join(alerts["events"])
+    return f"   Hazards: {flood_text} | {alerts_text}"
+
+
+_IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".gif")
+
+
+def _image_url(cdn_url: str, path: str, width: int) -> str:
+    """CDN URL of a listing image at a size variant; absolute URLs from other hosts are returned unchanged."""
+    if path.startswith(("http://", "https://")):
+        if not path.startswith(cdn_url):
+            return path
+        path = path[len(cdn_url) :]
+    url = f"{cdn_url.rstrip('/')}/{path.lstrip('/')}"
+    return f"{url}?width={int(width)}" if width else url
+
+
+def _photo_line(hero: str, gallery: List[str], more: int, mls: Any) -> str:
+    line = f"   Photos: hero {hero}"
+    if gallery:
+        line += " | gallery: " + ", ".join(gallery)
+    rest = more - len(gallery)
+    if rest > 0:
+        line += f' | +{rest} more via listing_photos(mlsNumber="{mls}")' if mls else f" | +{rest} more"
+    return line
+
+
+class _ThumbnailCache:
+    """Directory of downloaded thumbnails, evicting the least recently used files beyond `max_bytes`.
+
+    File modification times record last use, so the order survives restarts and is shared by every worker
+    process using the directory. All methods do file I/O; call them off the event loop.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._bytes = sum(size for _, size, _ in self._entries())
+
+    @staticmethod
+    def filename(path: str, width: int) -> str:
+        ext = os.path.splitext(path.split("?", 1)[0])[1].lower()
+        digest = hashlib.sha256(f"{path}|{int(width)}".encode("utf-8")).hexdigest()[:32]
+        return digest + (ext if ext in _IMAGE_EXTENSIONS else ".jpg")
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.is_file() and not entry.name.endswith(".tmp"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def lookup(self, names: List[str]) -> set:
+        """Return the names already cached, marking each as just used."""
+        present = set()
+        for name in names:
+            try:
+                os.utime(os.path.join(self.directory, name))
+                present.add(name)
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            self.hits += len(present)
+            self.misses += len(names) - len(present)
+        return present
+
+    def store(self, name: str, data: bytes) -> None:
+        """Write a thumbnail atomically, then evict by recency if the directory grew past `max_bytes`."""
+        path = os.path.join(self.directory, name)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as fh:
+            fh.write(data)
+        try:
+            replaced = os.path.getsize(path)  # a concurrent search may have stored the same thumbnail
+        except FileNotFoundError:
+            replaced = 0
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._bytes += len(data) - replaced
+            if not self.max_bytes or self._bytes <= self.max_bytes:
+                return
+            # Other processes write here too, so re-measure before evicting.
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            for _, size, victim in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(victim)
+                    self.evictions += 1
+                except FileNotFoundError:
+                    pass
+                total -= size
+            self._bytes = total
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "bytes": self._bytes}
+
+
+class _RepliersClient:
+    """HTTP transport shared by one `Tools` instance: pooled sessions for either transport, the thread pool
+    for blocking calls, the rate limiter and retries.
+
+    Kept off `Tools` because OpenWebUI offers every method there to the model; nothing reachable from a chat
+    can send the API key to an arbitrary URL or close the pool under calls in flight.
+    """
+
+    def __init__(self, valves: Callable[[], Any]):
+        self._valves = valves
+        self._session: Optional[requests.Session] = None
+        self._session_key: Optional[Tuple[Any, ...]] = None
+        self._session_lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_size = 0
+        self._loop_state: Dict[str, Any] = {}
+        self._external_session: Optional[requests.Session] = None
+        self._limiter = _TokenBucket()
+        self.stats = {"throttled": 0, "retried": 0, "gave_up": 0, "coalesced": 0}
+
+    @property
+    def valves(self) -> Any:
+        """The owning tool's current valves; OpenWebUI may replace the object between calls."""
+        return self._valves()
+
+    def get_session(self) -> requests.Session:
+        """Return the shared pooled session, rebuilding it when connection valves change."""
+        key = (
+            self.valves.base_url,
+            self.valves.rapidapi_key,
+            self.valves.http_pool_maxsize,
+            self.valves.http_keep_alive,
+        )
+        with self._session_lock:
+            if self._session is None or self._session_key != key:
+                # The old session is not closed here: calls already in flight on it may still be using it.
+                # Once they finish it is unreferenced and its pooled connections are released with it.
+                pool_size = max(1, int(self.valves.http_pool_maxsize or 1))
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers.update(
+                    {
+                        "REPLIERS-API-KEY": self.valves.rapidapi_key,
+                        "Accept": "application/json",
+                        "Content-Type": "application/json",
+                    }
+                )
+                if not self.valves.http_keep_alive:
+                    session.headers["Connection"] = "close"
+                self._session = session
+                self._session_key = key
+            return self._session
+
+    def transport(self) -> str:
+        """Resolve the `http_transport` valve to 'aiohttp' or 'requests'."""
+        choice = (self.valves.http_transport or "auto").strip().lower()
+        if choice == "requests" or aiohttp is None:
+            return "requests"
+        return "aiohttp"
+
+    def get_executor(self) -> ThreadPoolExecutor:
+        """Return the thread pool running blocking requests calls, sized by `max_concurrent_requests`.
+
+        A dedicated pool keeps HTTP waits from starving the loop's default executor, which the SQLite stores
+        and the formatter offload also use.
+        """
+        size = max(1, int(self.valves.max_concurrent_requests or 1))
+        with self._session_lock:
+            if self._executor is None or self._executor_size != size:
+                if self._executor is not None:
+                    self._executor.shutdown(wait=False)
+                self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="repliers-http")
+                self._executor_size = size
+            return self._executor
+
+    def get_loop_state(self) -> Dict[str, Any]:
+        """Return the per-event-loop request semaphore and aiohttp session, rebuilding them on valve changes.
+
+        Both are bound to the running loop, so a tool instance reused from another loop gets fresh ones.
+        """
+        loop = asyncio.get_event_loop()
+        limit = max(1, int(self.valves.max_concurrent_requests or 1))
+        state = self._loop_state
+        if state.get("loop") is not loop or state.get("limit") != limit:
+            state = self._loop_state = {"loop": loop, "limit": limit, "semaphore": asyncio.Semaphore(limit)}
+        return state
+
+    def _get_aiohttp_session(self) -> Any:
+        """Return the pooled aiohttp session for the running loop, mirroring the requests session settings."""
+        state = self.get_loop_state()
+        key = (
+            self.valves.base_url,
+            self.valves.rapidapi_key,
+            self.valves.http_pool_maxsize,
+            self.valves.http_keep_alive,
+            self.valves.request_timeout,
+        )
+        session = state.get("aiohttp_session")
+        if session is None or session.closed or state.get("aiohttp_key") != key:
+            if session is not None and not session.closed:
+                # Requests still in flight on the old session end within its timeout; close it after that.
+                retired = session
+                state.setdefault("retired_sessions", []).append(retired)
+                state["loop"].call_later(
+                    float(retired.timeout.total or 0) + 1, lambda: asyncio.ensure_future(retired.close())
+                )
+            connector = aiohttp.TCPConnector(
+                limit=max(1, int(self.valves.http_pool_maxsize or 1)),
+                force_close=not self.valves.http_keep_alive,
+            )
+            trace = aiohttp.TraceConfig()
+            trace.on_connection_create_start.append(_trace_connect_start)
+            trace.on_connection_create_end.append(_trace_connect_end)
+            session = aiohttp.ClientSession(
+                connector=connector,
+                trace_configs=[trace],
+                headers={
+                    "REPLIERS-API-KEY": self.valves.rapidapi_key,
+                    "Accept": "application/json",
+                    "Content-Type": "application/json",
+                },
+                timeout=aiohttp.ClientTimeout(total=self.valves.request_timeout),
+            )
+            state["aiohttp_session"] = session
+            state["aiohttp_key"] = key
+        return session
+
+    async def _send_aiohttp(
+        self,
+        method: str,
+        url: str,
+        params: Dict[str, Any],
+        payload: Optional[Dict[str, Any]],
+        stream: bool,
+    ) -> _AiohttpResponse:
+        """Send one request with aiohttp, mapping its errors onto the requests exceptions the callers handle."""
+        session = self._get_aiohttp_session()
+        trace_ctx: Dict[str, float] = {}
+        started = time.perf_counter()
+        try:
+            response = await session.request(
+                method, url, params=_query_items(params), json=payload, trace_request_ctx=trace_ctx
+            )
+            headers_at = time.perf_counter()
+            _record_phase("ttfb", headers_at - started - trace_ctx.get("connect", 0.0))
+            if stream and response.status < 400:
+                return _AiohttpResponse(response)
+            try:
+                return _AiohttpResponse(response, await response.read())
+            finally:
+                response.release()
+                _record_phase("download", time.perf_counter() - headers_at)
+        except asyncio.TimeoutError as exc:
+            raise requests.Timeout(f"Request to {url} timed out") from exc
+        except aiohttp.ClientError as exc:
+            raise requests.ConnectionError(str(exc)) from exc
+
+    async def aclose(self) -> None:
+        """Close pooled connections held by either transport."""
+        sessions = [self._loop_state.get("aiohttp_session")] + self._loop_state.get("retired_sessions", [])
+        for session in sessions:
+            if session is not None and not session.closed:
+                await session.close()
+        self._loop_state = {}
+        with self._session_lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+            if self._external_session is not None:
+                self._external_session.close()
+                self._external_session = None
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+    async def _throttle(self) -> None:
+        """Wait for a rate limiter token, queueing behind earlier callers when the bucket is empty."""
+        self._limiter.rate = float(self.valves.rate_limit_per_second or 0)
+        self._limiter.burst = max(1, int(self.valves.rate_limit_burst or 1))
+        delay = self._limiter.reserve()
+        if delay > 0:
+            self.stats["throttled"] += 1
+            with _timed("queue"):
+                await asyncio.sleep(delay)
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        params: Dict[str, Any],
+        payload: Optional[Dict[str, Any]] = None,
+        stream: bool = False,
+    ) -> Any:
+        """Send a request through the selected transport, retrying 429/5xx and connection errors with backoff.
+
+        Retry-After is honored in full when the server sends it, up to `retry_after_max`. At most
+        `max_concurrent_requests` attempts are in flight at once. Returns a requests.Response or an
+        `_AiohttpResponse`; raises the last error once retries run out. Only URLs under `base_url` are
+        accepted, since every request carries the API key.
+        """
+        if not url.startswith(self.valves.base_url.rstrip("/") + "/"):
+            raise ValueError(f"Refusing to send the Repliers API key outside base_url: {url}")
+        transport = self.transport()
+        semaphore = self.get_loop_state()["semaphore"]
+
+        async def _do_request():
+            with _timed("queue"):
+                await semaphore.acquire()
+            try:
+                _count("requests")
+                if transport == "aiohttp":
+                    return await self._send_aiohttp(method, url, params, payload, stream)
+                session = self.get_session()
+                started = time.perf_counter()
+                response = await asyncio.get_event_loop().run_in_executor(
+                    self.get_executor(),
+                    lambda: session.request(
+                        method, url, params=params, json=payload, timeout=self.valves.request_timeout, stream=stream
+                    ),
+                )
+                # requests reports time-to-headers (connect included) as `elapsed`; the rest is the body read.
+                ttfb = response.elapsed.total_seconds()
+                _record_phase("ttfb", ttfb)
+                if not stream:
+                    _record_phase("download", time.perf_counter() - started - ttfb)
+                return response
+            finally:
+                semaphore.release()
+
+        max_retries = max(0, int(self.valves.max_retries or 0))
+        attempt = 0
+        while True:
+            await self._throttle()
+            response = None
+            try:
+                response = await _do_request()
+                if response.status_code not in _RETRY_STATUS_CODES:
+                    if response.status_code >= 400:
+                        _raise_for_status_closed(response)
+                    return response
+                if attempt >= max_retries:
+                    self.stats["gave_up"] += 1
+                    _raise_for_status_closed(response)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= max_retries:
+                    self.stats["gave_up"] += 1
+                    raise
+            delay = _retry_after_seconds(response)
+            if delay is None:
+                backoff = random.uniform(0, float(self.valves.retry_backoff_base or 0) * (2**attempt))
+                delay = min(backoff, float(self.valves.retry_backoff_max or 0))
+            else:
+                retry_after_max = float(self.valves.retry_after_max or 0)
+                if retry_after_max and delay > retry_after_max:
+                    # Retrying sooner than the server asked would only burn the retries; fail now instead.
+                    self.stats["gave_up"] += 1
+                    _raise_for_status_closed(response)
+            if response is not None:
+                response.close()  # hand a streamed connection back to the pool before waiting
+            attempt += 1
+            self.stats["retried"] += 1
+            with _timed("backoff"):
+                await asyncio.sleep(delay)
+
+    def get_external_session(self) -> requests.Session:
+        """Session for the hazard services and the image CDN; separate from the Repliers one so the API key
+        is never sent elsewhere."""
+        with self._session_lock:
+            if self._external_session is None:
+                session = requests.Session()
+                pool_size = max(1, int(self.valves.hazard_concurrency or 1), int(self.valves.image_concurrency or 1))
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._external_session = session
+            self._external_session.headers["User-Agent"] = self.valves.hazard_user_agent
+            return self._external_session
+
+
 class Tools:
     class Valves(BaseModel):
         rapidapi_key: str = Field(
@@ -152,21 +2187,1056 @@ class Tools:
             default=True,
             description="Include debug information in responses.",
         )
+        normalize_params: bool = Field(
+            default=True,
+            description="Canonicalize search params (casing, state names, '500k' prices, booleans, list order) "
+            "so equivalent searches share cache entries and in-flight requests.",
+        )
+        http_pool_maxsize: int = Field(
+            default=10,
+            description="Maximum pooled connections kept open to the Repliers API host.",
+        )
+        http_keep_alive: bool = Field(
+            default=True,
+            description="Reuse TCP/TLS connections between calls (disable to send 'Connection: close').",
+        )
+        request_timeout: int = Field(
+            default=30,
+            description="Timeout in seconds for each Repliers API request.",
+        )
+        http_transport: str = Field(
+            default="auto",
+            description="HTTP client: 'aiohttp' (native async, no worker threads), 'requests' (blocking session "
+            "run in a dedicated thread pool) or 'auto' (aiohttp when installed, else requests).",
+        )
+        max_concurrent_requests: int = Field(
+            default=16,
+            description="Maximum Repliers requests in flight at once across all searches on this tool instance.",
+        )
+        output_mode: str = Field(
+            default="compact",
+            description="Tool result content: 'summary' (formatted listings only), 'compact' (summary plus "
+            "compact JSON of compact_fields per listing) or 'full' (summary plus the full response JSON).",
+        )
+        compact_fields: str = Field(
+            default=(
+                "mlsNumber,status,standardStatus,class,type,listPrice,originalPrice,soldPrice,soldDate,listDate,"
+                "simpleDaysOnMarket,address,map.latitude,map.longitude,details.numBedrooms,details.numBathrooms,"
+                "details.sqft,details.yearBuilt,details.propertyType,details.style,details.description,lot,"
+                "taxes.annualAmount,condominium.fees,condominium.pets,estimate.value,estimate.low,estimate.high,"
+                "estimate.confidence,photoCount,imageInsights.summary.quality,office.brokerageName"
+            ),
+            description="Comma-separated dotted listing fields included per listing in 'compact' output mode.",
+        )
+        lean_fields: bool = Field(
+            default=True,
+            description="When `fields` is not provided, request only the listing fields the formatter and "
+            "compact output use (ignored in 'full' output mode).",
+        )
+        page_fetch_concurrency: int = Field(
+            default=4,
+            description="Maximum concurrent page requests when fetching multiple pages.",
+        )
+        max_pages_cap: int = Field(
+            default=10,
+            description="Hard cap on pages fetched by a single search when `fetch_all_pages` or `max_results` is set.",
+        )
+        rate_limit_per_second: float = Field(
+            default=5.0,
+            description="Sustained Repliers requests per second shared by all searches (0 disables throttling).",
+        )
+        rate_limit_burst: int = Field(
+            default=10,
+            description="Requests allowed in a burst before throttling starts queueing calls.",
+        )
+        max_retries: int = Field(
+            default=3,
+            description="Retries for 429/5xx responses and connection errors before giving up.",
+        )
+        retry_backoff_base: float = Field(
+            default=0.5,
+            description="Base delay in seconds for jittered exponential backoff between retries.",
+        )
+        retry_backoff_max: float = Field(
+            default=10.0,
+            description="Maximum delay in seconds between retries when the server sends no Retry-After.",
+        )
+        retry_after_max: float = Field(
+            default=120.0,
+            description="Longest Retry-After in seconds that is waited out; a request asked to wait longer fails "
+            "straight away (0 waits out any Retry-After).",
+        )
+        batch_max_queries: int = Field(
+            default=10,
+            description="Maximum queries accepted by one search_listings_batch call.",
+        )
+        batch_concurrency: int = Field(
+            default=3,
+            description="Maximum queries from one batch that run at the same time.",
+        )
+        incremental_store_path: str = Field(
+            default="data/repliers_incremental.db",
+            description="SQLite file holding watermarks and materialized results for `incremental=True` searches.",
+        )
+        local_store_enabled: bool = Field(
+            default=False,
+            description="Write every fetched listing into the local SQLite store used by `search_local`.",
+        )
+        local_store_path: str = Field(
+            default="data/repliers_listings.db",
+            description="SQLite file backing the local listing store.",
+        )
+        format_offload_threshold: int = Field(
+            default=200,
+            description="Format results in a worker thread instead of the event loop when they contain at least "
+            "this many listings (0 always formats on the event loop).",
+        )
+        stream_parse: bool = Field(
+            default=False,
+            description="Parse listing responses incrementally and emit each listing as it arrives, keeping only "
+            "the fields the output needs (ignored in 'full' output mode).",
+        )
+        metrics_enabled: bool = Field(
+            default=True,
+            description="Emit per-call phase timings and payload sizes as a 'metrics' event.",
+        )
+        metrics_sink: str = Field(
+            default="",
+            description="Optional file that also receives call metrics (empty disables).",
+        )
+        metrics_sink_format: str = Field(
+            default="jsonl",
+            description="Format of metrics_sink: 'jsonl' (one line per call) or 'prometheus' (cumulative totals "
+            "in text exposition format).",
+        )
+        cache_enabled: bool = Field(
+            default=True,
+            description="Cache listing responses, keyed on the normalized request params.",
+        )
+        cache_backend: str = Field(
+            default="memory",
+            description="Response cache backend: 'memory' (per process) or 'sqlite' (a file shared by all worker "
+            "processes on the host).",
+        )
+        cache_path: str = Field(
+            default="data/repliers_cache.db",
+            description="SQLite file used by the 'sqlite' cache backend.",
+        )
+        cache_max_bytes: int = Field(
+            default=256 * 1024 * 1024,
+            description="Maximum stored bytes in the 'sqlite' cache backend before least recently read entries "
+            "are evicted (0 disables the byte bound).",
+        )
+        cache_compress_level: int = Field(
+            default=1,
+            description="zlib level (1-9) for values in the 'sqlite' cache backend; 0 stores them uncompressed.",
+        )
+        cache_ttl_seconds: int = Field(
+            default=300,
+            description="Seconds a cached listing response stays valid.",
+        )
+        cache_max_entries: int = Field(
+            default=128,
+            description="Maximum cached responses kept before least recently used entries are evicted.",
+        )
+        analytics_enabled: bool = Field(
+            default=True,
+            description="Append a computed analytics table (percentiles, $/sqft, list-vs-estimate spread, price and "
+            "days-on-market bands) to search_listing results.",
+        )
+        analytics_min_listings: int = Field(
+            default=5,
+            description="Skip the analytics table for result sets smaller than this.",
+        )
+        market_stats_cache_ttl_seconds: int = Field(
+            default=3600,
+            description="Seconds a `market_stats` result stays cached (stats change slowly, so this outlives the "
+            "listing cache).",
+        )
+        market_stats_cache_path: str = Field(
+            default="data/repliers_market_stats.db",
+            description="SQLite file for `market_stats` results when cache_backend is 'sqlite' (kept apart from the "
+            "response cache so the two do not share keys or an eviction budget).",
+        )
+        hazard_enrichment_enabled: bool = Field(
+            default=False,
+            description="Add a 'Hazards' line (FEMA flood zone, active NWS alerts) to each listing in "
+            "search_listing results. Lookups are made per geohash bucket, not per listing, and cached.",
+        )
+        hazard_fema_url: str = Field(
+            default="https://hazards.fema.gov/gis/nfhl/rest/services/public/NFHL/MapServer/28/query",
+            description="ArcGIS query endpoint of the FEMA NFHL flood hazard zones layer.",
+        )
+        hazard_nws_url: str = Field(
+            default="https://api.weather.gov/alerts/active",
+            description="NWS active alerts endpoint (queried with `point=lat,lon`).",
+        )
+        hazard_user_agent: str = Field(
+            default="OpenWebUI-Safety-Integrator/1.0 (contact@example.com)",
+            description="User-Agent sent to the hazard services (NWS requires a contact).",
+        )
+        hazard_flood_geohash_precision: int = Field(
+            default=7,
+            description="Geohash length of flood-zone buckets (7 is about 150 m); each bucket is looked up once "
+            "at its center.",
+        )
+        hazard_alert_geohash_precision: int = Field(
+            default=4,
+            description="Geohash length of NWS alert buckets (4 is about 39 x 20 km, roughly a forecast zone; "
+            "alerts are issued per zone).",
+        )
+        hazard_flood_ttl_seconds: int = Field(
+            default=30 * 24 * 3600,
+            description="Seconds a flood zone lookup stays cached (flood maps change rarely).",
+        )
+        hazard_alert_ttl_seconds: int = Field(
+            default=300,
+            description="Seconds an NWS alert lookup stays cached.",
+        )
+        hazard_cache_max_entries: int = Field(
+            default=20000,
+            description="Maximum cached hazard buckets per kind before least recently used ones are evicted.",
+        )
+        hazard_cache_path: str = Field(
+            default="data/repliers_hazards.db",
+            description="SQLite file for hazard lookups when cache_backend is 'sqlite' (kept apart from the "
+            "response cache so its entry limit does not evict them).",
+        )
+        hazard_concurrency: int = Field(
+            default=8,
+            description="Maximum hazard service requests in flight while filling cache misses for one search.",
+        )
+        hazard_max_lookups: int = Field(
+            default=100,
+            description="Maximum uncached hazard buckets filled per search; listings beyond it show 'n/a'.",
+        )
+        image_stage_enabled: bool = Field(
+            default=False,
+            description="Add a 'Photos' line to each listing in search_listing results: a hero image and the first "
+            "gallery links as CDN size variants, with the rest resolved on demand by listing_photos.",
+        )
+        image_cdn_url: str = Field(
+            default="https://cdn.repliers.io",
+            description="Base URL that listing `images` paths are served from.",
+        )
+        image_hero_width: int = Field(
+            default=600,
+            description="Width in pixels of the hero image variant requested from the CDN.",
+        )
+        image_gallery_width: int = Field(
+            default=300,
+            description="Width in pixels of gallery image variants (also used by listing_photos).",
+        )
+        image_gallery_links: int = Field(
+            default=3,
+            description="Gallery links shown per listing after the hero image; the rest come from listing_photos.",
+        )
+        image_thumbnail_cache_enabled: bool = Field(
+            default=False,
+            description="Download each hero image once as a small variant into image_thumbnail_dir and link the "
+            "local copy, so repeat renders do not fetch photos again.",
+        )
+        image_thumbnail_dir: str = Field(
+            default="data/cache/repliers-thumbs",
+            description="Directory of cached thumbnails. OpenWebUI serves data/cache at /cache.",
+        )
+        image_thumbnail_base_url: str = Field(
+            default="/cache/repliers-thumbs",
+            description="URL prefix under which image_thumbnail_dir is served to the browser.",
+        )
+        image_thumbnail_width: int = Field(
+            default=300,
+            description="Width in pixels of the CDN variant downloaded into the thumbnail cache.",
+        )
+        image_thumbnail_cache_max_bytes: int = Field(
+            default=256 * 1024 * 1024,
+            description="Size of the thumbnail directory beyond which least recently used files are evicted "
+            "(0 disables eviction).",
+        )
+        image_concurrency: int = Field(
+            default=8,
+            description="Maximum thumbnail downloads in flight while filling the cache for one search.",
+        )
+
+    _BATCH_PARAMS: Optional[frozenset] = None
+
+    def __init__(self):
+        self.valves = self.Valves()
+        self._client = _RepliersClient(lambda: self.valves)
+        self._metrics_sink: Optional[_MetricsSink] = None
+        self._cache: Any = _TTLCache()
+        self._stats_cache: Any = _TTLCache()
+        self._hazard_caches: Dict[str, Any] = {}
+        self._hazard_inflight: Dict[str, "asyncio.Future[Any]"] = {}
+        self._thumbnail_cache: Optional[_ThumbnailCache] = None
+        self._thumbnail_inflight: Dict[str, "asyncio.Future[bool]"] = {}
+        self._photo_index = _TTLCache(max_entries=2000, ttl_seconds=3600)
+        self._inflight: Dict[str, "asyncio.Future[Any]"] = {}
+        self._incremental_store: Optional[_IncrementalStore] = None
+        self._local_store: Optional[_LocalListingStore] = None
+        self._geo_index: Optional[_GeoGridIndex] = None
+        self._geo_signature: Optional[Tuple[Any, ...]] = None
+
+    def _get_cache(self) -> Any:
+        """Return the response cache backend selected by the valves, with its limits synced to them."""
+        backend = (self.valves.cache_backend or "memory").strip().lower()
+        if backend == "sqlite":
+            if not isinstance(self._cache, _SQLiteCache) or self._cache.path != self.valves.cache_path:
+                self._cache = _SQLiteCache(self.valves.cache_path)
+            self._cache.max_bytes = int(self.valves.cache_max_bytes or 0)
+            self._cache.compress_level = int(self.valves.cache_compress_level or 0)
+        elif not isinstance(self._cache, _TTLCache):
+            self._cache = _TTLCache()
+        self._cache.max_entries = int(self.valves.cache_max_entries or 0)
+        self._cache.ttl_seconds = float(self.valves.cache_ttl_seconds or 0)
+        return self._cache
+
+    def _get_stats_cache(self) -> Any:
+        """Return the `market_stats` cache: same backend as the response cache, with its own file and longer TTL."""
+        backend = (self.valves.cache_backend or "memory").strip().lower()
+        if backend == "sqlite":
+            path = self.valves.market_stats_cache_path
+            if not isinstance(self._stats_cache, _SQLiteCache) or self._stats_cache.path != path:
+                self._stats_cache = _SQLiteCache(path)
+            self._stats_cache.max_bytes = int(self.valves.cache_max_bytes or 0)
+            self._stats_cache.compress_level = int(self.valves.cache_compress_level or 0)
+        elif not isinstance(self._stats_cache, _TTLCache):
+            self._stats_cache = _TTLCache()
+        self._stats_cache.max_entries = int(self.valves.cache_max_entries or 0)
+        self._stats_cache.ttl_seconds = float(self.valves.market_stats_cache_ttl_seconds or 0)
+        return self._stats_cache
+
+    def _get_hazard_cache(self, kind: str) -> Any:
+        """Return the cache for one hazard kind ('flood' or 'alerts'), each with its own TTL."""
+        backend = (self.valves.cache_backend or "memory").strip().lower()
+        cache = self._hazard_caches.get(kind)
+        if backend == "sqlite":
+            if not isinstance(cache, _SQLiteCache) or cache.path != self.valves.hazard_cache_path:
+                cache = _SQLiteCache(self.valves.hazard_cache_path)
+            cache.max_bytes = int(self.valves.cache_max_bytes or 0)
+            cache.compress_level = int(self.valves.cache_compress_level or 0)
+        elif not isinstance(cache, _TTLCache):
+            cache = _TTLCache()
+        ttl = self.valves.hazard_flood_ttl_seconds if kind == "flood" else self.valves.hazard_alert_ttl_seconds
+        # Both kinds share one sqlite file, so its entry limit covers both.
+        cache.max_entries = int(self.valves.hazard_cache_max_entries or 0) * (2 if backend == "sqlite" else 1)
+        cache.ttl_seconds = float(ttl or 0)
+        self._hazard_caches[kind] = cache
+        return cache
+
+    async def _cache_call(self, cache: Any, method: str, *args: Any) -> Any:
+        """Call a cache backend method, off the event loop for backends that do file I/O."""
+        fn = getattr(cache, method)
+        if cache.blocking:
+            return await asyncio.get_event_loop().run_in_executor(None, fn, *args)
+        return fn(*args)
+
+    async def _fetch_listings(
+        self,
+        url: str,
+        params: Dict[str, Any],
+        payload: Dict[str, Any],
+        use_cache: bool = True,
+        on_listing=None,
+        cache: Any = None,
+    ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """POST to the listings endpoint, serving from the response cache (or `cache`, if given) when allowed.
+
+        Identical requests already in flight are coalesced: only the first caller hits the API and the others
+        await its result. With the `stream_parse` valve the body is parsed incrementally and `on_listing` is
+        awaited for each listing as it arrives. Returns the parsed response JSON and a meta dict with
+        `cache_hit`, `coalesced`, `streamed` and `response_bytes`.
+        """
+        if use_cache and self.valves.cache_enabled:
+            cache = cache if cache is not None else self._get_cache()
+        else:
+            cache = None
+        key = _cache_key(url, params)
+        if cache is not None:
+            try:
+                cached = await self._cache_call(cache, "get", key)
+            except (sqlite3.Error, zlib.error, ValueError):
+                cached = None  # a broken shared cache must not fail the search
+            if cached is not None:
+                data, response_bytes = cached
+                return data, {
+                    "cache_hit": True,
+                    "coalesced": False,
+                    "streamed": False,
+                    "response_bytes": response_bytes,
+                }
+
+        inflight = self._inflight.get(key)
+        while inflight is not None:
+            self._client.stats["coalesced"] += 1
+            try:
+                data, response_bytes = await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                # A cancelled leader must not take its followers down with it: unless this task is the one
+                # being cancelled, retry, either joining whoever leads now or leading the request itself.
+                task = asyncio.current_task()
+                if not inflight.cancelled() or (task is not None and getattr(task, "cancelling", lambda: 0)()):
+                    raise
+                inflight = self._inflight.get(key)
+                continue
+            return data, {
+                "cache_hit": False,
+                "coalesced": True,
+                "streamed": False,
+                "response_bytes": response_bytes,
+            }
+
+        mode, compact_fields = self._output_settings()
+        streamed = bool(self.valves.stream_parse) and mode != "full"
+        future = asyncio.get_event_loop().create_future()
+        self._inflight[key] = future
+        try:
+            if streamed:
+                keep = list(_FORMATTER_FIELDS) + compact_fields + list(_STREAM_EXTRA_FIELDS) + list(_ANALYTICS_FIELDS)
+                if self.valves.image_stage_enabled:
+                    keep.append("images")
+                if self.valves.local_store_enabled:
+                    keep.extend(_LocalListingStore._SOURCE_FIELDS)
+                data, response_bytes = await self._stream_listings(url, params, payload, keep, on_listing)
+            else:
+                response = await self._client.request("POST", url, params, payload)
+                response_bytes = len(response.content)
+                with _timed("parse"):
+                    data = response.json()
+            if cache is not None and isinstance(data, dict):
+                try:
+                    await self._cache_call(cache, "set", key, (data, response_bytes))
+                except sqlite3.Error:
+                    pass
+            future.set_result((data, response_bytes))
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            future.exception()  # mark retrieved so an unawaited failure does not log a warning
+            raise
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+        return data, {
+            "cache_hit": False,
+            "coalesced": False,
+            "streamed": streamed,
+            "response_bytes": response_bytes,
+        }
+
+    async def _stream_listings(
+        self,
+        url: str,
+        params: Dict[str, Any],
+        payload: Dict[str, Any],
+        keep_fields: List[str],
+        on_listing=None,
+    ) -> Tuple[Dict[str, Any], int]:
+        """Download a listings page in chunks, parsing and projecting each listing as soon as it is complete.
+
+        Each listing is reduced to `keep_fields` and `on_listing` is awaited for it on the event loop. With the
+        aiohttp transport chunks are read and parsed on the loop; with requests the blocking body read runs in
+        the HTTP thread pool and listings are handed back through a queue. Returns the reassembled (projected)
+        response and its size.
+        """
+        loop = asyncio.get_event_loop()
+        response = await self._client.request("POST", url, params, payload, stream=True)
+        parser = _ListingStreamParser()
+        decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")()
+        fields: Dict[str, Any] = {}
+        listings: List[Dict[str, Any]] = []
+
+        if isinstance(response, _AiohttpResponse):
+            size = 0
+
+            async def _handle_async(events: List[Tuple[str, Any, Any]]) -> None:
+                for kind, key, value in events:
+                    if kind == "field":
+                        fields[key] = value
+                        continue
+                    item = _project(value, keep_fields)
+                    listings.append(item)
+                    if on_listing is not None:
+                        await on_listing(item)
+
+            started = time.perf_counter()
+            async for chunk in response.iter_chunks():
+                size += len(chunk)
+                await _handle_async(parser.feed(decoder.decode(chunk)))
+            await _handle_async(parser.feed(decoder.decode(b"", final=True), final=True))
+            _record_phase("download", time.perf_counter() - started)
+            fields["listings"] = listings
+            return fields, size
+
+        queue: "asyncio.Queue[Any]" = asyncio.Queue()
+        done = object()
+
+        def _read() -> int:
+            size = 0
+
+            def _handle(events: List[Tuple[str, Any, Any]]) -> None:
+                for kind, key, value in events:
+                    if kind == "field":
+                        fields[key] = value
+                    else:
+                        loop.call_soon_threadsafe(queue.put_nowait, _project(value, keep_fields))
+
+            try:
+                for chunk in response.iter_content(chunk_size=65536):
+                    size += len(chunk)
+                    _handle(parser.feed(decoder.decode(chunk)))
+                _handle(parser.feed(decoder.decode(b"", final=True), final=True))
+            finally:
+                response.close()
+                loop.call_soon_threadsafe(queue.put_nowait, done)
+            return size
+
+        started = time.perf_counter()
+        reader = loop.run_in_executor(self._client.get_executor(), _read)
+        while True:
+            item = await queue.get()
+            if item is done:
+                break
+            listings.append(item)
+            if on_listing is not None:
+                await on_listing(item)
+        size = await reader
+        _record_phase("download", time.perf_counter() - started)
+        fields["listings"] = listings
+        return fields, size
+
+    async def _fetch_remaining_pages(
+        self,
+        url: str,
+        params: Dict[str, Any],
+        payload: Dict[str, Any],
+        pages: List[int],
+        use_cache: bool = True,
+    ):
+        """Fetch the given page numbers concurrently and yield (page, data, meta, error) in page order.
+
+        Requests run with bounded concurrency; a page that completes early is held until all earlier
+        pages have been yielded so callers can stream results in order.
+        """
+        semaphore = asyncio.Semaphore(max(1, int(self.valves.page_fetch_concurrency or 1)))
+
+        async def _one(page: int):
+            async with semaphore:
+                return await self._fetch_listings(url, {**params, "pageNum": page}, payload, use_cache=use_cache)
+
+        tasks = [asyncio.ensure_future(_one(page)) for page in pages]
+        try:
+            for page, task in zip(pages, tasks):
+                try:
+                    data, meta = await task
+                    yield page, data, meta, None
+                except Exception as exc:  # noqa: BLE001
+                    yield page, None, None, exc
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def _output_settings(self) -> Tuple[str, List[str]]:
+        """Return the normalized output mode and the compact field list from the valves."""
+        mode = (self.valves.output_mode or "compact").strip().lower()
+        compact_fields = [f.strip() for f in (self.valves.compact_fields or "").split(",") if f.strip()]
+        return mode, compact_fields
+
+    def _prepare_params(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Normalize params (or just split "City, ST"), apply valve defaults and lean fields, and drop empties."""
+        if self.valves.normalize_params:
+            params = _normalize_params(params)
+        else:
+            params = dict(params)
+            for key in ("city", "cityOrDistrict", "areaOrCity"):
+                params[key], params["state"] = _split_city_state(params.get(key), params.get("state"))
+        for key in ("fields", "searchFields"):
+            params[key] = _comma_join(params.get(key))
+
+        if not params.get("boardId") and self.valves.default_board_ids:
+            params["boardId"] = self.valves.default_board_ids
+        if params.get("status") is None and self.valves.default_status:
+            params["status"] = self.valves.default_status
+        if params.get("resultsPerPage") is None and self.valves.default_results_per_page:
+            params["resultsPerPage"] = self.valves.default_results_per_page
+
+        mode, compact_fields = self._output_settings()
+        if not params.get("fields") and self.valves.lean_fields and mode != "full":
+            extra = (compact_fields if mode == "compact" else []) + list(_ANALYTICS_FIELDS)
+            if self.valves.image_stage_enabled:
+                extra.append("images")
+            if self.valves.local_store_enabled:
+                extra.extend(_LocalListingStore._SOURCE_FIELDS)
+            params["fields"] = _lean_fields(extra)
+
+        return _clean_params(params)
+
+    async def _render(
+        self,
+        data: Dict[str, Any],
+        listings: List[Dict[str, Any]],
+        mode: str,
+        compact_fields: List[str],
+        page_errors: Optional[List[str]] = None,
+        extras: Optional[List[str]] = None,
+    ) -> str:
+        """Render output, moving large result sets off the event loop so other chats are not blocked."""
+        threshold = int(self.valves.format_offload_threshold or 0)
+        with _timed("format"):
+            if threshold and len(listings) >= threshold:
+                return await asyncio.get_event_loop().run_in_executor(
+                    None, _render_output, data, listings, mode, compact_fields, page_errors, extras
+                )
+            return _render_output(data, listings, mode, compact_fields, page_errors, extras)
+
+    async def _analytics(self, listings: List[Dict[str, Any]]) -> str:
+        """Render the analytics table for a result set, off the event loop for large sets ('' when disabled)."""
+        if not self.valves.analytics_enabled or len(listings) < max(1, int(self.valves.analytics_min_listings or 1)):
+            return ""
+        threshold = int(self.valves.format_offload_threshold or 0)
+        with _timed("analytics"):
+            if threshold and len(listings) >= threshold:
+                result = await asyncio.get_event_loop().run_in_executor(None, _compute_analytics, listings)
+            else:
+                result = _compute_analytics(listings)
+        return f"\n\nAnalytics ({result['listings']} listings):\n" + _render_analytics(result)
+
+    async def _fetch_hazard(self, kind: str, lat: float, lon: float) -> Optional[Dict[str, Any]]:
+        """Look up one hazard bucket at its center; None on any failure (failures are not cached)."""
+        if kind == "flood":
+            url = self.valves.hazard_fema_url
+            params = {
+                "geometry": f"{lon:.6f},{lat:.6f}",
+                "geometryType": "esriGeometryPoint",
+                "inSR": "4326",
+                "spatialRel": "esriSpatialRelIntersects",
+                "outFields": "FLD_ZONE,ZONE_SUBTY,SFHA_TF",
+                "returnGeometry": "false",
+                "f": "json",
+            }
+            headers = {"Accept": "application/json"}
+        else:
+            url = self.valves.hazard_nws_url
+            params = {"point": f"{lat:.4f},{lon:.4f}"}  # NWS rejects more than four decimals
+            headers = {"Accept": "application/geo+json"}
+        session = self._client.get_external_session()
+        _count("hazard_requests")
+        try:
+            response = await asyncio.get_event_loop().run_in_executor(
+                self._client.get_executor(),
+                lambda: session.get(url, params=params, headers=headers, timeout=self.valves.request_timeout),
+            )
+            response.raise_for_status()
+            data = response.json()
+        except (requests.RequestException, ValueError):
+            _count("hazard_errors")
+            return None
+        return _parse_flood_zone(data) if kind == "flood" else _parse_alerts(data)
+
+    async def _fill_hazard(self, key: str, bucket: Tuple[str, float, float], semaphore: asyncio.Semaphore) -> Any:
+        """Fetch and cache one missing bucket, sharing the lookup with concurrent searches for the same key."""
+        kind, lat, lon = bucket
+        future = self._hazard_inflight.get(key)
+        if future is None:
+
+            async def _fill() -> Any:
+                async with semaphore:
+                    value = await self._fetch_hazard(kind, lat, lon)
+                if value is not None:
+                    await self._cache_call(self._get_hazard_cache(kind), "set", key, value)
+                return value
+
+            future = self._hazard_inflight[key] = asyncio.ensure_future(_fill())
+            future.add_done_callback(lambda _f: self._hazard_inflight.pop(key, None))
+        return await asyncio.shield(future)
+
+    async def _hazard_lines(self, listings: List[Dict[str, Any]]) -> Optional[List[str]]:
+        """Return one hazard line per listing, or None when hazard enrichment is off.
+
+        Listings are grouped into geohash buckets, coarse for NWS alerts and fine for flood zones. Cached
+        buckets are read in one batch. Up to `hazard_max_lookups` misses are then filled concurrently.
+        """
+        if not self.valves.hazard_enrichment_enabled or not listings:
+            return None
+        precision = {
+            "flood": max(1, min(12, int(self.valves.hazard_flood_geohash_precision or 7))),
+            "alerts": max(1, min(12, int(self.valves.hazard_alert_geohash_precision or 4))),
+        }
+        with _timed("hazards"):
+            listing_keys: List[Optional[Tuple[str, str]]] = []
+            buckets: Dict[str, Tuple[str, float, float]] = {}
+            for listing in listings:
+                point = listing.get("map") or {}
+                lat, lon = _to_float(point.get("latitude")), _to_float(point.get("longitude"))
+                if lat is None or lon is None or not (-90 <= lat <= 90 and -180 <= lon <= 180):
+                    listing_keys.append(None)
+                    continue
+                keys = []
+                for kind in _HAZARD_KINDS:
+                    cell, center_lat, center_lon = _geohash_cell(lat, lon, precision[kind])
+                    key = f"{kind}/{cell}"  # not "kind:cell", whose older entries hold (value, 0) pairs
+                    buckets[key] = (kind, center_lat, center_lon)
+                    keys.append(key)
+                listing_keys.append((keys[0], keys[1]))
+
+            values: Dict[str, Any] = {}
+            for kind in _HAZARD_KINDS:
+                cache = self._get_hazard_cache(kind)
+                keys = [key for key, bucket in buckets.items() if bucket[0] == kind]
+                if cache.blocking:
+                    cached = await asyncio.get_event_loop().run_in_executor(
+                        None, lambda: [cache.get(key) for key in keys]
+                    )
+                else:
+                    cached = [cache.get(key) for key in keys]
+                values.update({key: entry for key, entry in zip(keys, cached) if entry is not None})
+
+            misses = [key for key in buckets if key not in values][: max(0, int(self.valves.hazard_max_lookups or 0))]
+            if misses:
+                semaphore = asyncio.Semaphore(max(1, int(self.valves.hazard_concurrency or 1)))
+                filled = await asyncio.gather(*(self._fill_hazard(key, buckets[key], semaphore) for key in misses))
+                values.update(zip(misses, filled))
+            _count("hazard_buckets", len(buckets))
+            _count("hazard_misses", len(misses))
+
+        return [
+            _hazard_line(values.get(keys[0]), values.get(keys[1])) if keys else "   Hazards: n/a (no coordinates)"
+            for keys in listing_keys
+        ]
+
+    def _get_thumbnail_cache(self) -> _ThumbnailCache:
+        """Return the thumbnail directory cache (blocking: creating it scans the directory)."""
+        directory = self.valves.image_thumbnail_dir
+        if self._thumbnail_cache is None or self._thumbnail_cache.directory != directory:
+            self._thumbnail_cache = _ThumbnailCache(directory)
+        self._thumbnail_cache.max_bytes = int(self.valves.image_thumbnail_cache_max_bytes or 0)
+        return self._thumbnail_cache
+
+    async def _download_thumbnail(self, path: str, name: str, semaphore: asyncio.Semaphore) -> bool:
+        """Fetch one small CDN variant into the thumbnail cache, sharing the download with concurrent searches."""
+        future = self._thumbnail_inflight.get(name)
+        if future is None:
+
+            async def _fill() -> bool:
+                loop = asyncio.get_event_loop()
+                url = _image_url(self.valves.image_cdn_url, path, self.valves.image_thumbnail_width)
+                session = self._client.get_external_session()
+                async with semaphore:
+                    _count("image_requests")
+                    try:
+                        response = await loop.run_in_executor(
+                            self._client.get_executor(), lambda: session.get(url, timeout=self.valves.request_timeout)
+                        )
+                        response.raise_for_status()
+                    except requests.RequestException:
+                        _count("image_errors")
+                        return False
+                if not response.headers.get("Content-Type", "image/").startswith("image/"):
+                    _count("image_errors")
+                    return False
+                _count("image_bytes", len(response.content))
+                await loop.run_in_executor(None, self._get_thumbnail_cache().store, name, response.content)
+                return True
+
+            future = self._thumbnail_inflight[name] = asyncio.ensure_future(_fill())
+            future.add_done_callback(lambda _f: self._thumbnail_inflight.pop(name, None))
+        return await asyncio.shield(future)
+
+    async def _image_lines(self, listings: List[Dict[str, Any]]) -> Optional[List[str]]:
+        """Return one 'Photos' line per listing, or None when the image stage is off.
+
+        Only the hero image and the first `image_gallery_links` gallery images are linked, as CDN size
+        variants. Each listing's full image list is remembered for listing_photos. With the thumbnail cache
+        on, hero images link to local copies, and only uncached ones are downloaded (concurrently).
+        """
+        if not self.valves.image_stage_enabled or not listings:
+            return None
+        cdn = self.valves.image_cdn_url
+        with _timed("images"):
+            image_lists = []
+            for listing in listings:
+                images = [str(path) for path in _as_list(listing.get("images")) if path]
+                image_lists.append(images)
+                if images and listing.get("mlsNumber"):
+                    self._photo_index.set(str(listing["mlsNumber"]), images)
+
+            local: Dict[str, str] = {}
+            heroes = list(dict.fromkeys(images[0] for images in image_lists if images))
+            if self.valves.image_thumbnail_cache_enabled and heroes:
+                loop = asyncio.get_event_loop()
+                width = int(self.valves.image_thumbnail_width or 0)
+                names = {path: _ThumbnailCache.filename(path, width) for path in heroes}
+                present = await loop.run_in_executor(
+                    None, lambda: self._get_thumbnail_cache().lookup(list(names.values()))
+                )
+                misses = [path for path in heroes if names[path] not in present]
+                if misses:
+                    semaphore = asyncio.Semaphore(max(1, int(self.valves.image_concurrency or 1)))
+                    stored = await asyncio.gather(
+                        *(self._download_thumbnail(path, names[path], semaphore) for path in misses)
+                    )
+                    present |= {names[path] for path, ok in zip(misses, stored) if ok}
+                _count("thumbnail_misses", len(misses))
+                base = self.valves.image_thumbnail_base_url.rstrip("/")
+                local = {path: f"{base}/{names[path]}" for path in heroes if names[path] in present}
+
+            links = max(0, int(self.valves.image_gallery_links or 0))
+            lines = []
+            for listing, images in zip(listings, image_lists):
+                if not images:
+                    lines.append("   Photos: none")
+                    continue
+                hero = local.get(images[0]) or _image_url(cdn, images[0], self.valves.image_hero_width)
+                gallery = [_image_url(cdn, path, self.valves.image_gallery_width) for path in images[1 : 1 + links]]
+                lines.append(_photo_line(hero, gallery, len(images) - 1, listing.get("mlsNumber")))
+        return lines
+
+    async def _run_search(
+        self,
+        params: Dict[str, Any],
+        eventer,
+        bypass_cache: Optional[bool] = None,
+        fetch_all_pages: Optional[bool] = None,
+        max_results: Optional[int] = None,
+        stream_pages: bool = True,
+        store_local: bool = True,
+    ) -> Dict[str, Any]:
+        """Fetch a search (and any extra pages it asks for) and return data, listings and request meta.
+
+        Extra pages are emitted as chat messages in page order when `stream_pages` is set. Errors on the first
+        page propagate; errors on later pages are collected in `page_errors`. `complete` is true only when every
+        page of the result set was fetched without error; `prefix_listings` counts the leading listings that came
+        from an unbroken run of pages starting at the first. With the `local_store_enabled` valve the listings
+        are also written to the local store, unless `store_local` is false because the caller stores them itself.
+        """
+        url = f"{self.valves.base_url}/listings"
+        payload: Dict[str, Any] = {}
+
+        on_listing = None
+        if stream_pages:
+            streamed_count = 0
+
+            async def on_listing(listing: Dict[str, Any]) -> None:
+                nonlocal streamed_count
+                streamed_count += 1
+                await self.emit_message(eventer, _format_listing(listing, streamed_count) + "\n")
+
+        data, meta = await self._fetch_listings(
+            url, params, payload, use_cache=not bypass_cache, on_listing=on_listing
+        )
+        listings = list(_extract_listings(data))
+        response_bytes = meta["response_bytes"]
+        page_errors: List[str] = []
+        prefix_listings = len(listings)
+
+        limit = int(max_results) if max_results else None
+        first_page = int(params.get("pageNum") or data.get("page") or 1)
+        num_pages = int(data.get("numPages") or 1)
+        complete = first_page >= num_pages
+        if fetch_all_pages or limit:
+            page_size = int(data.get("pageSize") or params.get("resultsPerPage") or len(listings) or 1)
+            last_page = num_pages
+            if limit:
+                last_page = min(last_page, first_page + -(-limit // page_size) - 1)
+            last_page = min(last_page, first_page + max(1, int(self.valves.max_pages_cap or 1)) - 1)
+            complete = last_page >= num_pages
+            pages = list(range(first_page + 1, last_page + 1))
+
+            if pages:
+                if stream_pages and not meta["streamed"]:
+                    await self.emit_message(eventer, _format_listings(listings) + "\n")
+                await self.emit_status(eventer, f"Fetching pages {first_page + 1}-{last_page} of {num_pages}...")
+                async for page, page_data, page_meta, error in self._fetch_remaining_pages(
+                    url, params, payload, pages, use_cache=not bypass_cache
+                ):
+                    if error is not None:
+                        page_errors.append(f"page {page}: {error}")
+                        continue
+                    page_listings = _extract_listings(page_data)
+                    response_bytes += page_meta["response_bytes"]
+                    if stream_pages:
+                        await self.emit_message(
+                            eventer, _format_listings(page_listings, start=len(listings) + 1) + "\n"
+                        )
+                    listings.extend(page_listings)
+                    if not page_errors:
+                        prefix_listings = len(listings)
+                    await self.emit_status(eventer, f"Fetched page {page} of {last_page} ({len(listings)} listings)")
+            if limit:
+                listings = listings[:limit]
+                prefix_listings = min(prefix_listings, limit)
+
+        if store_local and self.valves.local_store_enabled and listings:
+            await asyncio.get_event_loop().run_in_executor(None, self._get_local_store().upsert, listings)
+
+        return {
+            "url": url,
+            "data": data,
+            "listings": listings,
+            "meta": meta,
+            "response_bytes": response_bytes,
+            "page_errors": page_errors,
+            "complete": complete and not page_errors,
+            "prefix_listings": prefix_listings,
+        }
+
+    def _get_local_store(self) -> _LocalListingStore:
+        path = self.valves.local_store_path
+        if self._local_store is None or self._local_store.path != path:
+            self._local_store = _LocalListingStore(path)
+        return self._local_store
+
+    def _get_geo_index(self) -> _GeoGridIndex:
+        """Return the grid index over stored listing coordinates, rebuilding it when the store changed."""
+        store = self._get_local_store()
+        signature = (store.path, store.signature())
+        if self._geo_index is None or self._geo_signature != signature:
+            self._geo_index = _GeoGridIndex(store.points())
+            self._geo_signature = signature
+        return self._geo_index
+
+    def _get_incremental_store(self) -> _IncrementalStore:
+        path = self.valves.incremental_store_path
+        if self._incremental_store is None or self._incremental_store.path != path:
+            self._incremental_store = _IncrementalStore(path)
+        return self._incremental_store
+
+    async def _fetch_deleted(self, since: str) -> Tuple[List[str], int, bool]:
+        """Page through GET /listings/deleted since a watermark; return (MLS numbers, response bytes, complete).
+
+        The endpoint filters by day, so the watermark is truncated to its date; re-deleting a listing removed
+        earlier that day is harmless. Every page is read, whatever `max_pages_cap` says, because a missed
+        deletion would never be reported again; a page that fails leaves `complete` false.
+        """
+        url = f"{self.valves.base_url}/listings/deleted"
+        params = {"minUpdatedOn": since[:10]}
+        response = await self._client.request("GET", url, params)
+        data = response.json()
+        deleted = _deleted_mls_numbers(data)
+        response_bytes = len(response.content)
+        num_pages = int(data.get("numPages") or 1) if isinstance(data, dict) else 1
+        semaphore = asyncio.Semaphore(max(1, int(self.valves.page_fetch_concurrency or 1)))
+
+        async def _page(page: int):
+            async with semaphore:
+                return await self._client.request("GET", url, {**params, "pageNum": page})
+
+        responses = await asyncio.gather(*[_page(page) for page in range(2, num_pages + 1)], return_exceptions=True)
+        complete = True
+        for page_response in responses:
+            if isinstance(page_response, BaseException):
+                complete = False
+                continue
+            deleted.extend(_deleted_mls_numbers(page_response.json()))
+            response_bytes += len(page_response.content)
+        return deleted, response_bytes, complete
+
+    async def _run_incremental(
+        self, params: Dict[str, Any], eventer, max_results: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Refresh a saved search with only the listings changed since its last watermark.
+
+        Changes are fetched oldest first (`sortBy=updatedOnAsc`). The first run downloads the result set and
+        stores it. Later runs add `minRepliersUpdatedOn=<watermark>`, merge the changed listings into the stored
+        set and remove listings reported by GET /listings/deleted since the watermark. The watermark advances to
+        the newest timestamp in the unbroken run of pages fetched from the start, so a window larger than
+        `max_pages_cap` pages, or one with a failed page, is finished over several runs. It does not move when
+        the deletions could not all be read.
+        """
+        loop = asyncio.get_event_loop()
+        store = self._get_incremental_store()
+        base = {k: v for k, v in params.items() if k not in ("pageNum", "minRepliersUpdatedOn", "minUpdatedOn")}
+        if base.get("fields"):
+            base["fields"] = ",".join(dict.fromkeys(str(base["fields"]).split(",") + ["timestamps.repliersUpdatedOn"]))
+        search_key = _cache_key(f"{self.valves.base_url}/listings", base)
+
+        watermark = await loop.run_in_executor(None, store.get_watermark, search_key)
+        delta_params = dict(base, sortBy="updatedOnAsc")
+        if watermark:
+            delta_params["minRepliersUpdatedOn"] = watermark
+            await self.emit_status(eventer, f"Fetching listings changed since {watermark}...")
+
+        result = await self._run_search(
+            delta_params, eventer, bypass_cache=True, fetch_all_pages=True, stream_pages=False
+        )
+        changed = result["listings"]
+        complete = result["complete"]
 
-    def __init__(self):
-        self.valves = self.Valves()
+        deleted: List[str] = []
+        deletions_complete = True
+        if watermark:
+            deleted, deleted_bytes, deletions_complete = await self._fetch_deleted(watermark)
+            result["response_bytes"] += deleted_bytes
+            complete = complete and deletions_complete
+
+        prefix = changed[: result["prefix_listings"]]
+        seen = [ts for ts in (_listing_updated_on(item) for item in prefix) if ts]
+        new_watermark = max(seen) if seen and deletions_complete else watermark
+        if not deletions_complete:
+            await self.emit_status(eventer, "Some deletion pages failed; keeping the previous watermark.")
+        elif not complete:
+            await self.emit_status(
+                eventer, f"Not every page was fetched (errors or max_pages_cap); watermark advanced to {new_watermark}."
+            )
+        await loop.run_in_executor(None, store.apply, search_key, changed, deleted, new_watermark)
+        listings = await loop.run_in_executor(None, store.load, search_key)
+        if max_results:
+            listings = listings[: int(max_results)]
+
+        result.update(
+            listings=listings,
+            incremental={
+                "previous_watermark": watermark,
+                "watermark": new_watermark,
+                "changed": len(changed),
+                "deleted": len(deleted),
+                "complete": complete,
+                "materialized": len(listings),
+            },
+        )
+        return result
 
     @staticmethod
     async def emit_status(eventer, msg: str, done: bool = False, hidden: bool = False):
-        await eventer({"type": "status", "data": {"description": msg, "done": done, "hidden": hidden}})
+        with _timed("emit"):
+            await eventer({"type": "status", "data": {"description": msg, "done": done, "hidden": hidden}})
 
     @staticmethod
     async def emit_error(eventer, msg: str, done: bool = True, hidden: bool = False):
-        await eventer({"type": "error", "data": {"description": msg, "done": done, "hidden": hidden}})
+        with _timed("emit"):
+            await eventer({"type": "error", "data": {"description": msg, "done": done, "hidden": hidden}})
+
+    @staticmethod
+    async def emit_message(eventer, content: str):
+        with _timed("emit"):
+            await eventer({"type": "message", "data": {"content": content}})
 
     @staticmethod
     async def emit_result(eventer, content: str, done: bool = True, hidden: bool = False):
-        await eventer({"type": "result", "data": {"description": content, "done": done, "hidden": hidden}})
+        with _timed("emit"):
+            await eventer({"type": "result", "data": {"description": content, "done": done, "hidden": hidden}})
+
+    @staticmethod
+    async def emit_metrics(eventer, metrics: Dict[str, Any]):
+        await eventer({"type": "metrics", "data": metrics})
+
+    async def _publish_metrics(self, eventer, metrics: _CallMetrics) -> Dict[str, Any]:
+        """Emit a finished call's metrics as an event and append them to the configured sink."""
+        record = metrics.as_dict()
+        if self.valves.metrics_enabled:
+            await self.emit_metrics(eventer, record)
+        path = (self.valves.metrics_sink or "").strip()
+        if path:
+            fmt = (self.valves.metrics_sink_format or "jsonl").strip().lower()
+            if self._metrics_sink is None or (self._metrics_sink.path, self._metrics_sink.fmt) != (path, fmt):
+                self._metrics_sink = _MetricsSink(path, fmt)
+            try:
+                await asyncio.get_event_loop().run_in_executor(None, self._metrics_sink.write, record)
+            except OSError:
+                pass  # metrics must never fail the search
+        return record
 
     async def search_listing(
         self,
@@ -285,6 +3355,10 @@ class Tools:
         yearBuilt: Optional[Any] = None,
         zip: Optional[Any] = None,  # noqa: A002  # pyright: ignore[reportShadowedBuiltin]
         zoning: Optional[Any] = None,
+        bypass_cache: Optional[bool] = None,
+        fetch_all_pages: Optional[bool] = None,
+        max_results: Optional[int] = None,
+        incremental: Optional[bool] = None,
         __event_emitter__=None,
     ) -> str:
         """
@@ -316,8 +3390,14 @@ class Tools:
         repliersUpdatedOn, sewer, state, waterfront, yearBuilt, zip, zoning.
 
         - No defaults are injected. Only provided parameters are sent.
+        - To return more than one page, set `max_results` (e.g., 100) or `fetch_all_pages=True`. Extra pages are
+          fetched concurrently and streamed as they arrive, up to the `max_pages_cap` valve.
+        - Set `incremental=True` for saved-search refreshes ("what's new since last time"): only listings changed
+          since the previous run are downloaded and merged into the locally stored result, deletions included.
+        - Set `bypass_cache=True` to force a fresh request when the user explicitly asks for updated results.
 
-        Output: emits a brief text summary of the first few listings (address, price, beds, baths) and optional debug info.
+        Output: emits a text summary of the listings plus, depending on the `output_mode` valve, a compact JSON
+        projection of key fields or the full response JSON, and optional debug info.
         """
 
         eventer = __event_emitter__ or (lambda *args, **kwargs: asyncio.sleep(0))
@@ -327,28 +3407,6 @@ class Tools:
             await self.emit_error(eventer, msg)
             return msg
 
-        headers = {
-            "REPLIERS-API-KEY": self.valves.rapidapi_key,
-            "Accept": "application/json",
-            "Content-Type": "application/json",
-        }
-
-        city, state = _split_city_state(city, state)
-        cityOrDistrict, state = _split_city_state(cityOrDistrict, state)
-        areaOrCity, state = _split_city_state(areaOrCity, state)
-
-        entry_debug = ""
-        if self.valves.enable_debug_output:
-            entry_debug = json.dumps(
-                {
-                    "raw_city": city,
-                    "raw_areaOrCity": areaOrCity,
-                    "raw_cityOrDistrict": cityOrDistrict,
-                    "raw_state": state,
-                },
-                indent=2,
-            )
-
         params: Dict[str, Any] = {
             "agent": agent,
             "aggregates": aggregates,
@@ -379,7 +3437,7 @@ class Tools:
             "district": district,
             "driveway": driveway,
             "exteriorConstruction": exteriorConstruction,
-            "fields": _comma_join(fields),
+            "fields": fields,
             "garage": garage,
             "hasAgents": hasAgents,
             "hasImages": hasImages,
@@ -442,7 +3500,7 @@ class Tools:
             "radius": radius,
             "resultsPerPage": resultsPerPage,
             "search": search,
-            "searchFields": _comma_join(searchFields),
+            "searchFields": searchFields,
             "sortBy": sortBy,
             "sqft": sqft,
             "statistics": statistics,
@@ -467,58 +3525,584 @@ class Tools:
             "zoning": zoning,
         }
 
-        if not params.get("boardId") and self.valves.default_board_ids:
-            params["boardId"] = self.valves.default_board_ids
-        if params.get("status") is None and self.valves.default_status:
-            params["status"] = self.valves.default_status
-        if params.get("resultsPerPage") is None and self.valves.default_results_per_page:
-            params["resultsPerPage"] = self.valves.default_results_per_page
-
-        params = _clean_params(params)
-
-        url = f"{self.valves.base_url}/listings"
-        payload: Dict[str, Any] = {}
+        metrics = _CallMetrics("search_listing")
+        mode, compact_fields = self._output_settings()
 
-        debug = ""
+        entry_debug = ""
         if self.valves.enable_debug_output:
-            debug = json.dumps({"url": url, "params": params, "entry": entry_debug}, indent=2)
-
-        await self.emit_status(eventer, "Sending listing search request...")
+            entry_debug = json.dumps(
+                {
+                    "raw_city": city,
+                    "raw_areaOrCity": areaOrCity,
+                    "raw_cityOrDistrict": cityOrDistrict,
+                    "raw_state": state,
+                },
+                indent=2,
+                default=str,
+            )
 
+        metrics_token = _CURRENT_METRICS.set(metrics)
         try:
-            def _do_request():
-                return requests.post(url, params=params, json=payload, headers=headers, timeout=30)
-
-            response = await asyncio.get_event_loop().run_in_executor(None, _do_request)
-            response.raise_for_status()
+            params_started = time.perf_counter()
+            params = self._prepare_params(params)
+            metrics.add("params", time.perf_counter() - params_started)
+            await self.emit_status(eventer, "Sending listing search request...")
+            if incremental:
+                result = await self._run_incremental(params, eventer, max_results=max_results)
+            else:
+                result = await self._run_search(
+                    params, eventer, bypass_cache=bypass_cache, fetch_all_pages=fetch_all_pages, max_results=max_results
+                )
+            meta = result["meta"]
+            output = "Listing search complete.\n"
+            if incremental:
+                inc = result["incremental"]
+                output += (
+                    f"Incremental refresh: {inc['changed']} changed, {inc['deleted']} deleted, "
+                    f"{inc['materialized']} listings in the saved result (since {inc['previous_watermark'] or 'first run'}).\n"
+                )
+            photos, hazards = await asyncio.gather(
+                self._image_lines(result["listings"]), self._hazard_lines(result["listings"])
+            )
+            output += await self._render(
+                result["data"],
+                result["listings"],
+                mode,
+                compact_fields,
+                result["page_errors"],
+                _merge_extras(photos, hazards),
+            )
+            output += await self._analytics(result["listings"])
+            metrics.counters["response_bytes"] = result["response_bytes"]
+            metrics.counters["listings"] = len(result["listings"])
+            metrics.labels.update(
+                {
+                    "cache_hit": meta["cache_hit"],
+                    "coalesced": meta["coalesced"],
+                    "streamed": meta["streamed"],
+                    "transport": self._client.transport(),
+                    "output_mode": mode,
+                }
+            )
 
-            data = response.json()
-            listings = data.get("listings") or data.get("results") or data.get("items") or []
-            if not isinstance(listings, list):
-                listings = []
-            summary = _format_listings(listings)
-            full_json = json.dumps(data, indent=2)
-            output = f"Listing search complete.\n{summary}\n\nFull response JSON:\n{full_json}"
+            debug = ""
+            if self.valves.enable_debug_output:
+                debug = json.dumps(
+                    {
+                        "url": result["url"],
+                        "params": params,
+                        "entry": entry_debug,
+                        "cache": {"hit": meta["cache_hit"], "bypassed": bool(bypass_cache), **self._get_cache().stats()},
+                        "requests": {"coalesced_call": meta["coalesced"], **self._client.stats},
+                        "incremental": result.get("incremental"),
+                        "payload": {
+                            "output_mode": mode,
+                            "response_bytes": result["response_bytes"],
+                            "output_chars": len(output),
+                            "estimated_tokens": len(output) // 4,
+                        },
+                        "timings_ms": metrics.as_dict()["phases_ms"],
+                    },
+                    indent=2,
+                )
             if debug:
                 output = f"Debug:\n{debug}\n\n" + output
 
             await self.emit_result(eventer, output)
             await self.emit_status(eventer, "Done", done=True)
+            metrics.counters["output_chars"] = len(output)
+            await self._publish_metrics(eventer, metrics)
             return output
 
-        except requests.HTTPError as exc:
-            msg = f"HTTP error {exc.response.status_code}: {exc.response.text}"
+        except Exception as exc:  # noqa: BLE001
+            msg = _error_message(exc)
+            await self.emit_error(eventer, msg)
+            metrics.labels["error"] = msg[:200]
+            await self._publish_metrics(eventer, metrics)
+            return msg
+        finally:
+            _CURRENT_METRICS.reset(metrics_token)
+
+    @classmethod
+    def _batch_param_names(cls) -> frozenset:
+        """Repliers params a batch query may use: search_listing's own, with `class_` spelled `class`."""
+        if cls._BATCH_PARAMS is None:
+            names = set(inspect.signature(cls.search_listing).parameters) - {"self", "__event_emitter__"}
+            names -= {"class_", "bypass_cache", "fetch_all_pages", "max_results", "incremental"}
+            cls._BATCH_PARAMS = frozenset(names | {"class"})
+        return cls._BATCH_PARAMS
+
+    async def search_listings_batch(
+        self,
+        queries: List[Dict[str, Any]],
+        __event_emitter__=None,
+    ) -> str:
+        """
+        Run several listing searches concurrently in one call and return one combined, labeled report.
+
+        Use this for comparisons (e.g., 3-bed houses in Tampa vs St. Petersburg vs Clearwater) instead of calling
+        search_listing several times. Each item in `queries` is a dict of search_listing parameters (city, state,
+        class, minBedrooms, maxPrice, max_results, ...) plus an optional `label` used as its heading. A query with
+        a key search_listing does not accept fails with an error naming it instead of being sent to Repliers.
+
+        Output: a comparison table (matches, price range/median, median sqft, $/sqft and DOM per query) followed by
+        one section per query. A query that fails is reported in its own section without aborting the others.
+        """
+
+        eventer = __event_emitter__ or (lambda *args, **kwargs: asyncio.sleep(0))
+
+        if not self.valves.rapidapi_key:
+            msg = "rapidapi_key valve is empty; set your Repliers API key first."
+            await self.emit_error(eventer, msg)
+            return msg
+        if not queries or not isinstance(queries, list):
+            msg = "queries must be a non-empty list of search parameter dicts."
+            await self.emit_error(eventer, msg)
+            return msg
+
+        max_queries = max(1, int(self.valves.batch_max_queries or 1))
+        if len(queries) > max_queries:
+            msg = f"Too many queries ({len(queries)}); the limit is {max_queries} per batch."
+            await self.emit_error(eventer, msg)
+            return msg
+
+        mode, compact_fields = self._output_settings()
+        semaphore = asyncio.Semaphore(max(1, int(self.valves.batch_concurrency or 1)))
+        await self.emit_status(eventer, f"Running {len(queries)} listing searches...")
+
+        async def _one(idx: int, query: Dict[str, Any]) -> Dict[str, Any]:
+            query = dict(query or {})
+            label = str(query.pop("label", None) or f"Query {idx}")
+            options = {k: query.pop(k, None) for k in ("bypass_cache", "fetch_all_pages", "max_results")}
+            if "class_" in query:
+                query["class"] = query.pop("class_")
+            unknown = sorted(set(query) - self._batch_param_names())
+            if unknown:
+                await self.emit_status(eventer, f"{label}: failed")
+                return {"label": label, "error": f"Unsupported search parameters: {', '.join(unknown)}"}
+            async with semaphore:
+                try:
+                    params = self._prepare_params(query)
+                    result = await self._run_search(params, eventer, stream_pages=False, **options)
+                    await self.emit_status(eventer, f"{label}: {len(result['listings'])} listings")
+                    return {"label": label, "params": params, **result}
+                except Exception as exc:  # noqa: BLE001
+                    await self.emit_status(eventer, f"{label}: failed")
+                    return {"label": label, "error": _error_message(exc)}
+
+        results = await asyncio.gather(*[_one(idx, q) for idx, q in enumerate(queries, start=1)])
+
+        header = [
+            "Query",
+            "Matches",
+            "Returned",
+            "Min price",
+            "Median price",
+            "Max price",
+            "Median sqft",
+            "Median $/sqft",
+            "Median DOM",
+        ]
+        table_lines = ["| " + " | ".join(header) + " |", "|" + "---|" * len(header)]
+        sections: List[str] = []
+        for r in results:
+            if "error" in r:
+                table_lines.append("| " + " | ".join([r["label"], "failed"] + ["-"] * (len(header) - 2)) + " |")
+                sections.append(f"## {r['label']}\nSearch failed: {r['error']}")
+                continue
+            table_lines.append("| " + " | ".join(_stats_row(r["label"], r["data"], r["listings"])) + " |")
+            body = await self._render(r["data"], r["listings"], mode, compact_fields, r["page_errors"])
+            if self.valves.enable_debug_output:
+                body = f"Params: {json.dumps(r['params'], default=str)}\n{body}"
+            sections.append(f"## {r['label']}\n{body}")
+
+        failed = sum(1 for r in results if "error" in r)
+        output = (
+            f"Batch listing search complete ({len(results) - failed} succeeded, {failed} failed).\n\n"
+            + "\n".join(table_lines)
+            + "\n\n"
+            + "\n\n".join(sections)
+        )
+        await self.emit_result(eventer, output)
+        await self.emit_status(eventer, "Done", done=True)
+        return output
+
+    async def sync_local_listings(
+        self,
+        query: Dict[str, Any],
+        __event_emitter__=None,
+    ) -> str:
+        """
+        Download every page of a search (up to the `max_pages_cap` valve) into the local listing store so that
+        `search_local` can answer follow-up questions without calling Repliers.
+
+        `query` is a dict of search_listing parameters (e.g., {"area": "Pasco", "state": "FL", "class": "condo"}).
+        """
+
+        eventer = __event_emitter__ or (lambda *args, **kwargs: asyncio.sleep(0))
+
+        if not self.valves.rapidapi_key:
+            msg = "rapidapi_key valve is empty; set your Repliers API key first."
             await self.emit_error(eventer, msg)
             return msg
-        except requests.RequestException as exc:
-            msg = f"Request failed: {exc}"
+
+        query = dict(query or {})
+        if "class_" in query:
+            query["class"] = query.pop("class_")
+        await self.emit_status(eventer, "Syncing listings into the local store...")
+
+        try:
+            params = self._prepare_params(query)
+            result = await self._run_search(
+                params, eventer, bypass_cache=True, fetch_all_pages=True, stream_pages=False, store_local=False
+            )
+            loop = asyncio.get_event_loop()
+            stored = await loop.run_in_executor(None, self._get_local_store().upsert, result["listings"])
+            output = (
+                f"Local sync complete: stored {stored} of {result['data'].get('count', stored)} matching listings "
+                f"in {self.valves.local_store_path}."
+            )
+            if result["page_errors"]:
+                output += "\n\nSome pages failed:\n" + "\n".join(result["page_errors"])
+            await self.emit_result(eventer, output)
+            await self.emit_status(eventer, "Done", done=True)
+            return output
+        except Exception as exc:  # noqa: BLE001
+            msg = _error_message(exc)
             await self.emit_error(eventer, msg)
             return msg
+
+    async def search_local(
+        self,
+        city: Optional[Any] = None,
+        state: Optional[Any] = None,
+        zip: Optional[Any] = None,  # noqa: A002  # pyright: ignore[reportShadowedBuiltin]
+        area: Optional[Any] = None,
+        neighborhood: Optional[Any] = None,
+        status: Optional[Any] = None,
+        standardStatus: Optional[Any] = None,
+        class_: Optional[Any] = None,
+        type: Optional[Any] = None,  # noqa: A003  # pyright: ignore[reportShadowedBuiltin]
+        mlsNumber: Optional[Any] = None,
+        minPrice: Optional[Any] = None,
+        maxPrice: Optional[Any] = None,
+        minBedrooms: Optional[Any] = None,
+        maxBedrooms: Optional[Any] = None,
+        minBaths: Optional[Any] = None,
+        maxBaths: Optional[Any] = None,
+        minSqft: Optional[Any] = None,
+        maxSqft: Optional[Any] = None,
+        minYearBuilt: Optional[Any] = None,
+        maxYearBuilt: Optional[Any] = None,
+        minListDate: Optional[Any] = None,
+        maxListDate: Optional[Any] = None,
+        sortBy: Optional[Any] = None,
+        resultsPerPage: Optional[Any] = None,
+        pageNum: Optional[Any] = None,
+        __event_emitter__=None,
+    ) -> str:
+        """
+        Search listings already downloaded into the local store (no Repliers call). Use for follow-up filtering of
+        areas that were synced with `sync_local_listings`; results may be older than a live `search_listing`.
+
+        Parameters use the same names, meaning and shorthand as search_listing ("500k", "Tampa, FL", "Florida"):
+        min/max Price, Bedrooms, Baths, Sqft, YearBuilt and ListDate are inclusive bounds, and a bound that is not
+        a number is reported as an error; city, state, zip, area, neighborhood, status, standardStatus,
+        class, type and mlsNumber match case-insensitively and accept lists. sortBy supports listPriceAsc/Desc,
+        sqftAsc/Desc, createdOnAsc/Desc and updatedOnAsc/Desc.
+        """
+
+        eventer = __event_emitter__ or (lambda *args, **kwargs: asyncio.sleep(0))
+
+        filters = _normalize_params(
+            {
+                "city": city,
+                "state": state,
+                "zip": zip,
+                "area": area,
+                "neighborhood": neighborhood,
+                "status": status if status is not None else self.valves.default_status,
+                "standardStatus": standardStatus,
+                "class": class_,
+                "type": type,
+                "mlsNumber": mlsNumber,
+                "minPrice": minPrice,
+                "maxPrice": maxPrice,
+                "minBedrooms": minBedrooms,
+                "maxBedrooms": maxBedrooms,
+                "minBaths": minBaths,
+                "maxBaths": maxBaths,
+                "minSqft": minSqft,
+                "maxSqft": maxSqft,
+                "minYearBuilt": minYearBuilt,
+                "maxYearBuilt": maxYearBuilt,
+                "minListDate": minListDate,
+                "maxListDate": maxListDate,
+            }
+        )
+        per_page = int(resultsPerPage or self.valves.default_results_per_page or 20)
+        page = max(1, int(pageNum or 1))
+
+        try:
+            started = time.perf_counter()
+            total, listings = await asyncio.get_event_loop().run_in_executor(
+                None, self._get_local_store().query, filters, sortBy, per_page, (page - 1) * per_page
+            )
+            elapsed_ms = (time.perf_counter() - started) * 1000
         except ValueError as exc:
-            msg = f"Failed to parse response JSON: {exc}"
+            msg = f"Invalid local search filter: {exc}"
+            await self.emit_error(eventer, msg)
+            return msg
+        except sqlite3.Error as exc:
+            msg = f"Local store query failed: {exc}"
+            await self.emit_error(eventer, msg)
+            return msg
+
+        mode, compact_fields = self._output_settings()
+        data = {"page": page, "numPages": -(-total // per_page) if total else 0, "pageSize": per_page, "count": total}
+        output = f"Local listing search complete ({total} matches).\n" + await self._render(
+            data, listings, mode, compact_fields
+        )
+        if self.valves.enable_debug_output:
+            debug = json.dumps(
+                {"filters": filters, "store": self.valves.local_store_path, "query_ms": round(elapsed_ms, 2)},
+                indent=2,
+            )
+            output = f"Debug:\n{debug}\n\n" + output
+
+        await self.emit_result(eventer, output)
+        await self.emit_status(eventer, "Done", done=True)
+        return output
+
+    async def search_nearby(
+        self,
+        lat: Optional[float] = None,
+        long: Optional[float] = None,
+        radius: Optional[float] = None,
+        map: Optional[Any] = None,  # noqa: A001  # pyright: ignore[reportShadowedBuiltin]
+        nearest: Optional[int] = None,
+        __event_emitter__=None,
+    ) -> str:
+        """
+        Answer "near this point" questions from listings already in the local store, without calling Repliers.
+
+        - Radius: pass `lat`, `long` and `radius` (km, same as search_listing) for listings within that distance.
+        - Nearest: pass `lat`, `long` and `nearest` (e.g., 5) for the k closest listings.
+        - Polygon: pass `map` as a polygon of [long, lat] pairs (same format as search_listing) for listings inside it.
+
+        Output: listings ordered by distance (radius/nearest) with the distance in km, formatted like search_listing.
+        """
+
+        eventer = __event_emitter__ or (lambda *args, **kwargs: asyncio.sleep(0))
+
+        try:
+            started = time.perf_counter()
+            index = await asyncio.get_event_loop().run_in_executor(None, self._get_geo_index)
+            distances: Dict[str, float] = {}
+            if map is not None:
+                ids = index.within_polygon(_parse_polygon(map))
+            elif lat is not None and long is not None and (radius or nearest):
+                if nearest:
+                    hits = index.nearest(float(lat), float(long), int(nearest))
+                else:
+                    hits = index.within_radius(float(lat), float(long), float(radius))
+                ids = [mls for mls, _ in hits]
+                distances = dict(hits)
+            else:
+                msg = "Provide `map`, or `lat` and `long` with `radius` or `nearest`."
+                await self.emit_error(eventer, msg)
+                return msg
+            query_ms = (time.perf_counter() - started) * 1000
+
+            limit = int(self.valves.default_results_per_page or 20) if not nearest else len(ids)
+            stored = await asyncio.get_event_loop().run_in_executor(None, self._get_local_store().get_many, ids[:limit])
+        except (ValueError, TypeError, sqlite3.Error) as exc:
+            msg = f"Nearby search failed: {exc}"
+            await self.emit_error(eventer, msg)
+            return msg
+
+        listings = [stored[mls] for mls in ids[:limit] if mls in stored]
+        lines = [f"Nearby search complete ({len(ids)} matches among {len(index)} stored listings)."]
+        if distances:
+            lines.append(", ".join(f"{mls}: {distances[mls]:.2f} km" for mls in ids[:limit]))
+        mode, compact_fields = self._output_settings()
+        output = "\n".join(lines) + "\n" + await self._render({"count": len(ids)}, listings, mode, compact_fields)
+        if self.valves.enable_debug_output:
+            debug = json.dumps(
+                {"indexed_points": len(index), "query_ms": round(query_ms, 2), "numpy": np is not None},
+                indent=2,
+            )
+            output = f"Debug:\n{debug}\n\n" + output
+
+        await self.emit_result(eventer, output)
+        await self.emit_status(eventer, "Done", done=True)
+        return output
+
+    async def listing_photos(
+        self,
+        mlsNumber: str,
+        start: int = 1,
+        count: int = 12,
+        __event_emitter__=None,
+    ) -> str:
+        """
+        List photo URLs for one listing, for galleries. search_listing shows only the hero image and the first
+        few gallery links; call this for the rest. `start` is the 1-based photo position, `count` how many to
+        return (max 50).
+        """
+
+        eventer = __event_emitter__ or (lambda *args, **kwargs: asyncio.sleep(0))
+
+        mls = str(mlsNumber or "").strip()
+        if not mls:
+            msg = "mlsNumber is required."
+            await self.emit_error(eventer, msg)
+            return msg
+
+        images = self._photo_index.get(mls)
+        if images is None:
+            if not self.valves.rapidapi_key:
+                msg = "rapidapi_key valve is empty; set your Repliers API key first."
+                await self.emit_error(eventer, msg)
+                return msg
+            await self.emit_status(eventer, f"Fetching photos for {mls}...")
+            url = f"{self.valves.base_url}/listings"
+            params = _clean_params(
+                {"mlsNumber": mls, "boardId": self.valves.default_board_ids, "fields": "mlsNumber,images"}
+            )
+            try:
+                data, _meta = await self._fetch_listings(url, params, {})
+            except Exception as exc:  # noqa: BLE001
+                msg = _error_message(exc)
+                await self.emit_error(eventer, msg)
+                return msg
+            listings = _extract_listings(data)
+            match = next((item for item in listings if str(item.get("mlsNumber")) == mls), None)
+            images = [str(path) for path in _as_list((match or {}).get("images")) if path]
+            if images:
+                self._photo_index.set(mls, images)
+
+        if not images:
+            output = f"No photos found for listing {mls}."
+            await self.emit_result(eventer, output)
+            await self.emit_status(eventer, "Done", done=True)
+            return output
+
+        first = max(1, int(start or 1))
+        selected = images[first - 1 : first - 1 + max(1, min(50, int(count or 12)))]
+        cdn, width = self.valves.image_cdn_url, self.valves.image_gallery_width
+        lines = [f"Photos for {mls} ({len(images)} total, showing {first}-{first + len(selected) - 1}):"]
+        lines += [f"{first + i}. ![Photo {first + i}]({_image_url(cdn, path, width)})" for i, path in enumerate(selected)]
+        if first - 1 + len(selected) < len(images):
+            lines.append(f'More: listing_photos(mlsNumber="{mls}", start={first + len(selected)})')
+        if not selected:
+            lines = [f"Listing {mls} has {len(images)} photos; start={first} is past the end."]
+        output = "\n".join(lines)
+        await self.emit_result(eventer, output)
+        await self.emit_status(eventer, "Done", done=True)
+        return output
+
+    async def market_stats(
+        self,
+        city: Optional[Any] = None,
+        state: Optional[Any] = None,
+        area: Optional[Any] = None,
+        neighborhood: Optional[Any] = None,
+        zip: Optional[Any] = None,  # noqa: A002  # pyright: ignore[reportShadowedBuiltin]
+        status: Optional[Any] = None,
+        lastStatus: Optional[Any] = None,
+        class_: Optional[Any] = None,
+        type: Optional[Any] = None,  # noqa: A003  # pyright: ignore[reportShadowedBuiltin]
+        propertyType: Optional[Any] = None,
+        style: Optional[Any] = None,
+        minPrice: Optional[Any] = None,
+        maxPrice: Optional[Any] = None,
+        minBedrooms: Optional[Any] = None,
+        maxBedrooms: Optional[Any] = None,
+        minBaths: Optional[Any] = None,
+        maxBaths: Optional[Any] = None,
+        minSqft: Optional[Any] = None,
+        maxSqft: Optional[Any] = None,
+        minListDate: Optional[Any] = None,
+        maxListDate: Optional[Any] = None,
+        minSoldDate: Optional[Any] = None,
+        maxSoldDate: Optional[Any] = None,
+        statistics: Optional[Any] = None,
+        aggregates: Optional[Any] = None,
+        __event_emitter__=None,
+    ) -> str:
+        """
+        Answer market-summary questions (counts, median/average price, days on market, breakdowns) without
+        downloading listings. Prefer this over search_listing for "how many" and "what is the median" questions.
+
+        Filters use the same names and meaning as search_listing. `statistics` is a Repliers statistics spec,
+        e.g. "avg-listPrice,med-listPrice,med-daysOnMarket" or with grouping "med-soldPrice,grp-mth" (sold
+        stats need status="U" and lastStatus="Sld"); it defaults to list price and days-on-market summaries.
+        `aggregates` lists fields to count values of, e.g. "details.propertyType,address.city".
+        """
+
+        eventer = __event_emitter__ or (lambda *args, **kwargs: asyncio.sleep(0))
+
+        if not self.valves.rapidapi_key:
+            msg = "rapidapi_key valve is empty; set your Repliers API key first."
             await self.emit_error(eventer, msg)
             return msg
+
+        params = self._prepare_params(
+            {
+                "city": city,
+                "state": state,
+                "area": area,
+                "neighborhood": neighborhood,
+                "zip": zip,
+                "status": status,
+                "lastStatus": lastStatus,
+                "class": class_,
+                "type": type,
+                "propertyType": propertyType,
+                "style": style,
+                "minPrice": minPrice,
+                "maxPrice": maxPrice,
+                "minBedrooms": minBedrooms,
+                "maxBedrooms": maxBedrooms,
+                "minBaths": minBaths,
+                "maxBaths": maxBaths,
+                "minSqft": minSqft,
+                "maxSqft": maxSqft,
+                "minListDate": minListDate,
+                "maxListDate": maxListDate,
+                "minSoldDate": minSoldDate,
+                "maxSoldDate": maxSoldDate,
+                "statistics": _comma_join(statistics) or _MARKET_STATISTICS,
+                "aggregates": _comma_join(aggregates),
+            }
+        )
+        # Only the stats blocks are wanted: no listing bodies, and the smallest page Repliers accepts.
+        params.update({"listings": "false", "resultsPerPage": 1, "fields": "mlsNumber"})
+        params.pop("pageNum", None)
+        url = f"{self.valves.base_url}/listings"
+
+        await self.emit_status(eventer, "Fetching market statistics...")
+        try:
+            data, meta = await self._fetch_listings(url, params, {}, cache=self._get_stats_cache())
         except Exception as exc:  # noqa: BLE001
-            msg = f"Unexpected error: {exc}"
+            msg = _error_message(exc)
             await self.emit_error(eventer, msg)
             return msg
+
+        output = "Market statistics:\n" + _render_market_stats(data)
+        if self.valves.enable_debug_output:
+            debug = json.dumps(
+                {
+                    "url": url,
+                    "params": params,
+                    "cache": {"hit": meta["cache_hit"], "ttl_seconds": self.valves.market_stats_cache_ttl_seconds},
+                    "response_bytes": meta["response_bytes"],
+                },
+                indent=2,
+            )
+            output = f"Debug:\n{debug}\n\n" + output
+
+        await self.emit_result(eventer, output)
+        await self.emit_status(eventer, "Done", done=True)
+        return output